@@ -1,13 +1,26 @@
+import asyncio
 import logging
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI, Request, HTTPException
 from fastapi_csrf_protect.exceptions import CsrfProtectError
 from starlette.responses import JSONResponse
 
-from mood_diary.backend.database.db import init_db
+from mood_diary.backend.database.cache import cache
+from mood_diary.backend.database.db import get_sqlite_pragmas, migrate_schema
+from mood_diary.backend.database.migrations.moodstamps import (
+    get_moodstamps_storage,
+)
+from mood_diary.backend.database.migrations.runner import MigrationRunner
+from mood_diary.backend.database.migrations.versions import get_migrations
+from mood_diary.backend.database.pool import SQLiteConnectionPool
+from mood_diary.backend.database.writer import SQLiteWriteQueue
 from mood_diary.backend.exceptions.base import BaseApplicationException
+from mood_diary.backend.repositories.sqlite.codecs import get_moodstamp_codec
 from mood_diary.backend.routes.auth import router as auth_router
+from mood_diary.backend.routes.cache import router as cache_router
+from mood_diary.backend.routes.dependencies import get_password_hasher
 from mood_diary.backend.routes.mood import router as mood_router
+from mood_diary.backend.utils.middleware import CompressionMiddleware
 from mood_diary.backend.config import config
 
 logging.basicConfig(
@@ -30,8 +43,57 @@ def get_app(app_config) -> FastAPI:
         if not app_config.CSRF_SECRET_KEY:
             raise Exception("Please set CSRF_SECRET_KEY environment variable")
 
-        init_db(app_config.SQLITE_DB_PATH)
+        pragmas = get_sqlite_pragmas(app_config)
+        runner = MigrationRunner(
+            get_migrations(app_config.SQLITE_MOODSTAMPS_STORAGE),
+            batch_size=app_config.SQLITE_MIGRATION_BATCH_SIZE,
+            pause=app_config.SQLITE_MIGRATION_BATCH_PAUSE,
+        )
+        backfills = migrate_schema(app_config.SQLITE_DB_PATH, pragmas, runner)
+        a.state.db_pool = SQLiteConnectionPool(
+            app_config.SQLITE_DB_PATH,
+            size=app_config.SQLITE_POOL_SIZE,
+            acquire_timeout=app_config.SQLITE_POOL_ACQUIRE_TIMEOUT,
+            pragmas=pragmas,
+        )
+        a.state.db_writer = SQLiteWriteQueue(
+            app_config.SQLITE_DB_PATH,
+            batch_window=app_config.SQLITE_WRITE_BATCH_WINDOW,
+            max_batch=app_config.SQLITE_WRITE_MAX_BATCH,
+            max_queue=app_config.SQLITE_WRITE_MAX_QUEUE,
+            pragmas=pragmas,
+        )
+        await a.state.db_writer.start()
+
+        async def refresh_moodstamp_codec():
+            # The layout changes when a backfill switches tables
+            storage = await a.state.db_writer.submit(get_moodstamps_storage)
+            a.state.moodstamp_codec = get_moodstamp_codec(storage)
+
+        async def run_backfills():
+            try:
+                await runner.backfill(
+                    backfills,
+                    a.state.db_writer,
+                    a.state.db_pool,
+                    refresh_moodstamp_codec,
+                )
+            except Exception:
+                logger.exception(
+                    "Schema backfill failed, it resumes on the next start"
+                )
+
+        await refresh_moodstamp_codec()
+        backfill = asyncio.create_task(run_backfills())
+        await cache.start()
         yield
+        await cache.close()
+        get_password_hasher().close()
+        backfill.cancel()
+        with suppress(asyncio.CancelledError):
+            await backfill
+        await a.state.db_writer.close()
+        a.state.db_pool.close()
 
     app = FastAPI(
         title=app_config.APP_TITLE,
@@ -40,12 +102,20 @@ def get_app(app_config) -> FastAPI:
         root_path=app_config.ROOT_PATH,
     )
 
+    app.add_middleware(
+        CompressionMiddleware,
+        encodings=app_config.COMPRESSION_ENCODINGS,
+        min_size=app_config.COMPRESSION_MIN_SIZE,
+    )
+
     @app.exception_handler(BaseApplicationException)
     async def base_application_exception_handler(
         request: Request, exc: BaseApplicationException
     ):
         raise HTTPException(
-            status_code=exc.http_status_code, detail=exc.message
+            status_code=exc.http_status_code,
+            detail=exc.message,
+            headers=exc.headers,
         )
 
     @app.exception_handler(CsrfProtectError)
@@ -56,7 +126,13 @@ def get_app(app_config) -> FastAPI:
             status_code=exc.status_code, content={"detail": exc.message}
         )
 
-    app.include_router(auth_router, tags=["Auth"], prefix="/auth")
-    app.include_router(mood_router, tags=["Mood"], prefix="/mood")
+    include_routers(app, app_config)
 
     return app
+
+
+def include_routers(app: FastAPI, app_config) -> None:
+    app.include_router(auth_router, tags=["Auth"], prefix="/auth")
+    app.include_router(mood_router, tags=["Mood"], prefix="/mood")
+    if app_config.CACHE_STATS_ENABLED:
+        app.include_router(cache_router, tags=["Cache"], prefix="/cache")
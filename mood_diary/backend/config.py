@@ -1,3 +1,5 @@
+from typing import Literal
+
 from fastapi_csrf_protect import CsrfProtect
 from pydantic_settings import SettingsConfigDict
 from pydantic_settings import BaseSettings
@@ -17,22 +19,121 @@ class Settings(BaseSettings):
     PASSWORD_HASHING_ENCODING: str = "utf-8"
     PASSWORD_HASHING_HASH_NAME: str = "sha256"
     PASSWORD_HASHING_HASH_ITERATIONS: int = 100000
+    # Iterations of the hashes stored before the hashing parameters were
+    # stored along with them. Hashes with other parameters than the ones
+    # above are replaced on login. See
+    # python -m mood_diary.backend.utils.calibrate_hashing
+    PASSWORD_HASHING_LEGACY_ITERATIONS: int = 100000
     PASSWORD_HASHING_SALT_SIZE: int = 16
     PASSWORD_HASHING_SPLIT_CHAR: str = "$"
+    # Hashing runs on a pool of PASSWORD_HASHING_WORKERS threads or
+    # processes; calls beyond PASSWORD_HASHING_MAX_QUEUE waiting ones
+    # are answered with 503 and Retry-After
+    PASSWORD_HASHING_EXECUTOR: Literal["thread", "process"] = "thread"
+    PASSWORD_HASHING_WORKERS: int = 2
+    PASSWORD_HASHING_MAX_QUEUE: int = 16
 
     CSRF_SECRET_KEY: str = ""
 
     AUTH_TOKEN_SECRET_KEY: str = ""
     AUTH_TOKEN_ALGORITHM: str = "HS256"
     AUTH_TOKEN_ACCESS_TOKEN_EXPIRE_MINUTES: int = 360
+    # Tokens whose signature was verified, until they expire; 0 disables
+    AUTH_TOKEN_VERIFIED_CACHE_SIZE: int = 4096
     AUTH_SECURE_COOKIE: bool = False
 
     ROOT_PATH: str = "/api"
+    # Responses of at least COMPRESSION_MIN_SIZE bytes are compressed
+    # with the encoding the client prefers, the earliest listed on ties.
+    # Encodings whose package is not installed are skipped.
+    COMPRESSION_ENCODINGS: list[Literal["gzip", "br", "zstd"]] = [
+        "br",
+        "zstd",
+        "gzip",
+    ]
+    COMPRESSION_MIN_SIZE: int = 1024  # bytes
     SQLITE_DB_PATH: str = "data/mood_diary.db"
+    SQLITE_POOL_SIZE: int = 8
+    SQLITE_POOL_ACQUIRE_TIMEOUT: float = 10.0  # seconds
+    SQLITE_WRITE_BATCH_WINDOW: float = 0.002  # seconds
+    SQLITE_WRITE_MAX_BATCH: int = 128
+    SQLITE_WRITE_MAX_QUEUE: int = 1024
+
+    # SQLite storage profile, applied as PRAGMAs to every connection
+    SQLITE_JOURNAL_MODE: Literal["WAL", "DELETE", "TRUNCATE", "MEMORY"] = "WAL"
+    SQLITE_SYNCHRONOUS: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = "NORMAL"
+    SQLITE_BUSY_TIMEOUT: int = 5000  # milliseconds
+    SQLITE_CACHE_SIZE: int = -65536  # negative: KiB, positive: pages
+    SQLITE_MMAP_SIZE: int = 268435456  # bytes, 0 disables mmap
+    SQLITE_TEMP_STORE: Literal["DEFAULT", "FILE", "MEMORY"] = "MEMORY"
+    SQLITE_LOCK_RETRY_ATTEMPTS: int = 5
+    SQLITE_LOCK_RETRY_BACKOFF: float = 0.02  # seconds, doubled per attempt
+    # "compact" stores moodstamp UUIDs as BLOBs, dates as epoch days and
+    # timestamps as epoch microseconds. Switching an existing database to
+    # it rewrites the moodstamps table once, in the background.
+    SQLITE_MOODSTAMPS_STORAGE: Literal["text", "compact"] = "text"
+    # Backfills rewrite this many rows per transaction, pausing in between
+    SQLITE_MIGRATION_BATCH_SIZE: int = 1000
+    SQLITE_MIGRATION_BATCH_PAUSE: float = 0.01  # seconds
+
+    # GET /mood/ page size when no limit is given, and the largest allowed
+    MOODSTAMPS_PAGE_SIZE: int = 100
+    MOODSTAMPS_MAX_PAGE_SIZE: int = 1000
 
     REDIS_HOST: str = "redis"
     REDIS_PORT: int = 6379
     REDIS_CACHE_TTL: int = 60  # seconds
+    # Each worker shares up to REDIS_MAX_CONNECTIONS connections between
+    # its requests; a call waits up to REDIS_POOL_TIMEOUT for one
+    REDIS_MAX_CONNECTIONS: int = 32
+    REDIS_POOL_TIMEOUT: float = 1.0  # seconds
+    REDIS_CONNECT_TIMEOUT: float = 1.0  # seconds
+    REDIS_SOCKET_TIMEOUT: float = 1.0  # seconds
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30  # seconds, 0 disables
+
+    # Shared cache tier: "redis", "memory" for a single worker without
+    # Redis, or "none" to cache nothing
+    CACHE_BACKEND: Literal["redis", "memory", "none"] = "redis"
+    CACHE_MEMORY_MAX_ENTRIES: int = 65536
+    # Redis calls failing or slower than CACHE_BREAKER_SLOW_CALL in at
+    # least CACHE_BREAKER_FAILURE_RATIO of the last CACHE_BREAKER_WINDOW
+    # bypass the shared cache for CACHE_BREAKER_OPEN_DURATION, then one
+    # call probes Redis again. Calls taking longer than
+    # CACHE_BREAKER_TIMEOUT go uncached.
+    CACHE_BREAKER_TIMEOUT: float = 0.5  # seconds
+    CACHE_BREAKER_SLOW_CALL: float = 0.1  # seconds
+    CACHE_BREAKER_FAILURE_RATIO: float = 0.5
+    CACHE_BREAKER_WINDOW: int = 20  # calls
+    CACHE_BREAKER_MIN_CALLS: int = 10
+    CACHE_BREAKER_OPEN_DURATION: float = 5.0  # seconds
+
+    # In-process cache tier of every worker, consulted before Redis and
+    # kept coherent by invalidations published on the channel
+    CACHE_LOCAL_MAX_ENTRIES: int = 4096
+    CACHE_LOCAL_TTL: float = 5.0  # seconds, caps staleness of an entry
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"
+    CACHE_RESUBSCRIBE_DELAY: float = 1.0  # seconds
+    # Cached reads stay fresh for their TTL, then are served stale for up
+    # to CACHE_STALE_TTL while a single request recomputes them, or when
+    # the database fails
+    CACHE_STALE_TTL: int = 60  # seconds
+    CACHE_EARLY_REFRESH_BETA: float = 1.0  # 0 disables early refreshes
+    CACHE_LOCK_TIMEOUT: float = 2.0  # seconds
+    CACHE_LOCK_POLL_INTERVAL: float = 0.05  # seconds
+    # Empty pages and missing moodstamps are cached too, briefly
+    CACHE_EMPTY_TTL: int = 10  # seconds
+    CACHE_NOT_FOUND_TTL: int = 10  # seconds
+    # Cached responses of at least CACHE_COMPRESSION_MIN_SIZE bytes are
+    # stored compressed, and sent so to the clients accepting it. "br"
+    # needs the brotli package, "zstd" the zstandard package.
+    CACHE_COMPRESSION: Literal["identity", "gzip", "br", "zstd"] = "gzip"
+    CACHE_COMPRESSION_MIN_SIZE: int = 1024  # bytes
+    # GET /mood/ with both dates spanning at most CACHE_MONTH_BLOCKS_MAX
+    # months is assembled from per-month blocks of the user's moodstamps
+    CACHE_MONTH_BLOCKS_MAX: int = 36
+    CACHE_MONTH_BLOCK_TTL: int = 300  # seconds
+    # GET /cache/stats, for signed-in users, is only served when enabled
+    CACHE_STATS_ENABLED: bool = False
 
     # Logging configuration
     LOGGING_LEVEL: str = "INFO"
@@ -1,12 +1,478 @@
-import redis.asyncio as aioredis
+import asyncio
+import json
+import logging
+import math
+import random
+import sqlite3
+import time
+from typing import Any, Awaitable, Callable, NamedTuple
+from uuid import UUID
+
 from mood_diary.backend.config import config
+from mood_diary.backend.database.cache_backends import (
+    CacheBackend,
+    LocalCache,
+    get_cache_backend,
+)
+from mood_diary.backend.exceptions.database import DatabaseBusy
+from mood_diary.backend.utils.compression import compress, is_available
+from mood_diary.common.api.schemas.cache import (
+    CacheStatsResponse,
+    CacheTierStats,
+)
+
+logger = logging.getLogger(__name__)
+
+# Cached in place of a value that does not exist; never valid JSON
+NOT_FOUND = b"!not-found"
+
+
+class CachedValue(NamedTuple):
+    payload: bytes
+    encoding: str = "identity"
+    # POSIX timestamp of the latest change of the value, when known
+    last_modified: float | None = None
+
+
+class Computed(NamedTuple):
+    """A value computed to be cached, fresh for `ttl` seconds"""
+
+    value: bytes
+    ttl: int
+    last_modified: float | None = None
+
+
+class TieredCache:
+    """
+    Shared cache, held by a CacheBackend, with a LocalCache in front of
+    it.
+
+    Keys deleted or incremented through any worker are published on
+    `channel`, and every worker drops them from its local tier. The local
+    tier is only used while this worker is subscribed; otherwise it could
+    keep serving values another worker has invalidated.
+
+    Values cached by `get_or_compute` carry the time they stay fresh
+    until and how long they took to compute, and outlive it by
+    `stale_ttl` so that they can be served while being recomputed.
+    Those of at least `compression_min_size` bytes are stored compressed
+    with `compression`.
+    """
+
+    def __init__(
+        self,
+        backend: CacheBackend,
+        local: LocalCache,
+        channel: str,
+        resubscribe_delay: float = 1.0,
+        stale_ttl: int = 60,
+        early_refresh_beta: float = 1.0,
+        lock_timeout: float = 2.0,
+        lock_poll_interval: float = 0.05,
+        stale_on: tuple[type[Exception], ...] = (),
+        compression: str = "identity",
+        compression_min_size: int = 1024,
+    ):
+        if not is_available(compression):
+            raise ValueError(f"{compression} compression is not available")
+        self.backend = backend
+        self.local = local
+        self.channel = channel
+        self.resubscribe_delay = resubscribe_delay
+        self.stale_ttl = stale_ttl
+        self.early_refresh_beta = early_refresh_beta
+        self.lock_timeout = lock_timeout
+        self.lock_poll_interval = lock_poll_interval
+        self.stale_on = stale_on
+        self.compression = compression
+        self.compression_min_size = compression_min_size
+        self.subscribed = False
+        self._flights: dict[str, asyncio.Future] = {}
+        self._invalidations = 0
+        self._listener: asyncio.Task | None = None
+        self._hits = {"local": 0, "redis": 0}
+        self._misses = {"local": 0, "redis": 0}
+        self._calls: dict[str, list[int]] = {}
+
+    async def get(self, key: str) -> Any | None:
+        if self.subscribed:
+            value = self.local.get(key)
+            if value is not None:
+                self._hits["local"] += 1
+                return value
+            self._misses["local"] += 1
+
+        invalidations = self._invalidations
+        value = await self.backend.get(key)
+        if value is None:
+            self._misses["redis"] += 1
+            return None
+        self._hits["redis"] += 1
+        # An invalidation received meanwhile may be for this very value
+        if self.subscribed and invalidations == self._invalidations:
+            self.local.set(key, value)
+        return value
+
+    async def mget(self, keys: list[str]) -> list[Any | None]:
+        """Values of `keys`, those missing locally read with one MGET"""
+        values: list[Any | None] = [None] * len(keys)
+        if self.subscribed:
+            values = [self.local.get(key) for key in keys]
+            hits = sum(value is not None for value in values)
+            self._hits["local"] += hits
+            self._misses["local"] += len(keys) - hits
+
+        missing = [i for i, value in enumerate(values) if value is None]
+        if not missing:
+            return values
+        invalidations = self._invalidations
+        fetched = await self.backend.mget([keys[i] for i in missing])
+        for i, value in zip(missing, fetched):
+            if value is None:
+                self._misses["redis"] += 1
+                continue
+            self._hits["redis"] += 1
+            values[i] = value
+            if self.subscribed and invalidations == self._invalidations:
+                self.local.set(keys[i], value)
+        return values
+
+    async def set(self, key: str, value: Any, ex: int | None = None) -> None:
+        await self.backend.set(key, value, ex=ex)
+        if self.subscribed:
+            self.local.set(key, value, ex)
+
+    async def set_many(
+        self, values: dict[str, Any], ex: int | None = None
+    ) -> None:
+        await self.backend.set_many(values, ex=ex)
+        if self.subscribed:
+            for key, value in values.items():
+                self.local.set(key, value, ex)
+
+    async def delete(self, *keys: str) -> None:
+        self.local.delete(*keys)
+        await self.backend.transaction(
+            {}, {}, (), keys, (self.channel, json.dumps(keys))
+        )
+
+    async def incr(self, key: str) -> int:
+        self.local.delete(key)
+        (value,) = await self.backend.transaction(
+            {}, {}, (key,), (), (self.channel, json.dumps([key]))
+        )
+        return value
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[tuple[bytes, int] | Computed]],
+    ) -> CachedValue:
+        """
+        Cached value of `key`, computed when missing or due.
+
+        `compute` returns the value and how long it stays fresh, in
+        seconds, and may add when it last changed, as a Computed; a
+        value with no freshness is returned but not cached.
+        Concurrent calls for the same key in this worker share one
+        computation, and a short backend lock lets one worker compute it
+        while the others wait for it to be cached. Callers that have a
+        stale value get it back without waiting. So do callers whose
+        computation fails with one of the `stale_on` errors.
+        """
+        stale = None
+        cached = await self.get(key)
+        if cached is not None:
+            fresh_until, duration, value = unpack(cached)
+            if not self._due(fresh_until, duration):
+                return value
+            stale = value
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            if stale is not None:
+                return stale
+            await asyncio.wait([flight])
+            if not flight.cancelled():
+                return flight.result()
+
+        flight = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting to retrieve a failure
+        flight.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._flights[key] = flight
+        try:
+            value = await self._compute_locked(key, compute, stale)
+            flight.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    async def write_through(
+        self,
+        computed: dict[str, tuple[bytes, int] | Computed],
+        patches: dict[str, tuple[Callable[[Any], Any], int]] | None = None,
+        incr: tuple[str, ...] = (),
+        delete: tuple[str, ...] = (),
+    ) -> None:
+        """
+        Update the cache after a database write, in one transaction.
+
+        `computed` maps keys to what a get_or_compute computation would
+        return, stored the way it stores it. `patches` maps keys to a
+        function of their cached value and the TTL of its result; keys
+        that are not cached are left alone. `incr` counters are
+        incremented and `delete` keys deleted. All the keys are
+        published as invalidated.
 
-redis_client = aioredis.from_url(
-    f"redis://{config.REDIS_HOST}:{config.REDIS_PORT}",
-    encoding="utf-8",
-    decode_responses=True,
+        If a patched key is changed while it is read, the patched keys
+        are deleted instead.
+        """
+        patches = patches or {}
+        entries = {key: Computed(*entry) for key, entry in computed.items()}
+        keys = (*computed, *patches, *incr, *delete)
+        self.local.delete(*keys)
+        await self.backend.transaction(
+            {
+                key: (self._pack(entry, 0.0), entry.ttl + self.stale_ttl)
+                for key, entry in entries.items()
+            },
+            patches,
+            incr,
+            delete,
+            (self.channel, json.dumps(keys)),
+        )
+
+    def record_call(self, name: str, hit: bool) -> None:
+        """Count a cached call of `name` as answered by the cache or not"""
+        calls = self._calls.setdefault(name, [0, 0])
+        calls[0 if hit else 1] += 1
+
+    def stats(self) -> CacheStatsResponse:
+        return CacheStatsResponse(
+            local=self._tier_stats("local"),
+            redis=self._tier_stats("redis"),
+            local_entries=len(self.local),
+            backend=self.backend.name,
+            degraded=self.backend.degraded,
+            pool=self.backend.pool_stats(),
+            latency=self.backend.latency_stats(),
+            calls={
+                name: hit_stats(hits, misses)
+                for name, (hits, misses) in sorted(self._calls.items())
+            },
+        )
+
+    async def start(self) -> None:
+        await self.backend.open()
+        self._listener = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await self.backend.close()
+
+    def invalidate_local(self, keys: list[str]) -> None:
+        self._invalidations += 1
+        self.local.delete(*keys)
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async for message in self.backend.listen(self.channel):
+                    self._on_message(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(
+                    f"Cache invalidation channel unavailable, "
+                    f"local cache tier disabled: {e}"
+                )
+            finally:
+                # Invalidations may be missed until subscribed again
+                self.subscribed = False
+                self.local.clear()
+            await asyncio.sleep(self.resubscribe_delay)
+
+    def _on_message(self, message: str | None) -> None:
+        if message is None:
+            self.subscribed = True
+            logger.info(f"Subscribed to cache invalidations: {self.channel}")
+        else:
+            self.invalidate_local(json.loads(message))
+
+    def _due(self, fresh_until: float, duration: float) -> bool:
+        """
+        Whether a value should be recomputed. The closer it is to going
+        stale and the longer it takes to compute, the likelier an early
+        recomputation is, so one request usually refreshes a hot key
+        before all of them find it stale.
+        """
+        # 1 - random() is in (0, 1]
+        early = (
+            -duration * self.early_refresh_beta * math.log(1 - random.random())
+        )
+        return time.time() + early >= fresh_until
+
+    async def _compute_locked(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[tuple[bytes, int] | Computed]],
+        stale: CachedValue | None,
+    ) -> CachedValue:
+        lock = self.backend.lock(f"lock:{key}", timeout=self.lock_timeout)
+        if not await lock.acquire():
+            if stale is not None:
+                return stale
+            value = await self._wait_for_value(key)
+            if value is not None:
+                return value
+            logger.warning(f"Cache lock expired, computing {key}")
+            return await self._compute(key, compute, stale)
+        try:
+            return await self._compute(key, compute, stale)
+        finally:
+            await lock.release()
+
+    async def _wait_for_value(self, key: str) -> CachedValue | None:
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.lock_poll_interval)
+            cached = await self.backend.get(key)
+            if cached is not None:
+                return unpack(cached)[2]
+        return None
+
+    async def _compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[tuple[bytes, int] | Computed]],
+        stale: CachedValue | None,
+    ) -> CachedValue:
+        started = time.monotonic()
+        try:
+            value, ttl, last_modified = Computed(*await compute())
+        except self.stale_on as e:
+            if stale is None:
+                raise
+            logger.warning(f"Serving stale {key}: {e}")
+            return stale
+        duration = time.monotonic() - started
+        stored = self._encode(value, last_modified)
+        if ttl > 0:
+            await self.set(
+                key,
+                pack(stored, time.time() + ttl, duration),
+                ex=ttl + self.stale_ttl,
+            )
+        return stored
+
+    def _encode(
+        self, value: bytes, last_modified: float | None = None
+    ) -> CachedValue:
+        """
+        A computed value as get_or_compute stores and returns it, so that
+        a value is returned the same whether it was cached or not
+        """
+        if len(value) >= self.compression_min_size:
+            return CachedValue(
+                compress(value, self.compression),
+                self.compression,
+                last_modified,
+            )
+        return CachedValue(value, last_modified=last_modified)
+
+    def _pack(self, computed: Computed, duration: float) -> bytes:
+        """A computed value as get_or_compute stores it"""
+        return pack(
+            self._encode(computed.value, computed.last_modified),
+            time.time() + computed.ttl,
+            duration,
+        )
+
+    def _tier_stats(self, tier: str) -> CacheTierStats:
+        return hit_stats(self._hits[tier], self._misses[tier])
+
+
+def hit_stats(hits: int, misses: int) -> CacheTierStats:
+    lookups = hits + misses
+    return CacheTierStats(
+        hits=hits,
+        misses=misses,
+        hit_ratio=hits / lookups if lookups else 0.0,
+    )
+
+
+def pack(value: CachedValue, fresh_until: float, duration: float) -> bytes:
+    last_modified = (
+        f"{value.last_modified:.6f}" if value.last_modified is not None else ""
+    )
+    header = (
+        f"{fresh_until:.3f}:{duration:.4f}:{value.encoding}:{last_modified}:"
+    )
+    return header.encode() + value.payload
+
+
+def unpack(cached: bytes) -> tuple[float, float, CachedValue]:
+    fresh_until, duration, encoding, last_modified, payload = cached.split(
+        b":", 4
+    )
+    return (
+        float(fresh_until),
+        float(duration),
+        CachedValue(
+            payload,
+            encoding.decode(),
+            float(last_modified) if last_modified else None,
+        ),
+    )
+
+
+cache = TieredCache(
+    get_cache_backend(config),
+    LocalCache(config.CACHE_LOCAL_MAX_ENTRIES, config.CACHE_LOCAL_TTL),
+    config.CACHE_INVALIDATION_CHANNEL,
+    resubscribe_delay=config.CACHE_RESUBSCRIBE_DELAY,
+    stale_ttl=config.CACHE_STALE_TTL,
+    early_refresh_beta=config.CACHE_EARLY_REFRESH_BETA,
+    lock_timeout=config.CACHE_LOCK_TIMEOUT,
+    lock_poll_interval=config.CACHE_LOCK_POLL_INTERVAL,
+    stale_on=(sqlite3.Error, DatabaseBusy),
+    compression=config.CACHE_COMPRESSION,
+    compression_min_size=config.CACHE_COMPRESSION_MIN_SIZE,
 )
 
 
-async def get_redis_client():
-    return redis_client
+async def get_cache() -> TieredCache:
+    return cache
+
+
+def moodstamps_month_key(user_id: UUID, month: str) -> str:
+    """Key of the block holding a user's moodstamps of `month` (YYYY-MM)"""
+    return f"moodstamps_month:{user_id}:{month}"
+
+
+def generation_key(tag: str) -> str:
+    return f"generation:{tag}"
+
+
+async def get_generations(cache: TieredCache, tags: list[str]) -> list[int]:
+    """
+    Current generations of cache tags. They are part of the keys tagged
+    with them, so bumping one makes all of those unreachable at once.
+    Old entries are left to expire; the counters have no TTL so they are
+    not lost before them.
+    """
+    generations = await cache.mget([generation_key(tag) for tag in tags])
+    return [int(generation) if generation else 0 for generation in generations]
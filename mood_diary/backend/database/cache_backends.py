@@ -0,0 +1,852 @@
+import asyncio
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Awaitable, Callable, TypeVar
+
+import redis.asyncio as aioredis
+from redis.exceptions import ConnectionError, LockError, WatchError
+
+from mood_diary.backend.config import Settings
+from mood_diary.common.api.schemas.cache import (
+    CacheLatencyStats,
+    CachePoolStats,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Keys mapped to a function of their cached value and the TTL of its result
+Patches = dict[str, tuple[Callable[[Any], Any], int]]
+
+
+class LocalCache:
+    """Bounded in-process LRU whose entries also expire after a TTL"""
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._entries[key] = (self.clock() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class CacheLock(ABC):
+    """Short lock on a cache key, held by one worker at a time"""
+
+    @abstractmethod
+    async def acquire(self) -> bool:
+        """Take the lock if it is free, without waiting"""
+        pass
+
+    @abstractmethod
+    async def release(self) -> None:
+        """Give the lock back, unless it has expired meanwhile"""
+        pass
+
+
+class CacheBackend(ABC):
+    """
+    Storage of the shared cache tier. Values are bytes; counters are
+    stored as their decimal digits.
+    """
+
+    name: str
+
+    @property
+    def degraded(self) -> bool:
+        """Whether the backend is serving from a fallback"""
+        return False
+
+    async def open(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    def pool_stats(self) -> CachePoolStats | None:
+        return None
+
+    def latency_stats(self) -> dict[str, CacheLatencyStats]:
+        return {}
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None:
+        """Value of `key`, None if it is not cached"""
+        pass
+
+    @abstractmethod
+    async def mget(self, keys: list[str]) -> list[bytes | None]:
+        """Values of `keys`, None for those not cached"""
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ex: int | None = None):
+        """Store a value, expiring after `ex` seconds if given"""
+        pass
+
+    @abstractmethod
+    async def set_many(self, values: dict[str, bytes], ex: int | None = None):
+        """Store several values, expiring after `ex` seconds if given"""
+        pass
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None:
+        """Delete keys, cached or not"""
+        pass
+
+    @abstractmethod
+    async def incr(self, key: str) -> int:
+        """Increment a counter, from 0 if missing, and return its value"""
+        pass
+
+    @abstractmethod
+    async def transaction(
+        self,
+        sets: dict[str, tuple[bytes, int]],
+        patches: Patches,
+        incr: tuple[str, ...],
+        delete: tuple[str, ...],
+        publish: tuple[str, str] | None = None,
+    ) -> list[int]:
+        """
+        Apply writes atomically: `sets` values with their TTL, `patches`
+        to the keys that are cached, `incr` and `delete`, then publish a
+        message on a channel. Patched keys changed meanwhile are deleted
+        instead. Returns the values of the `incr` counters.
+        """
+        pass
+
+    @abstractmethod
+    async def publish(self, channel: str, message: str) -> None:
+        """Send `message` to the listeners of `channel`"""
+        pass
+
+    @abstractmethod
+    def listen(self, channel: str) -> AsyncIterator[str | None]:
+        """Messages published on `channel`, after None once subscribed"""
+        pass
+
+    @abstractmethod
+    def lock(self, name: str, timeout: float) -> CacheLock:
+        """Lock named `name`, expiring after `timeout` seconds"""
+        pass
+
+
+class ObservedConnectionPool(aioredis.BlockingConnectionPool):
+    """
+    BlockingConnectionPool counting the callers that found every
+    connection in use, how long they waited and how many gave up.
+    """
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+
+    async def get_connection(self, *args: Any, **kwargs: Any):
+        if self.can_get_connection():
+            return await super().get_connection(*args, **kwargs)
+        self.waits += 1
+        started = time.monotonic()
+        try:
+            return await super().get_connection(*args, **kwargs)
+        except ConnectionError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.wait_time += time.monotonic() - started
+
+    def stats(self) -> CachePoolStats:
+        return CachePoolStats(
+            max_connections=self.max_connections,
+            in_use=len(self._in_use_connections),
+            idle=len(self._available_connections),
+            waits=self.waits,
+            wait_time=self.wait_time,
+            timeouts=self.timeouts,
+        )
+
+
+class RedisLock(CacheLock):
+    def __init__(self, backend: "RedisBackend", lock: Any):
+        self.backend = backend
+        self.lock = lock
+
+    async def acquire(self) -> bool:
+        return await self.backend.timed(
+            "lock", self.lock.acquire(blocking=False)
+        )
+
+    async def release(self) -> None:
+        try:
+            await self.backend.timed("unlock", self.lock.release())
+        except LockError:
+            pass
+
+
+class RedisBackend(CacheBackend):
+    """
+    Cache shared by all the workers, in Redis. The client is either
+    given or made by `connect` when opened, and then closed with the
+    backend. The latency of each kind of call is recorded.
+    """
+
+    name = "redis"
+    # Messages are awaited for at most this long at a time, so that the
+    # subscription is not taken for a dead connection by the socket
+    # timeout, and is health-checked
+    listen_poll_interval = 1.0
+
+    def __init__(
+        self,
+        client: aioredis.Redis | None = None,
+        connect: Callable[[], aioredis.Redis] | None = None,
+    ):
+        self.client = client
+        self.connect = connect
+        self._latency: dict[str, list[float]] = {}
+
+    @property
+    def redis(self) -> aioredis.Redis:
+        if self.client is None:
+            raise ConnectionError("Redis client is not open")
+        return self.client
+
+    async def open(self) -> None:
+        if self.connect is not None and self.client is None:
+            self.client = self.connect()
+
+    async def close(self) -> None:
+        if self.connect is not None and self.client is not None:
+            client, self.client = self.client, None
+            await client.aclose(close_connection_pool=True)
+
+    def pool_stats(self) -> CachePoolStats | None:
+        if self.client is None:
+            return None
+        pool = self.client.connection_pool
+        if not isinstance(pool, ObservedConnectionPool):
+            return None
+        return pool.stats()
+
+    def latency_stats(self) -> dict[str, CacheLatencyStats]:
+        return {
+            command: CacheLatencyStats(
+                calls=int(calls),
+                mean_ms=total / calls * 1000,
+                max_ms=longest * 1000,
+            )
+            for command, (calls, total, longest) in sorted(
+                self._latency.items()
+            )
+        }
+
+    async def timed(self, command: str, call: Awaitable[T]) -> T:
+        started = time.monotonic()
+        try:
+            return await call
+        finally:
+            elapsed = time.monotonic() - started
+            latency = self._latency.setdefault(command, [0, 0.0, 0.0])
+            latency[0] += 1
+            latency[1] += elapsed
+            latency[2] = max(latency[2], elapsed)
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.timed("get", self.redis.get(key))
+
+    async def mget(self, keys: list[str]) -> list[bytes | None]:
+        return await self.timed("mget", self.redis.mget(keys))
+
+    async def set(self, key: str, value: bytes, ex: int | None = None):
+        await self.timed("set", self.redis.set(key, value, ex=ex))
+
+    async def set_many(self, values: dict[str, bytes], ex: int | None = None):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, value in values.items():
+                pipe.set(key, value, ex=ex)
+            await self.timed("set_many", pipe.execute())
+
+    async def delete(self, *keys: str) -> None:
+        await self.timed("delete", self.redis.delete(*keys))
+
+    async def incr(self, key: str) -> int:
+        return await self.timed("incr", self.redis.incr(key))
+
+    async def transaction(
+        self,
+        sets: dict[str, tuple[bytes, int]],
+        patches: Patches,
+        incr: tuple[str, ...],
+        delete: tuple[str, ...],
+        publish: tuple[str, str] | None = None,
+    ) -> list[int]:
+        """One MULTI/EXEC, with the patched keys WATCHed while read"""
+        if patches:
+            try:
+                async with self.redis.pipeline(transaction=True) as pipe:
+                    await pipe.watch(*patches)
+                    current = await pipe.mget(list(patches))
+                    pipe.multi()
+                    patched = 0
+                    for (key, (patch, ex)), value in zip(
+                        patches.items(), current
+                    ):
+                        if value is not None:
+                            pipe.set(key, patch(value), ex=ex)
+                            patched += 1
+                    self._queue(pipe, sets, incr, delete, publish)
+                    results = await self.timed("transaction", pipe.execute())
+                first = patched + len(sets)
+                return results[first:][: len(incr)]
+            except WatchError:
+                logger.info(f"Cache keys changed while patched: {*patches,}")
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if patches:
+                pipe.delete(*patches)
+            self._queue(pipe, sets, incr, delete, publish)
+            results = await self.timed("transaction", pipe.execute())
+        first = (1 if patches else 0) + len(sets)
+        return results[first:][: len(incr)]
+
+    async def publish(self, channel: str, message: str) -> None:
+        await self.timed("publish", self.redis.publish(channel, message))
+
+    async def listen(self, channel: str) -> AsyncIterator[str | None]:
+        async with self.redis.pubsub() as pubsub:
+            await pubsub.subscribe(channel)
+            while True:
+                message = await pubsub.get_message(
+                    timeout=self.listen_poll_interval
+                )
+                if message is None:
+                    continue
+                if message["type"] == "subscribe":
+                    yield None
+                elif message["type"] == "message":
+                    yield message["data"]
+
+    def lock(self, name: str, timeout: float) -> CacheLock:
+        return RedisLock(self, self.redis.lock(name, timeout=timeout))
+
+    @staticmethod
+    def _queue(
+        pipe: Any,
+        sets: dict[str, tuple[bytes, int]],
+        incr: tuple[str, ...],
+        delete: tuple[str, ...],
+        publish: tuple[str, str] | None = None,
+    ) -> None:
+        for key, (value, ex) in sets.items():
+            pipe.set(key, value, ex=ex)
+        for key in incr:
+            pipe.incr(key)
+        if delete:
+            pipe.delete(*delete)
+        if publish is not None:
+            pipe.publish(*publish)
+
+
+class MemoryLock(CacheLock):
+    def __init__(self, backend: "MemoryBackend", name: str, timeout: float):
+        self.backend = backend
+        self.name = name
+        self.timeout = timeout
+
+    async def acquire(self) -> bool:
+        locks = self.backend.locks
+        now = self.backend.store.clock()
+        holder = locks.get(self.name)
+        if holder is not None and holder[0] > now:
+            return False
+        locks[self.name] = (now + self.timeout, self)
+        return True
+
+    async def release(self) -> None:
+        holder = self.backend.locks.get(self.name)
+        if holder is not None and holder[1] is self:
+            del self.backend.locks[self.name]
+
+
+class MemoryBackend(CacheBackend):
+    """
+    Cache in the memory of this process, for a single worker without
+    Redis. Each operation runs
+    without yielding to the event loop, so transactions are atomic.
+
+    Counters are kept apart from the LRU: evicting a tag generation
+    would bring the entries of an older one back.
+    """
+
+    name = "memory"
+
+    def __init__(
+        self,
+        max_entries: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.store = LocalCache(max_entries, math.inf, clock)
+        self.counters: dict[str, int] = {}
+        self.locks: dict[str, tuple[float, MemoryLock]] = {}
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        return self._get(key)
+
+    async def mget(self, keys: list[str]) -> list[bytes | None]:
+        return [self._get(key) for key in keys]
+
+    async def set(self, key: str, value: bytes, ex: int | None = None):
+        self._set(key, value, ex)
+
+    async def set_many(self, values: dict[str, bytes], ex: int | None = None):
+        for key, value in values.items():
+            self._set(key, value, ex)
+
+    async def delete(self, *keys: str) -> None:
+        self._delete(keys)
+
+    async def incr(self, key: str) -> int:
+        return self._incr(key)
+
+    async def transaction(
+        self,
+        sets: dict[str, tuple[bytes, int]],
+        patches: Patches,
+        incr: tuple[str, ...],
+        delete: tuple[str, ...],
+        publish: tuple[str, str] | None = None,
+    ) -> list[int]:
+        for key, (patch, ex) in patches.items():
+            value = self._get(key)
+            if value is not None:
+                self._set(key, patch(value), ex)
+        for key, (value, ex) in sets.items():
+            self._set(key, value, ex)
+        counters = [self._incr(key) for key in incr]
+        self._delete(delete)
+        if publish is not None:
+            self._publish(*publish)
+        return counters
+
+    async def publish(self, channel: str, message: str) -> None:
+        self._publish(channel, message)
+
+    async def listen(self, channel: str) -> AsyncIterator[str | None]:
+        messages: asyncio.Queue = asyncio.Queue()
+        subscribers = self._subscribers.setdefault(channel, set())
+        subscribers.add(messages)
+        try:
+            yield None
+            while True:
+                yield await messages.get()
+        finally:
+            subscribers.discard(messages)
+
+    def lock(self, name: str, timeout: float) -> CacheLock:
+        return MemoryLock(self, name, timeout)
+
+    def _get(self, key: str) -> bytes | None:
+        if key in self.counters:
+            return str(self.counters[key]).encode()
+        return self.store.get(key)
+
+    def _set(self, key: str, value: bytes, ex: int | None) -> None:
+        self.counters.pop(key, None)
+        self.store.set(key, value, ex)
+
+    def _delete(self, keys: tuple[str, ...]) -> None:
+        for key in keys:
+            self.counters.pop(key, None)
+        self.store.delete(*keys)
+
+    def _incr(self, key: str) -> int:
+        value = self.store.get(key)
+        self.store.delete(key)
+        count = self.counters.get(key, int(value) if value else 0) + 1
+        self.counters[key] = count
+        return count
+
+    def _publish(self, channel: str, message: str) -> None:
+        for messages in self._subscribers.get(channel, ()):
+            messages.put_nowait(message)
+
+
+class NullLock(CacheLock):
+    async def acquire(self) -> bool:
+        return True
+
+    async def release(self) -> None:
+        pass
+
+
+class NullBackend(CacheBackend):
+    """No shared cache: nothing is kept, every read misses"""
+
+    name = "none"
+
+    async def get(self, key: str) -> bytes | None:
+        return None
+
+    async def mget(self, keys: list[str]) -> list[bytes | None]:
+        return [None] * len(keys)
+
+    async def set(self, key: str, value: bytes, ex: int | None = None):
+        pass
+
+    async def set_many(self, values: dict[str, bytes], ex: int | None = None):
+        pass
+
+    async def delete(self, *keys: str) -> None:
+        pass
+
+    async def incr(self, key: str) -> int:
+        return 0
+
+    async def transaction(
+        self,
+        sets: dict[str, tuple[bytes, int]],
+        patches: Patches,
+        incr: tuple[str, ...],
+        delete: tuple[str, ...],
+        publish: tuple[str, str] | None = None,
+    ) -> list[int]:
+        return [0] * len(incr)
+
+    async def publish(self, channel: str, message: str) -> None:
+        pass
+
+    async def listen(self, channel: str) -> AsyncIterator[str | None]:
+        # Never subscribed: a local tier would not learn of other
+        # workers' writes
+        await asyncio.Event().wait()
+        yield None
+
+    def lock(self, name: str, timeout: float) -> CacheLock:
+        return NullLock()
+
+
+class CircuitBreakerLock(CacheLock):
+    """Lock of whichever backend the breaker picks when acquiring it"""
+
+    def __init__(self, breaker: "CircuitBreaker", name: str, timeout: float):
+        self.breaker = breaker
+        self.name = name
+        self.timeout = timeout
+        self.acquired: CacheLock | None = None
+
+    async def acquire(self) -> bool:
+        async def acquire(backend: CacheBackend) -> bool:
+            lock = backend.lock(self.name, self.timeout)
+            if not await lock.acquire():
+                return False
+            self.acquired = lock
+            return True
+
+        return await self.breaker.call(acquire)
+
+    async def release(self) -> None:
+        if self.acquired is None:
+            return
+        try:
+            await self.acquired.release()
+        except Exception as e:
+            logger.warning(f"Cache lock {self.name} left to expire: {e}")
+        self.acquired = None
+
+
+class CircuitBreaker(CacheBackend):
+    """
+    A backend, `primary`, replaced by `fallback` while it misbehaves.
+
+    Calls failing or taking longer than `timeout` are answered by the
+    fallback. Those failing or slower than `slow_call` count as failed;
+    when at least `failure_ratio` of the last `window` calls, and of at
+    least `min_calls` calls, have failed, the breaker opens and every
+    call goes to the fallback. After `open_duration`, a single call is
+    let through to probe the primary: the breaker closes if it succeeds
+    and opens again otherwise.
+
+    Keys written to the fallback instead of the primary are deleted from
+    the primary, or incremented for counters, once it answers again, so
+    that it does not serve values older than the fallback wrote. Up to
+    `max_replay` keys are remembered; beyond that, the primary may serve
+    stale values until they expire.
+
+    A fallback in the memory of one worker misses the writes and tag
+    generation bumps of the others, and may serve what they changed for
+    as long as its entries live.
+    """
+
+    def __init__(
+        self,
+        primary: CacheBackend,
+        fallback: CacheBackend,
+        timeout: float = 0.5,
+        slow_call: float = 0.1,
+        failure_ratio: float = 0.5,
+        window: int = 20,
+        min_calls: int = 10,
+        open_duration: float = 5.0,
+        max_replay: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.primary = primary
+        self.fallback = fallback
+        self.name = primary.name
+        self.timeout = timeout
+        self.slow_call = slow_call
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.open_duration = open_duration
+        self.max_replay = max_replay
+        self.clock = clock
+        self.state = "closed"
+        self.trips = 0
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probing = False
+        self._deleted: set[str] = set()
+        self._incremented: set[str] = set()
+
+    @property
+    def degraded(self) -> bool:
+        return self.state != "closed"
+
+    async def open(self) -> None:
+        await self.primary.open()
+        await self.fallback.open()
+
+    async def close(self) -> None:
+        await self.primary.close()
+        await self.fallback.close()
+
+    def pool_stats(self) -> CachePoolStats | None:
+        return self.primary.pool_stats()
+
+    def latency_stats(self) -> dict[str, CacheLatencyStats]:
+        return self.primary.latency_stats()
+
+    async def call(
+        self,
+        operation: Callable[[CacheBackend], Awaitable[T]],
+        deleted: tuple[str, ...] = (),
+        incremented: tuple[str, ...] = (),
+    ) -> T:
+        """
+        Run `operation` on the primary, or on the fallback when the
+        breaker is open or the primary fails. `deleted` and
+        `incremented` are the keys it writes, to be replayed on the
+        primary if it is not the one writing them.
+        """
+        if not self._allow():
+            self._remember(deleted, incremented)
+            return await operation(self.fallback)
+
+        probe = self.state == "half-open"
+        started = self.clock()
+        try:
+            result = await asyncio.wait_for(
+                operation(self.primary), self.timeout
+            )
+        except asyncio.CancelledError:
+            # A probe cut short proves nothing, but must not keep the
+            # breaker waiting for its outcome forever
+            if probe:
+                self._record(False)
+            raise
+        except Exception as e:
+            self._record(False)
+            logger.warning(f"Cache backend {self.name} failed: {e!r}")
+            self._remember(deleted, incremented)
+            return await operation(self.fallback)
+        self._record(self.clock() - started <= self.slow_call)
+        if self._deleted or self._incremented:
+            await self._replay()
+        return result
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.call(lambda backend: backend.get(key))
+
+    async def mget(self, keys: list[str]) -> list[bytes | None]:
+        return await self.call(lambda backend: backend.mget(keys))
+
+    async def set(self, key: str, value: bytes, ex: int | None = None):
+        await self.call(
+            lambda backend: backend.set(key, value, ex=ex), deleted=(key,)
+        )
+
+    async def set_many(self, values: dict[str, bytes], ex: int | None = None):
+        await self.call(
+            lambda backend: backend.set_many(values, ex=ex),
+            deleted=tuple(values),
+        )
+
+    async def delete(self, *keys: str) -> None:
+        await self.call(lambda backend: backend.delete(*keys), deleted=keys)
+
+    async def incr(self, key: str) -> int:
+        return await self.call(
+            lambda backend: backend.incr(key), incremented=(key,)
+        )
+
+    async def transaction(
+        self,
+        sets: dict[str, tuple[bytes, int]],
+        patches: Patches,
+        incr: tuple[str, ...],
+        delete: tuple[str, ...],
+        publish: tuple[str, str] | None = None,
+    ) -> list[int]:
+        return await self.call(
+            lambda backend: backend.transaction(
+                sets, patches, incr, delete, publish
+            ),
+            deleted=(*sets, *patches, *delete),
+            incremented=incr,
+        )
+
+    async def publish(self, channel: str, message: str) -> None:
+        await self.call(lambda backend: backend.publish(channel, message))
+
+    def listen(self, channel: str) -> AsyncIterator[str | None]:
+        # Only the primary reaches the other workers
+        return self.primary.listen(channel)
+
+    def lock(self, name: str, timeout: float) -> CacheLock:
+        return CircuitBreakerLock(self, name, timeout)
+
+    def _allow(self) -> bool:
+        """Whether the next call goes to the primary"""
+        if self.state == "closed":
+            return True
+        if self._probing:
+            return False
+        if self.clock() - self._opened_at < self.open_duration:
+            return False
+        self.state = "half-open"
+        self._probing = True
+        return True
+
+    def _record(self, succeeded: bool) -> None:
+        if self.state == "half-open":
+            self._probing = False
+            if succeeded:
+                logger.info(f"Cache backend {self.name} recovered")
+                self.state = "closed"
+                self._outcomes.clear()
+            else:
+                self._open()
+            return
+
+        self._outcomes.append(succeeded)
+        calls = len(self._outcomes)
+        failures = calls - sum(self._outcomes)
+        if calls >= self.min_calls and failures >= self.failure_ratio * calls:
+            logger.warning(
+                f"Cache backend {self.name} failing ({failures} of the "
+                f"last {calls} calls), falling back to {self.fallback.name}"
+            )
+            self._open()
+
+    def _open(self) -> None:
+        self.state = "open"
+        self.trips += 1
+        self._opened_at = self.clock()
+        self._outcomes.clear()
+
+    def _remember(
+        self, deleted: tuple[str, ...], incremented: tuple[str, ...]
+    ) -> None:
+        if len(self._deleted) + len(self._incremented) >= self.max_replay:
+            return
+        self._deleted.update(deleted)
+        self._incremented.update(incremented)
+
+    async def _replay(self) -> None:
+        deleted, incremented = self._deleted, self._incremented
+        self._deleted, self._incremented = set(), set()
+        try:
+            await asyncio.wait_for(
+                self.primary.transaction(
+                    {}, {}, tuple(incremented), tuple(deleted)
+                ),
+                self.timeout,
+            )
+        except Exception as e:
+            logger.warning(f"Cache backend {self.name} replay failed: {e!r}")
+            self._deleted |= deleted
+            self._incremented |= incremented
+
+
+def get_cache_backend(app_config: Settings) -> CacheBackend:
+    """The backend selected by CACHE_BACKEND"""
+    if app_config.CACHE_BACKEND == "none":
+        return NullBackend()
+    if app_config.CACHE_BACKEND == "memory":
+        return MemoryBackend(app_config.CACHE_MEMORY_MAX_ENTRIES)
+
+    def connect() -> aioredis.Redis:
+        pool = ObservedConnectionPool(
+            host=app_config.REDIS_HOST,
+            port=app_config.REDIS_PORT,
+            max_connections=app_config.REDIS_MAX_CONNECTIONS,
+            timeout=app_config.REDIS_POOL_TIMEOUT,
+            socket_connect_timeout=app_config.REDIS_CONNECT_TIMEOUT,
+            socket_timeout=app_config.REDIS_SOCKET_TIMEOUT,
+            health_check_interval=app_config.REDIS_HEALTH_CHECK_INTERVAL,
+        )
+        # Values are bytes: cached responses are stored exactly as they
+        # are sent
+        return aioredis.Redis(connection_pool=pool)
+
+    return CircuitBreaker(
+        RedisBackend(connect=connect),
+        # Not memory: the workers would each cache apart, blind to what
+        # the others write
+        NullBackend(),
+        timeout=app_config.CACHE_BREAKER_TIMEOUT,
+        slow_call=app_config.CACHE_BREAKER_SLOW_CALL,
+        failure_ratio=app_config.CACHE_BREAKER_FAILURE_RATIO,
+        window=app_config.CACHE_BREAKER_WINDOW,
+        min_calls=app_config.CACHE_BREAKER_MIN_CALLS,
+        open_duration=app_config.CACHE_BREAKER_OPEN_DURATION,
+    )
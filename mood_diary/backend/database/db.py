@@ -1,17 +1,60 @@
 import sqlite3
 
-from mood_diary.backend.repositories.sqlite.user import (
-    SQLiteUserRepository as UserRepository,
-)
-from mood_diary.backend.repositories.sqlite.mood import (
-    SQLiteMoodRepository as MoodRepository,
-)
+from mood_diary.backend.config import Settings
+from mood_diary.backend.database.migrations.base import Migration
+from mood_diary.backend.database.migrations.runner import MigrationRunner
+from mood_diary.backend.database.migrations.versions import get_migrations
+from mood_diary.backend.repositories.sqlite.codecs import MoodStampStorage
 
 
-def init_db(db_path: str):
+def get_sqlite_pragmas(app_config: Settings) -> dict[str, str | int]:
+    """
+    Storage profile applied to every SQLite connection.
+    journal_mode goes first: it is persistent and affects the others.
+    """
+    return {
+        "journal_mode": app_config.SQLITE_JOURNAL_MODE,
+        "synchronous": app_config.SQLITE_SYNCHRONOUS,
+        "busy_timeout": app_config.SQLITE_BUSY_TIMEOUT,
+        "cache_size": app_config.SQLITE_CACHE_SIZE,
+        "mmap_size": app_config.SQLITE_MMAP_SIZE,
+        "temp_store": app_config.SQLITE_TEMP_STORE,
+    }
+
+
+def apply_pragmas(
+    conn: sqlite3.Connection, pragmas: dict[str, str | int]
+) -> None:
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+def init_db(
+    db_path: str,
+    pragmas: dict[str, str | int] | None = None,
+    storage: MoodStampStorage = "text",
+):
+    """Create the database or bring it to the latest schema in one go"""
     conn = sqlite3.connect(db_path)
+    try:
+        apply_pragmas(conn, pragmas or {})
+        MigrationRunner(get_migrations(storage)).upgrade(conn)
+    finally:
+        conn.close()
 
-    UserRepository(conn).init_db()
-    MoodRepository(conn).init_db()
 
-    conn.close()
+def migrate_schema(
+    db_path: str,
+    pragmas: dict[str, str | int],
+    runner: MigrationRunner,
+) -> list[Migration]:
+    """
+    Apply pending migrations up to the first backfill with rows to rewrite.
+    Returns the migrations left to run in the background.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        apply_pragmas(conn, pragmas)
+        return runner.upgrade_schema(conn)
+    finally:
+        conn.close()
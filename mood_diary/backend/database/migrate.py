@@ -0,0 +1,66 @@
+"""
+Inspect or apply schema migrations of the configured SQLite database.
+
+Backfills run in small batches with a pause in between, so an application
+using the same database keeps serving while they proceed. Restart the
+application afterwards when a migration changes the moodstamps storage.
+
+Usage: python -m mood_diary.backend.database.migrate [status|upgrade]
+"""
+
+import argparse
+import logging
+import sqlite3
+
+from mood_diary.backend.config import config
+from mood_diary.backend.database.db import apply_pragmas, get_sqlite_pragmas
+from mood_diary.backend.database.migrations.runner import MigrationRunner
+from mood_diary.backend.database.migrations.versions import get_migrations
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "command", choices=["status", "upgrade"], nargs="?", default="status"
+    )
+    parser.add_argument("--db", default=config.SQLITE_DB_PATH)
+    parser.add_argument(
+        "--batch-size", type=int, default=config.SQLITE_MIGRATION_BATCH_SIZE
+    )
+    parser.add_argument(
+        "--pause", type=float, default=config.SQLITE_MIGRATION_BATCH_PAUSE
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=config.LOGGING_LEVEL,
+        format=config.LOGGING_FORMAT,
+        datefmt=config.LOGGING_DATE_FORMAT,
+    )
+
+    runner = MigrationRunner(
+        get_migrations(config.SQLITE_MOODSTAMPS_STORAGE),
+        batch_size=args.batch_size,
+        pause=args.pause,
+    )
+    conn = sqlite3.connect(args.db)
+    try:
+        apply_pragmas(conn, get_sqlite_pragmas(config))
+        if args.command == "upgrade":
+            applied = runner.upgrade(conn)
+            print(f"Applied {len(applied)} migration(s)")
+            for migration in applied:
+                print(f"  {migration}")
+        else:
+            pending = {m.version for m in runner.pending(conn)}
+            for migration in runner.migrations:
+                state = (
+                    "pending" if migration.version in pending else "applied"
+                )
+                print(f"{state:<8} {migration}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import sqlite3
+from abc import ABC, abstractmethod
+
+
+class Migration(ABC):
+    """
+    One step of the schema history. The version is recorded in
+    schema_version once the migration has been applied and must never
+    change after a release.
+    """
+
+    def __init__(self, version: int, name: str):
+        self.version = version
+        self.name = name
+
+    def __str__(self) -> str:
+        return f"{self.version:04d}_{self.name}"
+
+
+class SchemaMigration(Migration):
+    """Migration applied in a single transaction"""
+
+    @abstractmethod
+    def apply(self, conn: sqlite3.Connection) -> None:
+        """Runs inside a transaction opened by the runner, never commits"""
+        pass
+
+
+class Backfill(Migration):
+    """
+    Migration that rewrites existing rows.
+
+    The work is split into steps and every step runs in its own short
+    transaction, so other writers get the database between them. Progress
+    is kept in the database itself: an interrupted backfill resumes from
+    the last committed step.
+    """
+
+    @abstractmethod
+    def prepare(self, conn: sqlite3.Connection) -> bool:
+        """
+        Set up (or find) the state of the backfill.
+        Returns False when there is nothing to rewrite.
+        """
+        pass
+
+    @abstractmethod
+    def copy_batch(self, conn: sqlite3.Connection, size: int) -> int:
+        """Copy the next batch of rows. Returns 0 once everything is copied"""
+        pass
+
+    @abstractmethod
+    def catch_up(self, conn: sqlite3.Connection, size: int) -> int:
+        """
+        Copy again up to `size` rows written since they were copied.
+        Returns 0 when there is nothing left to catch up on.
+        """
+        pass
+
+    @abstractmethod
+    def finish(self, conn: sqlite3.Connection) -> None:
+        """
+        Apply the last changes and switch to the rewritten data.
+        Inside the application it runs while no request holds a
+        connection.
+        """
+        pass
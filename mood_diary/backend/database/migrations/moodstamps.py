@@ -0,0 +1,235 @@
+import sqlite3
+
+from mood_diary.backend.database.migrations.base import (
+    Backfill,
+    SchemaMigration,
+)
+from mood_diary.backend.repositories.sqlite.codecs import (
+    MoodStampCodec,
+    MoodStampStorage,
+    get_moodstamp_codec,
+)
+from mood_diary.backend.repositories.sqlite.mood import (
+    COLUMNS,
+    SQLiteMoodRepository,
+)
+
+
+def get_moodstamps_storage(
+    conn: sqlite3.Connection,
+) -> MoodStampStorage | None:
+    """Layout of an existing moodstamps table, None if there is none"""
+    columns = {
+        row[1]: row[2].upper()
+        for row in conn.execute("PRAGMA table_info(moodstamps)")
+    }
+    if not columns:
+        return None
+    return "compact" if columns["id"] == "BLOB" else "text"
+
+
+def is_moodstamps_clustered(conn: sqlite3.Connection) -> bool:
+    """Whether moodstamps is a WITHOUT ROWID table"""
+    row = conn.execute(
+        "SELECT wr FROM pragma_table_list WHERE name = 'moodstamps'"
+    ).fetchone()
+    return bool(row and row[0])
+
+
+def table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (name,),
+    ).fetchone()
+    return row is not None
+
+
+class CreateMoodstamps(SchemaMigration):
+    def __init__(self, version: int, name: str, storage: MoodStampStorage):
+        super().__init__(version, name)
+        self.storage = storage
+
+    def apply(self, conn: sqlite3.Connection) -> None:
+        if (
+            get_moodstamps_storage(conn) == "compact"
+            and self.storage == "text"
+        ):
+            raise RuntimeError(
+                "Moodstamps are stored in the compact layout, "
+                "switching back to text storage is not supported"
+            )
+        codec = get_moodstamp_codec(self.storage)
+        SQLiteMoodRepository(conn, codec=codec).create_table()
+
+
+class RewriteMoodstamps(Backfill):
+    """
+    Rebuild moodstamps into the current clustered table layout,
+    optionally converting it to another storage.
+
+    Rows are copied in (user_id, date) order into a new table. While the
+    copy runs, triggers on the live table record the keys of rows that
+    are written, and those rows are copied again before the new table
+    replaces the old one.
+    """
+
+    def __init__(
+        self,
+        version: int,
+        name: str,
+        storage: MoodStampStorage | None = None,
+    ):
+        """`storage` None keeps the storage the table already uses"""
+        super().__init__(version, name)
+        self.storage = storage
+        self.table = f"moodstamps_v{version}"
+        self.changes = f"{self.table}_changes"
+        self.progress = f"{self.table}_progress"
+
+    def needs_rewrite(self, conn: sqlite3.Connection) -> bool:
+        current = get_moodstamps_storage(conn)
+        if current is None:
+            return False
+        if self.storage is not None and current != self.storage:
+            return True
+        return not is_moodstamps_clustered(conn)
+
+    def prepare(self, conn: sqlite3.Connection) -> bool:
+        if table_exists(conn, self.table):
+            # Resuming an interrupted backfill
+            return True
+        if not self.needs_rewrite(conn):
+            return False
+
+        _, target = self._codecs(conn)
+        SQLiteMoodRepository(conn, codec=target).create_table(self.table)
+        conn.execute(
+            f"CREATE TABLE {self.changes} ("
+            "user_id, date, PRIMARY KEY (user_id, date)"
+            ") WITHOUT ROWID"
+        )
+        conn.execute(
+            f"CREATE TABLE {self.progress} ("
+            "last_user_id, last_date, copied INTEGER NOT NULL"
+            ")"
+        )
+        conn.execute(f"INSERT INTO {self.progress} VALUES (NULL, NULL, 0)")
+
+        # Dropped together with the old table in finish()
+        for event, row in (
+            ("INSERT", "NEW"),
+            ("UPDATE", "NEW"),
+            ("DELETE", "OLD"),
+        ):
+            conn.execute(
+                f"CREATE TRIGGER {self.table}_{event.lower()} "
+                f"AFTER {event} ON moodstamps BEGIN "
+                f"INSERT OR IGNORE INTO {self.changes} "
+                f"VALUES ({row}.user_id, {row}.date); "
+                "END"
+            )
+        return True
+
+    def copy_batch(self, conn: sqlite3.Connection, size: int) -> int:
+        source, target = self._codecs(conn)
+        last_user_id, last_date = conn.execute(
+            f"SELECT last_user_id, last_date FROM {self.progress}"
+        ).fetchone()
+
+        columns = ", ".join(COLUMNS)
+        if last_user_id is None:
+            rows = conn.execute(
+                f"SELECT {columns} FROM moodstamps "
+                "ORDER BY user_id, date LIMIT ?",
+                (size,),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                f"SELECT {columns} FROM moodstamps "
+                "WHERE (user_id, date) > (?, ?) "
+                "ORDER BY user_id, date LIMIT ?",
+                (last_user_id, last_date, size),
+            ).fetchall()
+        if not rows:
+            return 0
+
+        self._write_rows(conn, source, target, rows)
+        conn.execute(
+            f"UPDATE {self.progress} "
+            "SET last_user_id = ?, last_date = ?, copied = copied + ?",
+            (rows[-1][1], rows[-1][2], len(rows)),
+        )
+        return len(rows)
+
+    def catch_up(self, conn: sqlite3.Connection, size: int) -> int:
+        source, target = self._codecs(conn)
+        keys = conn.execute(
+            f"SELECT user_id, date FROM {self.changes} LIMIT ?", (size,)
+        ).fetchall()
+
+        for user_id, date in keys:
+            row = conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM moodstamps "
+                "WHERE user_id = ? AND date = ?",
+                (user_id, date),
+            ).fetchone()
+            if row is not None:
+                self._write_rows(conn, source, target, [row])
+            else:
+                conn.execute(
+                    f"DELETE FROM {self.table} WHERE user_id = ? AND date = ?",
+                    (
+                        target.encode_uuid(source.decode_uuid(user_id)),
+                        target.encode_date(source.decode_date(date)),
+                    ),
+                )
+            conn.execute(
+                f"DELETE FROM {self.changes} WHERE user_id = ? AND date = ?",
+                (user_id, date),
+            )
+        return len(keys)
+
+    def finish(self, conn: sqlite3.Connection) -> None:
+        while self.catch_up(conn, 1000):
+            pass
+        conn.execute("DROP TABLE moodstamps")
+        conn.execute(f"DROP TABLE {self.changes}")
+        conn.execute(f"DROP TABLE {self.progress}")
+        conn.execute(f"ALTER TABLE {self.table} RENAME TO moodstamps")
+
+    def _codecs(
+        self, conn: sqlite3.Connection
+    ) -> tuple[MoodStampCodec, MoodStampCodec]:
+        source = get_moodstamps_storage(conn) or "text"
+        return (
+            get_moodstamp_codec(source),
+            get_moodstamp_codec(self.storage or source),
+        )
+
+    def _write_rows(
+        self,
+        conn: sqlite3.Connection,
+        source: MoodStampCodec,
+        target: MoodStampCodec,
+        rows: list,
+    ) -> None:
+        if source.storage == target.storage:
+            rows = [tuple(row) for row in rows]
+        else:
+            rows = [
+                (
+                    target.encode_uuid(source.decode_uuid(row[0])),
+                    target.encode_uuid(source.decode_uuid(row[1])),
+                    target.encode_date(source.decode_date(row[2])),
+                    row[3],
+                    row[4],
+                    target.encode_timestamp(source.decode_timestamp(row[5])),
+                    target.encode_timestamp(source.decode_timestamp(row[6])),
+                )
+                for row in rows
+            ]
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {self.table} ({', '.join(COLUMNS)}) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
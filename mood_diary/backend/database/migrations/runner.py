@@ -0,0 +1,209 @@
+import asyncio
+import functools
+import logging
+import sqlite3
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, TypeVar
+
+from mood_diary.backend.database.migrations.base import (
+    Backfill,
+    Migration,
+    SchemaMigration,
+)
+from mood_diary.backend.exceptions.database import DatabaseBusy
+
+if TYPE_CHECKING:
+    from mood_diary.backend.database.pool import SQLiteConnectionPool
+    from mood_diary.backend.database.writer import SQLiteWriteQueue
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+class MigrationRunner:
+    """
+    Applies migrations in version order and records every applied one in
+    the schema_version table.
+
+    A version that is missing from schema_version is pending even when
+    later versions are applied, so opt-in migrations can be added to an
+    existing database. A recorded version this runner does not know about
+    means the database was migrated by a newer or differently configured
+    application, and is refused.
+    """
+
+    def __init__(
+        self,
+        migrations: list[Migration],
+        batch_size: int = 1000,
+        pause: float = 0.0,
+    ):
+        self.migrations = sorted(migrations, key=lambda m: m.version)
+        self.batch_size = batch_size
+        self.pause = pause
+
+    def applied_versions(self, conn: sqlite3.Connection) -> set[int]:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        conn.commit()
+        return {
+            row[0]
+            for row in conn.execute("SELECT version FROM schema_version")
+        }
+
+    def pending(self, conn: sqlite3.Connection) -> list[Migration]:
+        applied = self.applied_versions(conn)
+        unknown = applied - {m.version for m in self.migrations}
+        if unknown:
+            raise RuntimeError(
+                f"Database has migration(s) {sorted(unknown)} applied "
+                f"that this configuration does not know about"
+            )
+        return [m for m in self.migrations if m.version not in applied]
+
+    def upgrade(self, conn: sqlite3.Connection) -> list[Migration]:
+        """
+        Apply every pending migration on `conn`, backfills included.
+        Returns the applied migrations.
+        """
+        pending = self.pending(conn)
+        for migration in pending:
+            if isinstance(migration, Backfill):
+                self._backfill(conn, migration)
+            elif isinstance(migration, SchemaMigration):
+                self._transaction(conn, self._apply, migration)
+        return pending
+
+    def upgrade_schema(self, conn: sqlite3.Connection) -> list[Migration]:
+        """
+        Apply pending migrations up to the first backfill that has rows to
+        rewrite. Returns the migrations left for `backfill`.
+        """
+        pending = self.pending(conn)
+        for i, migration in enumerate(pending):
+            if isinstance(migration, Backfill):
+                if self._transaction(conn, self._prepare, migration):
+                    return pending[i:]
+            elif isinstance(migration, SchemaMigration):
+                self._transaction(conn, self._apply, migration)
+        return []
+
+    async def backfill(
+        self,
+        migrations: list[Migration],
+        writer: "SQLiteWriteQueue",
+        pool: "SQLiteConnectionPool",
+        on_switch: Callable[[], Awaitable[None]] | None = None,
+    ) -> None:
+        """
+        Apply migrations left by `upgrade_schema` while the application
+        serves requests.
+
+        Every step goes through the write queue, so it is serialized with
+        the application writes and holds the write lock for one batch.
+        The final switch waits until no request holds a pooled connection
+        and `on_switch` runs before any request gets one again.
+        """
+        for migration in migrations:
+            if isinstance(migration, Backfill):
+                await self._backfill_online(migration, writer, pool, on_switch)
+            elif isinstance(migration, SchemaMigration):
+                await writer.submit(functools.partial(self._apply, migration))
+
+    async def _backfill_online(
+        self,
+        migration: Backfill,
+        writer: "SQLiteWriteQueue",
+        pool: "SQLiteConnectionPool",
+        on_switch: Callable[[], Awaitable[None]] | None,
+    ) -> None:
+        if not await writer.submit(
+            functools.partial(self._prepare, migration)
+        ):
+            return
+
+        for step in (migration.copy_batch, migration.catch_up):
+            batch = functools.partial(step, size=self.batch_size)
+            total = 0
+            while rows := await writer.submit(batch):
+                total += rows
+                await asyncio.sleep(self.pause)
+            self._log_step(migration, step, total)
+
+        while True:
+            try:
+                async with pool.exclusive():
+                    await writer.submit(
+                        functools.partial(self._finish, migration)
+                    )
+                    if on_switch is not None:
+                        await on_switch()
+                return
+            except DatabaseBusy:
+                logger.warning(f"Waiting for requests to finish {migration}")
+
+    def _backfill(self, conn: sqlite3.Connection, migration: Backfill) -> None:
+        if not self._transaction(conn, self._prepare, migration):
+            return
+
+        for step in (migration.copy_batch, migration.catch_up):
+            batch = functools.partial(step, size=self.batch_size)
+            total = 0
+            while rows := self._transaction(conn, batch):
+                total += rows
+                time.sleep(self.pause)
+            self._log_step(migration, step, total)
+
+        self._transaction(conn, self._finish, migration)
+
+    def _log_step(
+        self, migration: Backfill, step: Callable, rows: int
+    ) -> None:
+        logger.info(f"{migration}: {step.__name__} done, {rows} row(s)")
+
+    def _apply(
+        self, migration: SchemaMigration, conn: sqlite3.Connection
+    ) -> None:
+        migration.apply(conn)
+        self._record(conn, migration)
+
+    def _prepare(self, migration: Backfill, conn: sqlite3.Connection) -> bool:
+        if migration.prepare(conn):
+            logger.info(f"Backfilling {migration}")
+            return True
+        self._record(conn, migration)
+        return False
+
+    def _finish(self, migration: Backfill, conn: sqlite3.Connection) -> None:
+        migration.finish(conn)
+        self._record(conn, migration)
+
+    def _record(self, conn: sqlite3.Connection, migration: Migration) -> None:
+        conn.execute(
+            "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+            (migration.version, migration.name),
+        )
+        logger.info(f"Applied migration {migration}")
+
+    def _transaction(
+        self,
+        conn: sqlite3.Connection,
+        func: Callable[..., T],
+        *args,
+    ) -> T:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = func(*args, conn)
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
@@ -0,0 +1,9 @@
+import sqlite3
+
+from mood_diary.backend.database.migrations.base import SchemaMigration
+from mood_diary.backend.repositories.sqlite.user import SQLiteUserRepository
+
+
+class CreateUsers(SchemaMigration):
+    def apply(self, conn: sqlite3.Connection) -> None:
+        SQLiteUserRepository(conn).create_table()
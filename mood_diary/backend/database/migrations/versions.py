@@ -0,0 +1,25 @@
+from mood_diary.backend.database.migrations.base import Migration
+from mood_diary.backend.database.migrations.moodstamps import (
+    CreateMoodstamps,
+    RewriteMoodstamps,
+)
+from mood_diary.backend.database.migrations.users import CreateUsers
+from mood_diary.backend.repositories.sqlite.codecs import MoodStampStorage
+
+
+def get_migrations(storage: MoodStampStorage) -> list[Migration]:
+    """
+    Schema history, in order. Append new migrations with the next
+    version number; never renumber or remove released ones.
+    """
+    migrations: list[Migration] = [
+        CreateUsers(1, "create_users"),
+        CreateMoodstamps(2, "create_moodstamps", storage),
+        RewriteMoodstamps(3, "cluster_moodstamps"),
+    ]
+    if storage == "compact":
+        # Opt-in, so it may be applied after later versions
+        migrations.append(
+            RewriteMoodstamps(4, "compact_moodstamps", storage="compact")
+        )
+    return migrations
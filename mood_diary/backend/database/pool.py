@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from mood_diary.backend.database.db import apply_pragmas
+from mood_diary.backend.exceptions.database import DatabaseBusy
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteConnectionPool:
+    """
+    Bounded pool of SQLite connections with a dedicated executor.
+
+    Connections are opened lazily up to `size`, configured with `pragmas`
+    and handed out one request at a time. Blocking sqlite3 calls are meant
+    to run on `executor` so they never stall the event loop.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        size: int,
+        acquire_timeout: float,
+        pragmas: dict[str, str | int] | None = None,
+    ):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+
+        self.db_path = db_path
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self.pragmas = pragmas or {}
+        self.executor = ThreadPoolExecutor(
+            max_workers=size, thread_name_prefix="sqlite"
+        )
+
+        self._idle: asyncio.Queue[sqlite3.Connection] = asyncio.Queue()
+        self._connections: list[sqlite3.Connection] = []
+        self._lock = asyncio.Lock()
+        self._closed = False
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        apply_pragmas(conn, self.pragmas)
+        return conn
+
+    async def acquire(self) -> sqlite3.Connection:
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+
+        if self._idle.empty():
+            async with self._lock:
+                if len(self._connections) < self.size:
+                    loop = asyncio.get_running_loop()
+                    conn = await loop.run_in_executor(
+                        self.executor, self.connect
+                    )
+                    self._connections.append(conn)
+                    return conn
+
+        try:
+            return await asyncio.wait_for(
+                self._idle.get(), timeout=self.acquire_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"No SQLite connection became available within "
+                f"{self.acquire_timeout}s (pool size {self.size})"
+            )
+            raise DatabaseBusy()
+
+    async def release(self, conn: sqlite3.Connection) -> None:
+        if self._closed:
+            conn.close()
+            return
+
+        if conn.in_transaction:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, conn.rollback)
+
+        self._idle.put_nowait(conn)
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[sqlite3.Connection]:
+        conn = await self.acquire()
+        try:
+            yield conn
+        finally:
+            await self.release(conn)
+
+    @asynccontextmanager
+    async def exclusive(self) -> AsyncIterator[list[sqlite3.Connection]]:
+        """
+        Hold every connection of the pool. Waits for in-flight requests
+        to give theirs back; new requests wait until the block exits.
+        """
+        held: list[sqlite3.Connection] = []
+        try:
+            for _ in range(self.size):
+                held.append(await self.acquire())
+            yield held
+        finally:
+            for conn in held:
+                await self.release(conn)
+
+    def close(self) -> None:
+        self._closed = True
+        for conn in self._connections:
+            conn.close()
+        self._connections.clear()
+        self.executor.shutdown(wait=True)
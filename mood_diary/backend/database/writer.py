@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from mood_diary.backend.database.db import apply_pragmas
+
+T = TypeVar("T")
+
+WriteFunc = Callable[[sqlite3.Connection], Any]
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteWriteQueue:
+    """
+    Single writer with group commit.
+
+    Every mutation is submitted as a function of a connection and executed
+    by one writer task on one dedicated connection. Writes that arrive
+    within `batch_window` seconds of the first one share a transaction, so
+    a burst of requests pays for a single commit. Each write runs inside
+    its own savepoint: a failing write is rolled back alone and its caller
+    gets the exception, while the rest of the batch is committed.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        batch_window: float,
+        max_batch: int,
+        max_queue: int,
+        pragmas: dict[str, str | int] | None = None,
+    ):
+        self.db_path = db_path
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.pragmas = pragmas or {}
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="sqlite-writer"
+        )
+
+        self.committed_batches = 0
+        self.committed_writes = 0
+
+        self._queue: asyncio.Queue[tuple[WriteFunc, asyncio.Future]] = (
+            asyncio.Queue(maxsize=max_queue)
+        )
+        self._connection: sqlite3.Connection | None = None
+        self._task: asyncio.Task | None = None
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        apply_pragmas(conn, self.pragmas)
+        return conn
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._connection = await loop.run_in_executor(
+            self.executor, self.connect
+        )
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(self, func: Callable[[sqlite3.Connection], T]) -> T:
+        if self._task is None or self._task.done():
+            raise RuntimeError("Write queue is not running")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((func, future))
+        return await future
+
+    async def close(self) -> None:
+        if self._task is not None:
+            await self._queue.join()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        self.executor.shutdown(wait=True)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(
+                        await asyncio.wait_for(self._queue.get(), timeout)
+                    )
+                except asyncio.TimeoutError:
+                    break
+
+            results = await loop.run_in_executor(
+                self.executor,
+                self._commit_batch,
+                [func for func, _ in batch],
+            )
+
+            for (_, future), (ok, value) in zip(batch, results):
+                if not future.done():
+                    if ok:
+                        future.set_result(value)
+                    else:
+                        future.set_exception(value)
+                self._queue.task_done()
+
+    def _commit_batch(self, funcs: list[WriteFunc]) -> list[tuple[bool, Any]]:
+        conn = self._connection
+        if conn is None:
+            error = RuntimeError("Write queue is not connected")
+            return [(False, error)] * len(funcs)
+
+        results: list[tuple[bool, Any]] = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for func in funcs:
+                conn.execute("SAVEPOINT write")
+                try:
+                    results.append((True, func(conn)))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write")
+                    results.append((False, e))
+                conn.execute("RELEASE write")
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Write batch of {len(funcs)} failed: {e}")
+            if conn.in_transaction:
+                conn.rollback()
+            return [(False, e)] * len(funcs)
+
+        self.committed_batches += 1
+        self.committed_writes += len(funcs)
+        return results
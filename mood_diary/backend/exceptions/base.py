@@ -1,5 +1,11 @@
 class BaseApplicationException(Exception):
-    def __init__(self, message: str, http_status_code: int):
+    def __init__(
+        self,
+        message: str,
+        http_status_code: int,
+        headers: dict[str, str] | None = None,
+    ):
         super().__init__(message)
         self.message = message
         self.http_status_code = http_status_code
+        self.headers = headers
@@ -0,0 +1,11 @@
+from fastapi import status
+
+from mood_diary.backend.exceptions.base import BaseApplicationException
+
+
+class DatabaseBusy(BaseApplicationException):
+    def __init__(self):
+        super().__init__(
+            "Database is busy, please retry later",
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
@@ -29,5 +29,12 @@ class IncorrectMoodValue(BaseApplicationException):
         )
 
 
+class InvalidMoodStampCursor(BaseApplicationException):
+    def __init__(self):
+        super().__init__(
+            "MoodStamp cursor is invalid", status.HTTP_400_BAD_REQUEST
+        )
+
+
 class MoodStampAlreadyExistsErrorRepo(Exception):
     pass
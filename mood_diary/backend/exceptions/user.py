@@ -42,3 +42,12 @@ class InvalidOrExpiredAccessToken(BaseApplicationException):
         super().__init__(
             "Invalid or expired access token", status.HTTP_401_UNAUTHORIZED
         )
+
+
+class PasswordHashingBusy(BaseApplicationException):
+    def __init__(self, retry_after: int):
+        super().__init__(
+            "Too many password checks in progress, please retry later",
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": str(retry_after)},
+        )
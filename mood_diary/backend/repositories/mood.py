@@ -7,7 +7,10 @@ from mood_diary.backend.repositories.sсhemas.mood import (
     MoodStamp,
     CreateMoodStamp,
     UpdateMoodStamp,
+    JSONMoodStampRows,
     MoodStampFilter,
+    MoodStampsVersion,
+    PartialMoodStamp,
 )
 
 
@@ -23,13 +26,29 @@ class MoodStampRepository(BaseRepository):
     @abstractmethod
     async def get_many(
         self, user_id: UUID, body: MoodStampFilter
-    ) -> list[MoodStamp]:
+    ) -> list[MoodStamp] | list[PartialMoodStamp]:
         """
-        Get multiple moodstamps based on filter criteria.
+        Get multiple moodstamps based on filter criteria, ordered by date.
+        With `body.fields` set only those fields are read and returned.
         Returns empty list if no stamps found
         """
         pass
 
+    @abstractmethod
+    async def get_many_json(
+        self, user_id: UUID, body: MoodStampFilter
+    ) -> JSONMoodStampRows:
+        """
+        Same selection as get_many, serialized to a JSON array by the
+        database. `body.limit` is the exact page size.
+        """
+        pass
+
+    @abstractmethod
+    async def get_version(self, user_id: UUID) -> MoodStampsVersion:
+        """Number of moodstamps of a user and when they were last updated"""
+        pass
+
     @abstractmethod
     async def create(self, user_id: UUID, body: CreateMoodStamp) -> MoodStamp:
         """
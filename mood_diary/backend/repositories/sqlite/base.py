@@ -0,0 +1,109 @@
+import asyncio
+import functools
+import logging
+import random
+import sqlite3
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, TypeVar
+
+from mood_diary.backend.config import config
+from mood_diary.backend.exceptions.database import DatabaseBusy
+
+if TYPE_CHECKING:
+    from mood_diary.backend.database.writer import SQLiteWriteQueue
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+LOCK_ERROR_CODES = (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+
+
+def is_lock_error(error: sqlite3.OperationalError) -> bool:
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        # Extended result codes keep the primary code in the low byte
+        return code & 0xFF in LOCK_ERROR_CODES
+    return "locked" in str(error) or "busy" in str(error)
+
+
+class SQLiteRepository:
+    def __init__(
+        self,
+        connection: sqlite3.Connection,
+        executor: Executor | None = None,
+        writer: "SQLiteWriteQueue | None" = None,
+    ):
+        self.connection = connection
+        self.executor = executor
+        self.writer = writer
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        Run blocking sqlite3 work off the event loop.
+        Uses the loop's default executor when none was provided.
+        """
+        loop = asyncio.get_running_loop()
+        call = functools.partial(self._call, func, *args)
+        return await self._retry(
+            lambda: loop.run_in_executor(self.executor, call), func.__name__
+        )
+
+    async def _write(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        Run a mutation `func(connection, *args)` and commit it.
+        Goes through the shared write queue when one is configured,
+        otherwise commits on this repository's own connection.
+        """
+        writer = self.writer
+        if writer is None:
+            return await self._run(self._commit_after, func, *args)
+
+        return await self._retry(
+            lambda: writer.submit(lambda conn: func(conn, *args)),
+            func.__name__,
+        )
+
+    async def _retry(
+        self, attempt_call: Callable[[], Awaitable[T]], name: str
+    ) -> T:
+        """
+        Lock errors are retried with jittered exponential backoff and
+        reported as DatabaseBusy once the attempts are exhausted.
+        """
+        attempts = max(1, config.SQLITE_LOCK_RETRY_ATTEMPTS)
+        attempt = 0
+
+        while True:
+            try:
+                return await attempt_call()
+            except sqlite3.OperationalError as e:
+                if not is_lock_error(e):
+                    raise
+                attempt += 1
+                if attempt == attempts:
+                    logger.error(
+                        f"Giving up on {name} after "
+                        f"{attempts} locked attempt(s): {e}"
+                    )
+                    raise DatabaseBusy() from e
+
+                delay = config.SQLITE_LOCK_RETRY_BACKOFF * 2 ** (attempt - 1)
+                logger.warning(
+                    f"Database locked in {name}, retrying "
+                    f"(attempt {attempt}/{attempts})"
+                )
+                await asyncio.sleep(random.uniform(0, delay))
+
+    def _call(self, func: Callable[..., T], *args: Any) -> T:
+        try:
+            return func(*args)
+        except sqlite3.OperationalError as e:
+            if is_lock_error(e) and self.connection.in_transaction:
+                self.connection.rollback()
+            raise
+
+    def _commit_after(self, func: Callable[..., T], *args: Any) -> T:
+        result = func(self.connection, *args)
+        self.connection.commit()
+        return result
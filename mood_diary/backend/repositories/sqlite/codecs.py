@@ -0,0 +1,151 @@
+from abc import ABC, abstractmethod
+from datetime import UTC, date, datetime, timedelta
+from typing import Any, Literal
+from uuid import UUID
+
+MoodStampStorage = Literal["text", "compact"]
+
+EPOCH_DAY = date(1970, 1, 1).toordinal()
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+class MoodStampCodec(ABC):
+    """
+    Converts moodstamp column values between domain types and the
+    representation stored in SQLite. Used only by the repository.
+    """
+
+    storage: MoodStampStorage
+
+    @abstractmethod
+    def encode_uuid(self, value: UUID) -> Any:
+        pass
+
+    @abstractmethod
+    def decode_uuid(self, value: Any) -> UUID:
+        pass
+
+    @abstractmethod
+    def encode_date(self, value: date) -> Any:
+        pass
+
+    @abstractmethod
+    def decode_date(self, value: Any) -> date:
+        pass
+
+    @abstractmethod
+    def encode_timestamp(self, value: datetime | None) -> Any:
+        pass
+
+    @abstractmethod
+    def decode_timestamp(self, value: Any) -> datetime | None:
+        pass
+
+    @abstractmethod
+    def json_sql(self, column: str) -> str:
+        """
+        SQL expression rendering a stored column the way the API
+        serializes it: hyphenated UUIDs and ISO dates and timestamps
+        """
+        pass
+
+
+class TextMoodStampCodec(MoodStampCodec):
+    """UUIDs as 36-char TEXT, ISO dates and timestamps"""
+
+    storage: MoodStampStorage = "text"
+
+    def encode_uuid(self, value: UUID) -> str:
+        return str(value)
+
+    def decode_uuid(self, value: str) -> UUID:
+        return UUID(value)
+
+    def encode_date(self, value: date) -> date:
+        return value
+
+    def decode_date(self, value: str | date) -> date:
+        if isinstance(value, str):
+            return date.fromisoformat(value)
+        return value
+
+    def encode_timestamp(self, value: datetime | None) -> datetime | None:
+        return value
+
+    def decode_timestamp(
+        self, value: str | datetime | None
+    ) -> datetime | None:
+        if isinstance(value, str):
+            return datetime.fromisoformat(value)
+        return value
+
+    def json_sql(self, column: str) -> str:
+        if column in ("created_at", "updated_at"):
+            # sqlite3 stores datetimes with a space separator
+            return f"replace({column}, ' ', 'T')"
+        return column
+
+
+class CompactMoodStampCodec(MoodStampCodec):
+    """
+    UUIDs as 16-byte BLOBs, dates as days since 1970-01-01 and
+    timestamps as microseconds since the epoch. Aware timestamps are
+    normalized to UTC; naive ones are stored as they are.
+    """
+
+    storage: MoodStampStorage = "compact"
+
+    def encode_uuid(self, value: UUID) -> bytes:
+        return value.bytes
+
+    def decode_uuid(self, value: bytes) -> UUID:
+        return UUID(bytes=value)
+
+    def encode_date(self, value: date) -> int:
+        return value.toordinal() - EPOCH_DAY
+
+    def decode_date(self, value: int) -> date:
+        return date.fromordinal(value + EPOCH_DAY)
+
+    def encode_timestamp(self, value: datetime | None) -> int | None:
+        if value is None:
+            return None
+        if value.tzinfo is not None:
+            value = value.astimezone(UTC).replace(tzinfo=None)
+        return (value - EPOCH) // MICROSECOND
+
+    def decode_timestamp(self, value: int | None) -> datetime | None:
+        if value is None:
+            return None
+        return EPOCH + value * MICROSECOND
+
+    def json_sql(self, column: str) -> str:
+        if column in ("id", "user_id"):
+            hex_uuid = f"lower(hex({column}))"
+            return " || '-' || ".join(
+                f"substr({hex_uuid}, {start}, {length})"
+                for start, length in (
+                    (1, 8),
+                    (9, 4),
+                    (13, 4),
+                    (17, 4),
+                    (21, 12),
+                )
+            )
+        if column == "date":
+            return "date(date * 86400, 'unixepoch')"
+        if column in ("created_at", "updated_at"):
+            # Fraction left out when zero, like datetime.isoformat()
+            return (
+                f"strftime('%Y-%m-%dT%H:%M:%S', {column} / 1000000, "
+                f"'unixepoch') || iif({column} % 1000000, "
+                f"printf('.%06d', {column} % 1000000), '')"
+            )
+        return column
+
+
+def get_moodstamp_codec(storage: MoodStampStorage) -> MoodStampCodec:
+    if storage == "compact":
+        return CompactMoodStampCodec()
+    return TextMoodStampCodec()
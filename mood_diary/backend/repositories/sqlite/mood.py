@@ -1,249 +1,337 @@
 import sqlite3
+import sys
 import bleach
 from datetime import datetime, date
-from typing import Union
+from typing import Any, Callable, get_args
 from uuid import UUID, uuid4
 
 from mood_diary.backend.exceptions.mood import MoodStampAlreadyExistsErrorRepo
 from mood_diary.backend.repositories.mood import MoodStampRepository
+from mood_diary.backend.repositories.sqlite.base import SQLiteRepository
+from mood_diary.backend.repositories.sqlite.codecs import (
+    MoodStampCodec,
+    TextMoodStampCodec,
+)
 from mood_diary.backend.repositories.sсhemas.mood import (
     MoodStamp,
     CreateMoodStamp,
+    JSONMoodStampRows,
     UpdateMoodStamp,
     MoodStampFilter,
+    MoodStampsVersion,
+    PartialMoodStamp,
 )
+from mood_diary.common.api.schemas.mood import MoodStampField
+
+
+# In table order
+COLUMNS: tuple[str, ...] = get_args(MoodStampField)
+
+# Moodstamps are clustered by (user_id, date): a user's history is
+# physically contiguous and every lookup is a primary key search, so the
+# table needs no secondary indexes.
+TABLE_SCHEMAS = {
+    "text": """
+        CREATE TABLE IF NOT EXISTS {table} (
+            id TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            date DATE NOT NULL,
+            value INT NOT NULL,
+            note TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+            PRIMARY KEY (user_id, date)
+        ) WITHOUT ROWID
+    """,
+    # users.id stays TEXT, so a BLOB user_id cannot reference it
+    "compact": """
+        CREATE TABLE IF NOT EXISTS {table} (
+            id BLOB NOT NULL,
+            user_id BLOB NOT NULL,
+            date INTEGER NOT NULL,
+            value INT NOT NULL,
+            note TEXT NOT NULL,
+            created_at INTEGER,
+            updated_at INTEGER,
+            PRIMARY KEY (user_id, date)
+        ) WITHOUT ROWID
+    """,
+}
 
 
-class SQLiteMoodRepository(MoodStampRepository):
-    def __init__(self, connection):
-        self.connection = connection
+class SQLiteMoodRepository(SQLiteRepository, MoodStampRepository):
+    def __init__(
+        self,
+        connection,
+        executor=None,
+        writer=None,
+        codec: MoodStampCodec | None = None,
+    ):
+        super().__init__(connection, executor, writer)
         self.connection.row_factory = sqlite3.Row
+        self.codec = codec or TextMoodStampCodec()
 
     def init_db(self):
-        cursor = self.connection.cursor()
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS moodstamps (
-                id TEXT PRIMARY KEY,
-                user_id TEXT NOT NULL,
-                date DATE NOT NULL,
-                value INT NOT NULL,
-                note TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
-                UNIQUE (user_id, date)
-            )
-            """
-        )
-        self.create_indexes()
+        self.create_table()
         self.connection.commit()
 
-    def create_indexes(self):
+    def create_table(self, table: str = "moodstamps"):
         cursor = self.connection.cursor()
+        cursor.execute(TABLE_SCHEMAS[self.codec.storage].format(table=table))
 
-        cursor.execute(
-            """
-            CREATE INDEX IF NOT EXISTS
-            idx_moodstamps_user_date
-            ON moodstamps (user_id, date)
-            """
-        )
+    async def get(self, user_id: UUID, date: date) -> MoodStamp | None:
+        return await self._run(self._get, user_id, date)
 
-        cursor.execute(
-            """
-            CREATE INDEX IF NOT EXISTS
-            idx_moodstamps_user
-            ON moodstamps (user_id)
-            """
-        )
+    async def get_many(
+        self, user_id: UUID, body: MoodStampFilter
+    ) -> list[MoodStamp] | list[PartialMoodStamp]:
+        return await self._run(self._get_many, user_id, body)
 
-        cursor.execute(
-            """
-            CREATE INDEX IF NOT EXISTS
-            idx_moodstamps_date
-            ON moodstamps (date)
-            """
-        )
+    async def get_many_json(
+        self, user_id: UUID, body: MoodStampFilter
+    ) -> JSONMoodStampRows:
+        return await self._run(self._get_many_json, user_id, body)
 
-        cursor.execute(
-            """
-            CREATE INDEX IF NOT EXISTS
-            idx_moodstamps_value
-            ON moodstamps(value)
-            """
-        )
+    async def get_version(self, user_id: UUID) -> MoodStampsVersion:
+        return await self._run(self._get_version, user_id)
 
-    async def get(self, user_id: UUID, date: date) -> MoodStamp | None:
+    async def create(self, user_id: UUID, body: CreateMoodStamp) -> MoodStamp:
+        """
+        Create new moodstamp.
+        Returns None if moodstamp with the same entry date already exists
+        """
+        return await self._write(self._create, user_id, body)
+
+    async def update(
+        self, user_id: UUID, date: date, body: UpdateMoodStamp
+    ) -> MoodStamp | None:
+        """Update moodstamp by date. Returns None if moodstamp not found"""
+        return await self._write(self._update, user_id, date, body)
+
+    async def delete(self, user_id: UUID, date: date) -> MoodStamp | None:
+        """Delete moodstamp by date. Returns None if stamp not found"""
+        return await self._write(self._delete, user_id, date)
+
+    def _get(self, user_id: UUID, date: date) -> MoodStamp | None:
         cursor = self.connection.cursor()
         cursor.execute(
             "SELECT * FROM moodstamps WHERE date = ? AND user_id = ?",
-            (date, str(user_id)),
+            (self.codec.encode_date(date), self.codec.encode_uuid(user_id)),
         )
         row = cursor.fetchone()
         if row:
-            return MoodStamp(
-                id=UUID(row["id"]),
-                user_id=row["user_id"],
-                date=row["date"],
-                value=row["value"],
-                note=bleach.clean(row["note"]),
-                created_at=row["created_at"],
-                updated_at=row["updated_at"],
-            )
+            return self._to_moodstamp(row)
         return None
 
-    async def get_many(
+    def _get_many(
         self, user_id: UUID, body: MoodStampFilter
-    ) -> list[MoodStamp]:
+    ) -> list[MoodStamp] | list[PartialMoodStamp]:
         cursor = self.connection.cursor()
-        query = "SELECT * FROM moodstamps WHERE user_id = ?"
-        params: list[Union[str, date, int]] = [str(user_id)]
-
-        if body.start_date is not None:
-            query += " AND date >= ?"
-            params.append(body.start_date)
-        if body.end_date is not None:
-            query += " AND date <= ?"
-            params.append(body.end_date)
-        if body.value is not None:
-            query += " AND value = ?"
-            params.append(body.value)
-
-        query += " ORDER BY date DESC"
+        if body.fields is None:
+            columns = "*"
+        else:
+            columns = ", ".join(self._projection(body))
+        query, params = self._select_many(columns, user_id, body, body.limit)
 
         cursor.execute(query, params)
         rows = cursor.fetchall()
 
-        return [
-            MoodStamp(
-                id=UUID(row["id"]),
-                user_id=row["user_id"],
-                date=row["date"],
-                value=row["value"],
-                note=bleach.clean(row["note"]),
-                created_at=row["created_at"],
-                updated_at=row["updated_at"],
-            )
-            for row in rows
-        ]
+        if body.fields is None:
+            return [self._to_moodstamp(row) for row in rows]
+        return [self._to_partial_moodstamp(row) for row in rows]
 
-    async def create(self, user_id: UUID, body: CreateMoodStamp) -> MoodStamp:
-        """
-        Create new moodstamp.
-        Returns None if moodstamp with the same entry date already exists
+    def _get_many_json(
+        self, user_id: UUID, body: MoodStampFilter
+    ) -> JSONMoodStampRows:
         """
+        Rows serialized by SQLite, joined into an array in their order:
+        json_group_array only orders its input since SQLite 3.44.
 
+        Notes are not cleaned again as they are read: they are cleaned
+        with bleach before every write, and cleaning is idempotent.
+        """
+        size = body.limit if body.limit is not None else sys.maxsize
+        pairs = ", ".join(
+            f"'{column}', {self.codec.json_sql(column)}"
+            for column in self._projection(body)
+        )
+        # One extra row tells whether there is a next page
+        query, params = self._select_many(
+            f"json_object({pairs}), date",
+            user_id,
+            body,
+            None if body.limit is None else body.limit + 1,
+        )
         cursor = self.connection.cursor()
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        items = rows[:size]
 
-        cursor.execute(
-            "SELECT id FROM moodstamps WHERE user_id = ? AND date = ?",
-            (str(user_id), body.date),
+        return JSONMoodStampRows(
+            items=f"[{','.join(item for item, _ in items)}]".encode(),
+            count=len(items),
+            has_more=len(rows) > size,
+            last_date=(
+                self.codec.decode_date(items[-1][1])
+                if len(items) == size
+                else None
+            ),
         )
-        if cursor.fetchone():
-            raise MoodStampAlreadyExistsErrorRepo()
 
-        stamp_id = uuid4()
-        created_at = updated_at = datetime.now()
-        sanitized_note = bleach.clean(body.note)
+    def _get_version(self, user_id: UUID) -> MoodStampsVersion:
+        cursor = self.connection.cursor()
         cursor.execute(
-            """INSERT INTO moodstamps
-            (id, user_id, date, value, note, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)""",
-            (
-                str(stamp_id),
-                str(user_id),
-                body.date,
-                body.value,
-                sanitized_note,
-                created_at,
-                updated_at,
-            ),
+            "SELECT count(*), max(updated_at) FROM moodstamps "
+            "WHERE user_id = ?",
+            (self.codec.encode_uuid(user_id),),
         )
-        self.connection.commit()
-
-        return MoodStamp(
-            id=stamp_id,
-            user_id=user_id,
-            date=body.date,
-            value=body.value,
-            note=sanitized_note,
-            created_at=created_at,
-            updated_at=updated_at,
+        count, updated_at = cursor.fetchone()
+        return MoodStampsVersion(
+            count=count, updated_at=self.codec.decode_timestamp(updated_at)
         )
 
-    async def update(
-        self, user_id: UUID, date: date, body: UpdateMoodStamp
-    ) -> MoodStamp | None:
-        """Update moodstamp by date. Returns None if moodstamp not found"""
-        cursor = self.connection.cursor()
+    def _projection(self, body: MoodStampFilter) -> list[str]:
+        if body.fields is None:
+            return list(COLUMNS)
+        # date is the key of a page, it is always returned
+        fields = {"date", *body.fields}
+        return [column for column in COLUMNS if column in fields]
+
+    def _select_many(
+        self,
+        columns: str,
+        user_id: UUID,
+        body: MoodStampFilter,
+        limit: int | None,
+    ) -> tuple[str, list[Any]]:
+        query = f"SELECT {columns} FROM moodstamps WHERE user_id = ?"
+        params: list[Any] = [self.codec.encode_uuid(user_id)]
+
+        if body.start_date is not None:
+            query += " AND date >= ?"
+            params.append(self.codec.encode_date(body.start_date))
+        if body.end_date is not None:
+            query += " AND date <= ?"
+            params.append(self.codec.encode_date(body.end_date))
+        if body.value is not None:
+            query += " AND value = ?"
+            params.append(body.value)
+        # Seek past the previous page on the (user_id, date) key
+        if body.after is not None:
+            query += (
+                " AND date < ?" if body.order == "desc" else " AND date > ?"
+            )
+            params.append(self.codec.encode_date(body.after))
+
+        query += f" ORDER BY date {body.order.upper()}"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return query, params
+
+    def _create(
+        self, conn: sqlite3.Connection, user_id: UUID, body: CreateMoodStamp
+    ) -> MoodStamp:
+        cursor = conn.cursor()
+        created_at = updated_at = datetime.now()
+
+        try:
+            cursor.execute(
+                """INSERT INTO moodstamps
+                (id, user_id, date, value, note, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (user_id, date) DO NOTHING
+                RETURNING *""",
+                (
+                    self.codec.encode_uuid(uuid4()),
+                    self.codec.encode_uuid(user_id),
+                    self.codec.encode_date(body.date),
+                    body.value,
+                    bleach.clean(body.note),
+                    self.codec.encode_timestamp(created_at),
+                    self.codec.encode_timestamp(updated_at),
+                ),
+            )
+            row = cursor.fetchone()
+        except sqlite3.IntegrityError as e:
+            raise MoodStampAlreadyExistsErrorRepo() from e
 
-        cursor.execute(
-            "SELECT * FROM moodstamps WHERE user_id = ? AND date = ?",
-            (str(user_id), date),
-        )
-        row = cursor.fetchone()
         if not row:
-            return None
+            # Conflict on (user_id, date): nothing was inserted
+            raise MoodStampAlreadyExistsErrorRepo()
+        return self._to_moodstamp(row)
 
-        updated_at = datetime.now()
-        sanitized_note = bleach.clean(
-            body.note if body.note is not None else row["note"]
+    def _update(
+        self,
+        conn: sqlite3.Connection,
+        user_id: UUID,
+        date: date,
+        body: UpdateMoodStamp,
+    ) -> MoodStamp | None:
+        cursor = conn.cursor()
+        sanitized_note = (
+            bleach.clean(body.note) if body.note is not None else None
         )
-        update_values = {
-            "value": body.value if body.value is not None else row["value"],
-            "note": sanitized_note,
-            "updated_at": updated_at,
-        }
 
+        # NULL parameters keep the stored value
         cursor.execute(
             """UPDATE moodstamps
-            SET value = ?, note = ?, updated_at = ?
-            WHERE user_id = ? AND date = ?""",
+            SET value = COALESCE(?, value),
+                note = COALESCE(?, note),
+                updated_at = ?
+            WHERE user_id = ? AND date = ?
+            RETURNING *""",
             (
-                update_values["value"],
-                update_values["note"],
-                update_values["updated_at"],
-                str(user_id),
-                date,
+                body.value,
+                sanitized_note,
+                self.codec.encode_timestamp(datetime.now()),
+                self.codec.encode_uuid(user_id),
+                self.codec.encode_date(date),
             ),
         )
-        self.connection.commit()
-
-        return MoodStamp(
-            id=UUID(row["id"]),
-            user_id=user_id,
-            date=date,
-            value=update_values["value"],
-            note=update_values["note"],
-            created_at=row["created_at"],
-            updated_at=updated_at,
-        )
-
-    async def delete(self, user_id: UUID, date: date) -> MoodStamp | None:
-        """Delete moodstamp by date. Returns None if stamp not found"""
-        cursor = self.connection.cursor()
-
-        cursor.execute(
-            "SELECT * FROM moodstamps WHERE user_id = ? AND date = ?",
-            (str(user_id), date),
-        )
         row = cursor.fetchone()
         if not row:
             return None
+        return self._to_moodstamp(row)
 
+    def _delete(
+        self, conn: sqlite3.Connection, user_id: UUID, date: date
+    ) -> MoodStamp | None:
+        cursor = conn.cursor()
         cursor.execute(
-            "DELETE FROM moodstamps WHERE user_id = ? AND date = ?",
-            (str(user_id), date),
+            """DELETE FROM moodstamps
+            WHERE user_id = ? AND date = ?
+            RETURNING *""",
+            (self.codec.encode_uuid(user_id), self.codec.encode_date(date)),
         )
-        self.connection.commit()
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return self._to_moodstamp(row)
 
+    def _to_moodstamp(self, row) -> MoodStamp:
         return MoodStamp(
-            id=UUID(row["id"]),
-            user_id=user_id,
-            date=date,
+            id=self.codec.decode_uuid(row["id"]),
+            user_id=self.codec.decode_uuid(row["user_id"]),
+            date=self.codec.decode_date(row["date"]),
             value=row["value"],
             note=bleach.clean(row["note"]),
-            created_at=row["created_at"],
-            updated_at=row["updated_at"],
+            created_at=self.codec.decode_timestamp(row["created_at"]),
+            updated_at=self.codec.decode_timestamp(row["updated_at"]),
+        )
+
+    def _to_partial_moodstamp(self, row) -> PartialMoodStamp:
+        """Decode only the columns the row has"""
+        decoders: dict[str, Callable[[Any], Any]] = {
+            "id": self.codec.decode_uuid,
+            "user_id": self.codec.decode_uuid,
+            "date": self.codec.decode_date,
+            "value": int,
+            "note": bleach.clean,
+            "created_at": self.codec.decode_timestamp,
+            "updated_at": self.codec.decode_timestamp,
+        }
+        return PartialMoodStamp(
+            **{column: decoders[column](row[column]) for column in row.keys()}
         )
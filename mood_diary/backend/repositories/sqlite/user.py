@@ -1,5 +1,7 @@
 import sqlite3
+from contextlib import asynccontextmanager, closing
 from datetime import UTC, datetime
+from typing import TYPE_CHECKING, AsyncIterator
 from uuid import UUID, uuid4
 
 from mood_diary.backend.repositories.sсhemas.user import (
@@ -8,14 +10,22 @@ from mood_diary.backend.repositories.sсhemas.user import (
     UpdateUserProfile,
     CreateUser,
 )
+from mood_diary.backend.repositories.sqlite.base import SQLiteRepository
 from mood_diary.backend.repositories.user import UserRepository
 
+if TYPE_CHECKING:
+    from mood_diary.backend.database.pool import SQLiteConnectionPool
 
-class SQLiteUserRepository(UserRepository):
-    def __init__(self, connection):
-        self.connection = connection
+
+class SQLiteUserRepository(SQLiteRepository, UserRepository):
+    def __init__(self, connection, executor=None):
+        super().__init__(connection, executor)
 
     def init_db(self):
+        self.create_table()
+        self.connection.commit()
+
+    def create_table(self):
         cursor = self.connection.cursor()
         cursor.execute(
             """
@@ -30,9 +40,41 @@ class SQLiteUserRepository(UserRepository):
             )
             """
         )
-        self.connection.commit()
 
     async def get(self, user_id: UUID) -> User | None:
+        return await self._run(self._get, user_id)
+
+    async def get_by_username(self, username: str) -> User | None:
+        return await self._run(self._get_by_username, username)
+
+    async def create(self, body: CreateUser) -> User | None:
+        """Returns None if user with the same username already exists"""
+        try:
+            return await self._write(self._create, body)
+        except sqlite3.IntegrityError:
+            return None
+
+    async def update_profile(
+        self, user_id: UUID, body: UpdateUserProfile
+    ) -> User | None:
+        return await self._write(self._update_profile, user_id, body)
+
+    async def update_hashed_password(
+        self, user_id: UUID, body: UpdateUserHashedPassword
+    ) -> User | None:
+        return await self._write(self._update_hashed_password, user_id, body)
+
+    async def rehash_password(
+        self,
+        user_id: UUID,
+        old_hashed_password: str,
+        body: UpdateUserHashedPassword,
+    ) -> bool:
+        return await self._write(
+            self._rehash_password, user_id, old_hashed_password, body
+        )
+
+    def _get(self, user_id: UUID) -> User | None:
         cursor = self.connection.cursor()
         cursor.execute(
             "SELECT * FROM users WHERE id = ?",
@@ -40,18 +82,10 @@ class SQLiteUserRepository(UserRepository):
         )
         row = cursor.fetchone()
         if row:
-            return User(
-                id=UUID(row[0]),
-                username=row[1],
-                name=row[2],
-                hashed_password=row[3],
-                created_at=row[4],
-                updated_at=row[5],
-                password_updated_at=row[6],
-            )
+            return self._to_user(row)
         return None
 
-    async def get_by_username(self, username: str) -> User | None:
+    def _get_by_username(self, username: str) -> User | None:
         cursor = self.connection.cursor()
         cursor.execute(
             "SELECT * FROM users WHERE username = ?",
@@ -59,71 +93,156 @@ class SQLiteUserRepository(UserRepository):
         )
         row = cursor.fetchone()
         if row:
-            return User(
-                id=UUID(row[0]),
-                username=row[1],
-                name=row[2],
-                hashed_password=row[3],
-                created_at=row[4],
-                updated_at=row[5],
-                password_updated_at=row[6],
-            )
+            return self._to_user(row)
         return None
 
-    async def create(self, body: CreateUser) -> User | None:
-        cursor = self.connection.cursor()
-        try:
-            now = datetime.now(UTC)
-
-            cursor.execute(
-                """
-                INSERT INTO users (
-                    id,
-                    username,
-                    name,
-                    hashed_password,
-                    created_at,
-                    updated_at,
-                    password_updated_at
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    str(uuid4()),
-                    body.username,
-                    body.name,
-                    body.hashed_password,
-                    now,
-                    now,
-                    now,
-                ),
+    def _create(
+        self, conn: sqlite3.Connection, body: CreateUser
+    ) -> User | None:
+        cursor = conn.cursor()
+        now = datetime.now(UTC)
+
+        cursor.execute(
+            """
+            INSERT INTO users (
+                id,
+                username,
+                name,
+                hashed_password,
+                created_at,
+                updated_at,
+                password_updated_at
             )
-            self.connection.commit()
-            return await self.get_by_username(body.username)
-        except sqlite3.IntegrityError:
-            # User with the same username already exists
-            return None
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (username) DO NOTHING
+            RETURNING *
+            """,
+            (
+                str(uuid4()),
+                body.username,
+                body.name,
+                body.hashed_password,
+                now,
+                now,
+                now,
+            ),
+        )
+        row = cursor.fetchone()
+        if row:
+            return self._to_user(row)
+        return None
 
-    async def update_profile(
-        self, user_id: UUID, body: UpdateUserProfile
+    def _update_profile(
+        self, conn: sqlite3.Connection, user_id: UUID, body: UpdateUserProfile
     ) -> User | None:
-        cursor = self.connection.cursor()
+        cursor = conn.cursor()
         cursor.execute(
-            "UPDATE users SET name = ?, updated_at = ? WHERE id = ?",
+            "UPDATE users SET name = ?, updated_at = ? WHERE id = ? "
+            "RETURNING *",
             (body.name, datetime.now(UTC), str(user_id)),
         )
-        self.connection.commit()
-        return await self.get(user_id)
+        row = cursor.fetchone()
+        if row:
+            return self._to_user(row)
+        return None
 
-    async def update_hashed_password(
-        self, user_id: UUID, body: UpdateUserHashedPassword
+    def _update_hashed_password(
+        self,
+        conn: sqlite3.Connection,
+        user_id: UUID,
+        body: UpdateUserHashedPassword,
     ) -> User | None:
-        cursor = self.connection.cursor()
+        cursor = conn.cursor()
         cursor.execute(
             "UPDATE users "
             "SET hashed_password = ?, password_updated_at = ? "
-            "WHERE id = ?",
+            "WHERE id = ? "
+            "RETURNING *",
             (body.hashed_password, datetime.now(UTC), str(user_id)),
         )
-        self.connection.commit()
-        return await self.get(user_id)
+        row = cursor.fetchone()
+        if row:
+            return self._to_user(row)
+        return None
+
+    def _rehash_password(
+        self,
+        conn: sqlite3.Connection,
+        user_id: UUID,
+        old_hashed_password: str,
+        body: UpdateUserHashedPassword,
+    ) -> bool:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE users SET hashed_password = ? "
+            "WHERE id = ? AND hashed_password = ?",
+            (body.hashed_password, str(user_id), old_hashed_password),
+        )
+        return cursor.rowcount == 1
+
+    @staticmethod
+    def _to_user(row) -> User:
+        return User(
+            id=UUID(row[0]),
+            username=row[1],
+            name=row[2],
+            hashed_password=row[3],
+            created_at=row[4],
+            updated_at=row[5],
+            password_updated_at=row[6],
+        )
+
+
+class PooledSQLiteUserRepository(UserRepository):
+    """
+    SQLiteUserRepository borrowing a connection of `pool` for each call
+    only, so that none is held while the service awaits something else,
+    such as the hashing of a password.
+    """
+
+    def __init__(self, pool: "SQLiteConnectionPool"):
+        self.pool = pool
+
+    def init_db(self):
+        with closing(self.pool.connect()) as conn:
+            SQLiteUserRepository(conn).init_db()
+
+    @asynccontextmanager
+    async def _repository(self) -> AsyncIterator[SQLiteUserRepository]:
+        async with self.pool.connection() as conn:
+            yield SQLiteUserRepository(conn, self.pool.executor)
+
+    async def get(self, user_id: UUID) -> User | None:
+        async with self._repository() as repository:
+            return await repository.get(user_id)
+
+    async def get_by_username(self, username: str) -> User | None:
+        async with self._repository() as repository:
+            return await repository.get_by_username(username)
+
+    async def create(self, body: CreateUser) -> User | None:
+        async with self._repository() as repository:
+            return await repository.create(body)
+
+    async def update_profile(
+        self, user_id: UUID, body: UpdateUserProfile
+    ) -> User | None:
+        async with self._repository() as repository:
+            return await repository.update_profile(user_id, body)
+
+    async def update_hashed_password(
+        self, user_id: UUID, body: UpdateUserHashedPassword
+    ) -> User | None:
+        async with self._repository() as repository:
+            return await repository.update_hashed_password(user_id, body)
+
+    async def rehash_password(
+        self,
+        user_id: UUID,
+        old_hashed_password: str,
+        body: UpdateUserHashedPassword,
+    ) -> bool:
+        async with self._repository() as repository:
+            return await repository.rehash_password(
+                user_id, old_hashed_password, body
+            )
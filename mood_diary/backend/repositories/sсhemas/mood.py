@@ -1,8 +1,11 @@
 from datetime import datetime, date
+from typing import Literal
 from uuid import UUID
 
 from pydantic import BaseModel
 
+from mood_diary.common.api.schemas.mood import MoodStampField
+
 
 class MoodStamp(BaseModel):
     id: UUID
@@ -14,6 +17,18 @@ class MoodStamp(BaseModel):
     updated_at: datetime
 
 
+class PartialMoodStamp(BaseModel):
+    """MoodStamp with only the selected fields set, date always included"""
+
+    date: date
+    id: UUID | None = None
+    user_id: UUID | None = None
+    value: int | None = None
+    note: str | None = None
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
+
+
 class CreateMoodStamp(BaseModel):
     date: date
     user_id: UUID
@@ -30,3 +45,35 @@ class MoodStampFilter(BaseModel):
     start_date: date | None = None
     end_date: date | None = None
     value: int | None = None
+    # Keyset page: rows past `after` in `order`, at most `limit` of them
+    after: date | None = None
+    limit: int | None = None
+    order: Literal["asc", "desc"] = "desc"
+    # Columns to read, all of them when None
+    fields: list[MoodStampField] | None = None
+
+
+class JSONMoodStampRows(BaseModel):
+    """A page of moodstamps serialized by SQLite"""
+
+    items: bytes  # JSON array
+    count: int
+    has_more: bool
+    last_date: date | None  # of the last item
+
+
+class MoodStampsVersion(BaseModel):
+    """Changes whenever a moodstamp of the user is written or deleted"""
+
+    count: int
+    updated_at: datetime | None  # the latest
+
+
+class JSONMoodStampPage(BaseModel):
+    content: bytes  # JSON document of a MoodStampPageResponse
+    count: int
+
+
+class MoodStampPage(BaseModel):
+    items: list[MoodStamp | PartialMoodStamp]
+    next_cursor: str | None
@@ -54,3 +54,17 @@ class UserRepository(BaseRepository):
         Returns None if user not found.
         """
         pass
+
+    @abstractmethod
+    async def rehash_password(
+        self,
+        user_id: UUID,
+        old_hashed_password: str,
+        body: UpdateUserHashedPassword,
+    ) -> bool:
+        """
+        Replace the hash of a password that has not changed, leaving
+        password_updated_at alone.
+        Returns False if the stored hash is no longer old_hashed_password.
+        """
+        pass
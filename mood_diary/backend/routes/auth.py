@@ -1,15 +1,18 @@
+from contextlib import AbstractAsyncContextManager
+from typing import Callable
 from uuid import UUID
-import json
 import logging
-import redis.asyncio as aioredis
 
-from fastapi import APIRouter, Response, Depends, status
+from fastapi import APIRouter, Request, Response, Depends, status
 from fastapi_csrf_protect import CsrfProtect
 
+from mood_diary.backend.routes.cache import conditional_response
 from mood_diary.backend.routes.dependencies import (
+    get_cached_user_service,
     get_current_user_id,
-    get_user_service,
+    get_user_service_factory,
 )
+from mood_diary.backend.services.cached import CachedUserService
 from mood_diary.backend.services.user import UserService
 from mood_diary.common.api.schemas.auth import (
     RegisterRequest,
@@ -22,7 +25,6 @@ from mood_diary.common.api.schemas.token import TokenWithCSRF
 from mood_diary.common.api.schemas.common import MessageResponse
 
 from mood_diary.backend.config import config
-from mood_diary.backend.database.cache import get_redis_client
 
 logger = logging.getLogger("mood_diary.backend.app")
 
@@ -51,12 +53,15 @@ router = APIRouter()
 )
 async def register(
     request: RegisterRequest,
-    service: UserService = Depends(get_user_service),
+    open_service: Callable[
+        [], AbstractAsyncContextManager[UserService]
+    ] = Depends(get_user_service_factory),
     csrf_protect: CsrfProtect = Depends(),
 ):
     logger.info(f"Attempting registration for username: {request.username}")
     try:
-        profile = await service.register(request)
+        async with open_service() as service:
+            profile = await service.register(request)
         logger.info(
             f"User registered successfully. "
             f"User ID: {profile.id}, Username: {profile.username}"
@@ -96,12 +101,15 @@ async def register(
 async def login(
     fastapi_response: Response,
     request: LoginRequest,
-    service: UserService = Depends(get_user_service),
+    open_service: Callable[
+        [], AbstractAsyncContextManager[UserService]
+    ] = Depends(get_user_service_factory),
     csrf_protect: CsrfProtect = Depends(),
 ):
     logger.info(f"Login attempt for username: {request.username}")
     try:
-        login_response = await service.login(request)
+        async with open_service() as service:
+            login_response = await service.login(request)
         logger.info(f"Login successful for username: {request.username}")
         response = Response(status_code=status.HTTP_200_OK)
         response.set_cookie(
@@ -148,6 +156,9 @@ async def validate_token(user_id: UUID = Depends(get_current_user_id)):
             "model": Profile,
             "description": "User profile retrieved successfully",
         },
+        status.HTTP_304_NOT_MODIFIED: {
+            "description": "Profile unchanged since the ETag was sent",
+        },
         status.HTTP_401_UNAUTHORIZED: {
             "model": MessageResponse,
             "description": "Invalid or expired token",
@@ -160,25 +171,13 @@ async def validate_token(user_id: UUID = Depends(get_current_user_id)):
     },
 )
 async def get_profile(
+    request: Request,
     user_id: UUID = Depends(get_current_user_id),
-    service: UserService = Depends(get_user_service),
-    redis: aioredis.Redis = Depends(get_redis_client),
+    users: CachedUserService = Depends(get_cached_user_service),
 ):
     logger.info(f"Fetching profile for User ID: {user_id}")
-    cache_key = f"profile:{user_id}"
-    cached_profile = await redis.get(cache_key)
-
-    if cached_profile:
-        logger.info(f"Profile cache hit for User ID: {user_id}")
-        return Profile(**json.loads(cached_profile))
-
-    logger.info(f"Profile cache miss for User ID: {user_id}")
-    profile = await service.get_profile(user_id)
-    await redis.set(
-        cache_key, profile.model_dump_json(), ex=config.REDIS_CACHE_TTL
-    )
-    logger.info(f"Profile fetched and cached for User ID: {user_id}")
-    return profile
+    cached = await users.get_profile(user_id)
+    return conditional_response(cached, request)
 
 
 @router.put(
@@ -209,18 +208,12 @@ async def get_profile(
 async def change_password(
     request: ChangePasswordRequest,
     user_id: UUID = Depends(get_current_user_id),
-    service: UserService = Depends(get_user_service),
-    redis: aioredis.Redis = Depends(get_redis_client),
+    users: CachedUserService = Depends(get_cached_user_service),
 ):
     logger.info(f"Password change attempt for User ID: {user_id}")
     try:
-        await service.change_password(user_id, request)
-        cache_key = f"profile:{user_id}"
-        await redis.delete(cache_key)
-        logger.info(
-            f"Password changed successfully for User ID: {user_id}. "
-            f"Profile cache invalidated."
-        )
+        await users.change_password(user_id, request)
+        logger.info(f"Password changed successfully for User ID: {user_id}")
         return Response(status_code=status.HTTP_200_OK)
     except Exception as e:
         logger.error(f"Password change failed for User ID {user_id}: {e}")
@@ -241,21 +234,15 @@ async def change_password(
 async def update_profile(
     request: ChangeProfileRequest,
     user_id: UUID = Depends(get_current_user_id),
-    service: UserService = Depends(get_user_service),
-    redis: aioredis.Redis = Depends(get_redis_client),
+    users: CachedUserService = Depends(get_cached_user_service),
 ):
     logger.info(
         f"Profile update attempt for User ID: {user_id}. "
         f"New name: {request.name}"
     )
     try:
-        profile = await service.update_profile(user_id, request)
-        cache_key = f"profile:{user_id}"
-        await redis.delete(cache_key)
-        logger.info(
-            f"Profile updated successfully for User ID: {user_id}. "
-            f"Profile cache invalidated."
-        )
+        profile = await users.update_profile(user_id, request)
+        logger.info(f"Profile updated successfully for User ID: {user_id}")
         return profile
     except Exception as e:
         logger.error(f"Profile update failed for User ID {user_id}: {e}")
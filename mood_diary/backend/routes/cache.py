@@ -0,0 +1,153 @@
+import hashlib
+from datetime import UTC, datetime
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import APIRouter, Depends, Request, Response, status
+
+from mood_diary.backend.config import config
+from mood_diary.backend.database.cache import (
+    CachedValue,
+    TieredCache,
+    get_cache,
+)
+from mood_diary.backend.routes.dependencies import get_current_user_id
+from mood_diary.backend.utils.compression import accepts, decompress
+from mood_diary.common.api.schemas.cache import CacheStatsResponse
+
+router = APIRouter()
+
+
+@router.get(
+    "/stats",
+    response_model=CacheStatsResponse,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(get_current_user_id)],
+    responses={
+        status.HTTP_200_OK: {
+            "model": CacheStatsResponse,
+            "description": "Hit ratios of this worker's cache tiers",
+        },
+    },
+)
+async def get_cache_stats(cache: TieredCache = Depends(get_cache)):
+    return cache.stats()
+
+
+def cached_response(
+    value: CachedValue,
+    request: Request,
+    etag: str | None = None,
+    last_modified: datetime | None = None,
+) -> Response:
+    """
+    JSON response with a cached body, sent compressed as it was stored
+    when the client accepts that encoding, with the validators given.
+    """
+    headers = validator_headers(etag, last_modified)
+    content = value.payload
+    if value.encoding != "identity":
+        if accepts(request.headers.get("accept-encoding"), value.encoding):
+            headers["Content-Encoding"] = value.encoding
+        else:
+            content = decompress(content, value.encoding)
+    return Response(
+        content=content, media_type="application/json", headers=headers
+    )
+
+
+def conditional_response(value: CachedValue, request: Request) -> Response:
+    """
+    cached_response validated by an ETag of the bytes sent and by the
+    value's last_modified, or 304 Not Modified if the client's copy is
+    current.
+    """
+    etag = make_etag(value.payload, sent_encoding(value, request))
+    last_modified = (
+        datetime.fromtimestamp(value.last_modified, UTC)
+        if value.last_modified is not None
+        else None
+    )
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    return cached_response(value, request, etag, last_modified)
+
+
+def not_modified_response(
+    etag: str, last_modified: datetime | None = None
+) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers=validator_headers(etag, last_modified),
+    )
+
+
+def validator_headers(
+    etag: str | None, last_modified: datetime | None
+) -> dict[str, str]:
+    headers = {"Vary": "Accept-Encoding"}
+    if etag is not None:
+        headers["ETag"] = etag
+        # Per user, and to be revalidated before every use
+        headers["Cache-Control"] = "private, no-cache"
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(
+            last_modified.astimezone(UTC), usegmt=True
+        )
+    return headers
+
+
+def make_etag(*parts: bytes | str) -> str:
+    """Strong entity tag of the representation `parts` determine"""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part.encode() if isinstance(part, str) else part
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def sent_encoding(value: CachedValue, request: Request) -> str:
+    """Content encoding cached_response sends `value` with"""
+    if value.encoding != "identity" and accepts(
+        request.headers.get("accept-encoding"), value.encoding
+    ):
+        return value.encoding
+    return "identity"
+
+
+def representation(request: Request) -> str:
+    """
+    What, besides the data, decides the bytes of a cached response for
+    this request, before the response is read
+    """
+    encoding = config.CACHE_COMPRESSION
+    if not accepts(request.headers.get("accept-encoding"), encoding):
+        encoding = "identity"
+    return f"{encoding}:{config.CACHE_COMPRESSION_MIN_SIZE}"
+
+
+def is_not_modified(
+    request: Request, etag: str, last_modified: datetime | None = None
+) -> bool:
+    """
+    Whether the client's copy is current. If-None-Match is compared
+    weakly; If-Modified-Since is only considered without it.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {
+            tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+        }
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=UTC)
+    # HTTP dates have a resolution of one second
+    return last_modified.astimezone(UTC).replace(microsecond=0) <= since
@@ -1,17 +1,32 @@
+import functools
 import sqlite3
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from typing import AsyncIterator, Callable, Literal
 from uuid import UUID
 
-from fastapi import Depends, Cookie
+from fastapi import Depends, Cookie, Request
 
 from mood_diary.backend.config import config
+from mood_diary.backend.database.cache import TieredCache, get_cache
+from mood_diary.backend.database.pool import SQLiteConnectionPool
+from mood_diary.backend.database.writer import SQLiteWriteQueue
 from mood_diary.backend.exceptions.user import InvalidOrExpiredAccessToken
 from mood_diary.backend.repositories.mood import MoodStampRepository
+from mood_diary.backend.repositories.sqlite.codecs import MoodStampCodec
 from mood_diary.backend.repositories.sqlite.mood import SQLiteMoodRepository
-from mood_diary.backend.repositories.sqlite.user import SQLiteUserRepository
+from mood_diary.backend.repositories.sqlite.user import (
+    PooledSQLiteUserRepository,
+    SQLiteUserRepository,
+)
 from mood_diary.backend.repositories.user import UserRepository
+from mood_diary.backend.services.cached import (
+    CachedMoodService,
+    CachedUserService,
+)
 from mood_diary.backend.services.mood import MoodService
 from mood_diary.backend.services.user import UserService
 from mood_diary.backend.utils.password_hasher import (
+    HashingPool,
     SaltPasswordHasher,
     PasswordHasher,
 )
@@ -21,21 +36,63 @@ from mood_diary.backend.utils.token_manager import (
 )
 
 
-def get_token_manager() -> TokenManager:
+@functools.cache
+def token_manager_for(
+    secret_key: str,
+    algorithm: str,
+    access_token_exp_minutes: int,
+    verified_cache_size: int,
+) -> TokenManager:
+    """One token manager per process and settings"""
     return JWTTokenManager(
+        secret_key, algorithm, access_token_exp_minutes, verified_cache_size
+    )
+
+
+def get_token_manager() -> TokenManager:
+    return token_manager_for(
         config.AUTH_TOKEN_SECRET_KEY,
         config.AUTH_TOKEN_ALGORITHM,
         config.AUTH_TOKEN_ACCESS_TOKEN_EXPIRE_MINUTES,
+        config.AUTH_TOKEN_VERIFIED_CACHE_SIZE,
     )
 
 
-def get_password_hasher() -> PasswordHasher:
+@functools.cache
+def password_hasher_for(
+    encoding: str,
+    salt_size: int,
+    hash_name: str,
+    hash_iterations: int,
+    split_char: str,
+    legacy_iterations: int,
+    executor: Literal["thread", "process"],
+    workers: int,
+    max_queue: int,
+) -> PasswordHasher:
+    """One password hasher, and pool of workers, per process and settings"""
     return SaltPasswordHasher(
+        encoding,
+        salt_size,
+        hash_name,
+        hash_iterations,
+        split_char,
+        HashingPool(executor, workers, max_queue),
+        legacy_iterations,
+    )
+
+
+def get_password_hasher() -> PasswordHasher:
+    return password_hasher_for(
         config.PASSWORD_HASHING_ENCODING,
         config.PASSWORD_HASHING_SALT_SIZE,
         config.PASSWORD_HASHING_HASH_NAME,
         config.PASSWORD_HASHING_HASH_ITERATIONS,
         config.PASSWORD_HASHING_SPLIT_CHAR,
+        config.PASSWORD_HASHING_LEGACY_ITERATIONS,
+        config.PASSWORD_HASHING_EXECUTOR,
+        config.PASSWORD_HASHING_WORKERS,
+        config.PASSWORD_HASHING_MAX_QUEUE,
     )
 
 
@@ -54,18 +111,26 @@ def get_current_user_id(
     return payload.user_id
 
 
-def get_connection():
-    conn = sqlite3.connect(config.SQLITE_DB_PATH, check_same_thread=False)
-    try:
+def get_db_pool(request: Request) -> SQLiteConnectionPool:
+    return request.app.state.db_pool
+
+
+def get_db_writer(request: Request) -> SQLiteWriteQueue:
+    return request.app.state.db_writer
+
+
+async def get_connection(
+    pool: SQLiteConnectionPool = Depends(get_db_pool),
+):
+    async with pool.connection() as conn:
         yield conn
-    finally:
-        conn.close()
 
 
 def get_user_repository(
     conn: sqlite3.Connection = Depends(get_connection),
+    pool: SQLiteConnectionPool = Depends(get_db_pool),
 ) -> UserRepository:
-    return SQLiteUserRepository(conn)
+    return SQLiteUserRepository(conn, pool.executor)
 
 
 def get_user_service(
@@ -80,10 +145,38 @@ def get_user_service(
     )
 
 
+def get_user_service_factory(
+    pool: SQLiteConnectionPool = Depends(get_db_pool),
+    password_hasher: PasswordHasher = Depends(get_password_hasher),
+    token_manager: TokenManager = Depends(get_token_manager),
+) -> Callable[[], AbstractAsyncContextManager[UserService]]:
+    """
+    Like get_user_service, but a connection is only borrowed around each
+    repository call: requests answered from the cache never wait for
+    one, and none is held while a password is hashed.
+    """
+
+    @asynccontextmanager
+    async def open_service() -> AsyncIterator[UserService]:
+        yield get_user_service(
+            PooledSQLiteUserRepository(pool), password_hasher, token_manager
+        )
+
+    return open_service
+
+
+def get_moodstamp_codec(request: Request) -> MoodStampCodec:
+    return request.app.state.moodstamp_codec
+
+
 def get_moodstamp_repository(
     conn: sqlite3.Connection = Depends(get_connection),
+    pool: SQLiteConnectionPool = Depends(get_db_pool),
+    writer: SQLiteWriteQueue = Depends(get_db_writer),
+    # Resolved after the connection: layout switches wait for connections
+    codec: MoodStampCodec = Depends(get_moodstamp_codec),
 ) -> MoodStampRepository:
-    return SQLiteMoodRepository(conn)
+    return SQLiteMoodRepository(conn, pool.executor, writer, codec)
 
 
 def get_mood_service(
@@ -92,3 +185,43 @@ def get_mood_service(
     ),
 ) -> MoodService:
     return MoodService(moodstamp_repository)
+
+
+def get_mood_service_factory(
+    request: Request,
+    pool: SQLiteConnectionPool = Depends(get_db_pool),
+    writer: SQLiteWriteQueue = Depends(get_db_writer),
+) -> Callable[[], AbstractAsyncContextManager[MoodService]]:
+    """
+    Like get_mood_service, but the connection is only borrowed when the
+    service is opened, so requests answered from the cache never wait
+    for one.
+    """
+
+    @asynccontextmanager
+    async def open_service() -> AsyncIterator[MoodService]:
+        async with pool.connection() as conn:
+            repository = get_moodstamp_repository(
+                conn, pool, writer, get_moodstamp_codec(request)
+            )
+            yield get_mood_service(repository)
+
+    return open_service
+
+
+def get_cached_mood_service(
+    open_service: Callable[
+        [], AbstractAsyncContextManager[MoodService]
+    ] = Depends(get_mood_service_factory),
+    cache: TieredCache = Depends(get_cache),
+) -> CachedMoodService:
+    return CachedMoodService(open_service, cache)
+
+
+def get_cached_user_service(
+    open_service: Callable[
+        [], AbstractAsyncContextManager[UserService]
+    ] = Depends(get_user_service_factory),
+    cache: TieredCache = Depends(get_cache),
+) -> CachedUserService:
+    return CachedUserService(open_service, cache)
@@ -1,30 +1,48 @@
 import logging
-import json
+from typing import Literal, get_args
 from uuid import UUID
 from datetime import date
-from fastapi import APIRouter, Depends, status, Path, Request, Response
+from fastapi import (
+    APIRouter,
+    Depends,
+    status,
+    Path,
+    Query,
+    Request,
+    Response,
+)
 from fastapi_csrf_protect import CsrfProtect
-import redis.asyncio as aioredis
 
 from mood_diary.backend.config import config
+from mood_diary.backend.routes.cache import (
+    cached_response,
+    conditional_response,
+    is_not_modified,
+    make_etag,
+    not_modified_response,
+    representation,
+)
 from mood_diary.backend.routes.dependencies import (
-    get_mood_service,
+    get_cached_mood_service,
     get_current_user_id,
 )
-from mood_diary.backend.services.mood import MoodService
+from mood_diary.backend.services.cached import CachedMoodService
 from mood_diary.common.api.schemas.mood import (
     CreateMoodStampRequest,
     GetManyMoodStampsRequest,
+    MoodStampField,
+    MoodStampPageResponse,
     UpdateMoodStampRequest,
     MoodStampSchema,
 )
 from mood_diary.common.api.schemas.common import MessageResponse
-from mood_diary.backend.database.cache import get_redis_client
 
 logger = logging.getLogger("mood_diary.backend.app")
 
 router = APIRouter()
 
+FIELD_NAMES = "|".join(get_args(MoodStampField))
+
 
 @router.post(
     "/",
@@ -49,28 +67,18 @@ router = APIRouter()
 async def create(
     request: CreateMoodStampRequest,
     user_id: UUID = Depends(get_current_user_id),
-    service: MoodService = Depends(get_mood_service),
-    redis: aioredis.Redis = Depends(get_redis_client),
+    moods: CachedMoodService = Depends(get_cached_mood_service),
 ):
     logger.info(
         f"User ID: {user_id} attempting to create mood stamp "
         f"for date: {request.date}"
     )
     try:
-        moodstamp = await service.create(user_id=user_id, body=request)
+        moodstamp = await moods.create(user_id=user_id, body=request)
         logger.info(
             f"User ID: {user_id} created mood stamp ID: {moodstamp.id} "
             f"for date: {request.date}"
         )
-        keys_to_delete = []
-        async for key in redis.scan_iter(match=f"moodstamps:{user_id}:*"):
-            keys_to_delete.append(key)
-        if keys_to_delete:
-            await redis.delete(*keys_to_delete)
-            logger.info(
-                f"User ID: {user_id} invalidated {len(keys_to_delete)} "
-                f"list cache(s) for mood stamps."
-            )
         return moodstamp
     except Exception as e:
         logger.error(
@@ -103,6 +111,9 @@ async def get_csrf_token(
             "model": MoodStampSchema,
             "description": "MoodStamp retrieved successfully",
         },
+        status.HTTP_304_NOT_MODIFIED: {
+            "description": "MoodStamp unchanged since the ETag was sent",
+        },
         status.HTTP_404_NOT_FOUND: {
             "model": MessageResponse,
             "description": "MoodStamp not found",
@@ -115,47 +126,38 @@ async def get_csrf_token(
     },
 )
 async def get_moodstamp(
+    request: Request,
     date: date = Path(...),
     user_id: UUID = Depends(get_current_user_id),
-    service: MoodService = Depends(get_mood_service),
-    redis: aioredis.Redis = Depends(get_redis_client),
+    moods: CachedMoodService = Depends(get_cached_mood_service),
 ):
     logger.info(f"User ID: {user_id} fetching mood stamp for date: {date}")
-    cache_key = f"moodstamp:{user_id}:{date}"
-    cached_moodstamp = await redis.get(cache_key)
-
-    if cached_moodstamp:
-        logger.info(
-            f"Mood stamp cache hit for User ID: {user_id}, Date: {date}"
-        )
-        return MoodStampSchema(**json.loads(cached_moodstamp))
-
-    logger.info(f"Mood stamp cache miss for User ID: {user_id}, Date: {date}")
-    moodstamp = await service.get(user_id=user_id, date=date)
-    if moodstamp:
-        await redis.set(
-            cache_key, moodstamp.model_dump_json(), ex=config.REDIS_CACHE_TTL
-        )
-        logger.info(
-            f"Mood stamp fetched and cached for User ID: {user_id}, "
-            f"Date: {date}"
-        )
-    else:
-        logger.info(
-            f"Mood stamp not found for User ID: {user_id}, Date: {date}"
-        )
-    return moodstamp
+    cached = await moods.get(user_id=user_id, date=date)
+    return conditional_response(cached, request)
 
 
 @router.get(
     "/",
-    response_model=list[MoodStampSchema],
+    # Documents the body: it is sent as the database serialized it
+    response_model=MoodStampPageResponse,
     status_code=status.HTTP_200_OK,
     responses={
         status.HTTP_200_OK: {
-            "model": list[MoodStampSchema],
+            "model": MoodStampPageResponse,
             "description": "MoodStamps retrieved successfully",
         },
+        status.HTTP_304_NOT_MODIFIED: {
+            "description": "MoodStamps unchanged since the ETag was sent",
+        },
+        status.HTTP_400_BAD_REQUEST: {
+            "model": MessageResponse,
+            "description": "Invalid cursor",
+            "content": {
+                "application/json": {
+                    "example": {"message": "MoodStamp cursor is invalid"}
+                }
+            },
+        },
         status.HTTP_404_NOT_FOUND: {
             "model": MessageResponse,
             "description": "MoodStamps not found",
@@ -168,63 +170,54 @@ async def get_moodstamp(
     },
 )
 async def get_many_moodstamps(
+    request: Request,
     start_date: date | None = None,
     end_date: date | None = None,
     value: int | None = None,
+    limit: int = Query(
+        default=config.MOODSTAMPS_PAGE_SIZE,
+        ge=1,
+        le=config.MOODSTAMPS_MAX_PAGE_SIZE,
+    ),
+    cursor: str | None = None,
+    order: Literal["asc", "desc"] = "desc",
+    fields: str | None = Query(
+        default=None,
+        pattern=f"^({FIELD_NAMES})(,({FIELD_NAMES}))*$",
+        description="Comma-separated fields to return, date is always "
+        "included",
+    ),
     user_id: UUID = Depends(get_current_user_id),
-    service: MoodService = Depends(get_mood_service),
-    redis: aioredis.Redis = Depends(get_redis_client),
+    moods: CachedMoodService = Depends(get_cached_mood_service),
 ):
     logger.info(
         f"User ID: {user_id} fetching multiple mood stamps. Filters: "
-        f"start={start_date}, end={end_date}, value={value}"
-    )
-    cache_key_params = {
-        "start_date": start_date.isoformat() if start_date else "None",
-        "end_date": end_date.isoformat() if end_date else "None",
-        "value": str(value) if value is not None else "None",
-    }
-    cache_key = f"moodstamps:{user_id}:" + json.dumps(
-        cache_key_params, sort_keys=True
-    )
-
-    cached_moodstamps = await redis.get(cache_key)
-
-    if cached_moodstamps:
-        logger.info(
-            f"Mood stamps list cache hit for User ID: {user_id}, "
-            f"Key: {cache_key}"
-        )
-        return [
-            MoodStampSchema(**item) for item in json.loads(cached_moodstamps)
-        ]
-
-    logger.info(
-        f"Mood stamps list cache miss for User ID: {user_id}, "
-        f"Key: {cache_key}"
+        f"start={start_date}, end={end_date}, value={value}, "
+        f"limit={limit}, cursor={cursor}, order={order}, fields={fields}"
     )
     request_schema = GetManyMoodStampsRequest(
         start_date=start_date,
         end_date=end_date,
         value=value,
+        limit=limit,
+        cursor=cursor,
+        order=order,
+        fields=sorted(set(fields.split(","))) if fields else None,
     )
-    moodstamps = await service.get_many(user_id=user_id, body=request_schema)
-    if moodstamps:
-        await redis.set(
-            cache_key,
-            json.dumps([ms.model_dump(mode="json") for ms in moodstamps]),
-            ex=config.REDIS_CACHE_TTL,
-        )
-        logger.info(
-            f"Mood stamps list fetched and cached for User ID: {user_id}, "
-            f"Key: {cache_key}. Count: {len(moodstamps)}"
-        )
-    else:
-        logger.info(
-            f"No mood stamps found for User ID: {user_id} "
-            f"with Key: {cache_key}"
-        )
-    return moodstamps
+    # The page is only read if the user's moodstamps changed. Deleting
+    # one does not move their latest update, so there is no
+    # Last-Modified to go by.
+    version = await moods.get_version(user_id=user_id)
+    etag = make_etag(
+        str(user_id),
+        version.payload,
+        request_schema.model_dump_json(),
+        representation(request),
+    )
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    cached = await moods.get_many_json(user_id=user_id, body=request_schema)
+    return cached_response(cached, request, etag)
 
 
 @router.put(
@@ -258,26 +251,16 @@ async def update_moodstamp(
     request: UpdateMoodStampRequest,
     date: date = Path(...),
     user_id: UUID = Depends(get_current_user_id),
-    service: MoodService = Depends(get_mood_service),
-    redis: aioredis.Redis = Depends(get_redis_client),
+    moods: CachedMoodService = Depends(get_cached_mood_service),
 ):
     logger.info(
         f"User ID: {user_id} attempting to update mood stamp for date: {date}"
     )
     try:
-        moodstamp = await service.update(
+        moodstamp = await moods.update(
             user_id=user_id, date=date, body=request
         )
         logger.info(f"User ID: {user_id} updated mood stamp for date: {date}")
-        keys_to_delete = [f"moodstamp:{user_id}:{date}"]
-        async for key in redis.scan_iter(match=f"moodstamps:{user_id}:*"):
-            keys_to_delete.append(key)
-        if keys_to_delete:
-            await redis.delete(*keys_to_delete)
-            logger.info(
-                f"User ID: {user_id} invalidated {len(keys_to_delete)} cache "
-                f"key(s) for mood stamp date: {date} and lists."
-            )
         return moodstamp
     except Exception as e:
         logger.error(
@@ -307,24 +290,14 @@ async def update_moodstamp(
 async def delete_moodstamp(
     date: date = Path(...),
     user_id: UUID = Depends(get_current_user_id),
-    service: MoodService = Depends(get_mood_service),
-    redis: aioredis.Redis = Depends(get_redis_client),
+    moods: CachedMoodService = Depends(get_cached_mood_service),
 ):
     logger.info(
         f"User ID: {user_id} attempting to delete mood stamp for date: {date}"
     )
     try:
-        await service.delete(user_id=user_id, date=date)
+        await moods.delete(user_id=user_id, date=date)
         logger.info(f"User ID: {user_id} deleted mood stamp for date: {date}")
-        keys_to_delete = [f"moodstamp:{user_id}:{date}"]
-        async for key in redis.scan_iter(match=f"moodstamps:{user_id}:*"):
-            keys_to_delete.append(key)
-        if keys_to_delete:
-            await redis.delete(*keys_to_delete)
-            logger.info(
-                f"User ID: {user_id} invalidated {len(keys_to_delete)} cache "
-                f"key(s) for mood stamp date: {date} and lists."
-            )
         return MessageResponse(message="MoodStamp deleted successfully")
     except Exception as e:
         logger.error(
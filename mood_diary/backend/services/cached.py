@@ -0,0 +1,442 @@
+import functools
+import inspect
+import json
+import logging
+from abc import ABC, abstractmethod
+from contextlib import AbstractAsyncContextManager
+from datetime import date
+from typing import Any, Callable, Generic, TypeVar
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from mood_diary.backend.config import config
+from mood_diary.backend.database.cache import (
+    NOT_FOUND,
+    CachedValue,
+    Computed,
+    TieredCache,
+    generation_key,
+    get_generations,
+    moodstamps_month_key,
+)
+from mood_diary.backend.exceptions.mood import MoodStampNotExist
+from mood_diary.backend.services.mood import (
+    MoodService,
+    months_between,
+    page_from_month_blocks,
+    patch_month_block,
+)
+from mood_diary.backend.services.user import UserService
+from mood_diary.common.api.schemas.mood import GetManyMoodStampsRequest
+
+logger = logging.getLogger(__name__)
+
+S = TypeVar("S")
+
+
+def dump_model(value: BaseModel) -> bytes:
+    return value.model_dump_json().encode()
+
+
+def format_key(template: str, variables: dict[str, Any]) -> str:
+    """Key from a str.format template; models are rendered as JSON"""
+    return template.format(
+        **{
+            name: (
+                json.dumps(value.model_dump(mode="json"), sort_keys=True)
+                if isinstance(value, BaseModel)
+                else value
+            )
+            for name, value in variables.items()
+        }
+    )
+
+
+def last_modified(value: Any, fields: tuple[str, ...]) -> float | None:
+    """Latest of the datetime `fields` of a result, as a POSIX timestamp"""
+    timestamps = [
+        getattr(value, field).timestamp()
+        for field in fields
+        if getattr(value, field, None) is not None
+    ]
+    return max(timestamps, default=None)
+
+
+class CachedService(Generic[S]):
+    """
+    A service opened on demand, whose methods are called with the
+    caching declared on the subclass as CacheRule attributes.
+
+    Rules are declared with key templates formatted with the call's
+    arguments. A tag template names a group of keys; the generation of
+    each tag is part of the key of a read, and a write that bumps it
+    invalidates the whole group at once.
+    """
+
+    service_class: type
+
+    def __init__(
+        self,
+        open_service: Callable[[], AbstractAsyncContextManager[S]],
+        cache: TieredCache,
+    ):
+        self.open_service = open_service
+        self.cache = cache
+
+    def arguments(
+        self, method: str, args: tuple, kwargs: dict
+    ) -> dict[str, Any]:
+        signature = inspect.signature(getattr(self.service_class, method))
+        bound = signature.bind(None, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+        del arguments["self"]
+        return arguments
+
+    async def invoke(self, method: str, args: tuple, kwargs: dict) -> Any:
+        async with self.open_service() as service:
+            return await getattr(service, method)(*args, **kwargs)
+
+    def metric(self, method: str) -> str:
+        return f"{self.service_class.__name__}.{method}"
+
+
+class CacheRule(ABC):
+    """Caching of one service method, a CachedService attribute"""
+
+    def __init__(self, method: str | None = None):
+        """`method` defaults to the name of the attribute"""
+        self.method = method or ""
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.method = self.method or name
+
+    def __get__(self, instance: CachedService | None, owner: type) -> Any:
+        if instance is None:
+            return self
+        return functools.partial(self.call, instance)
+
+    @abstractmethod
+    async def call(
+        self, service: CachedService, *args: Any, **kwargs: Any
+    ) -> Any:
+        """Call the method of `service` with caching"""
+        pass
+
+
+class ReadThrough(CacheRule):
+    """
+    Calls answered from the cache, with the serialized result as a
+    CachedValue; only misses open the service.
+
+    Results for which `is_empty` holds are cached for `empty_ttl`
+    instead of `ttl`. A `not_found` error is cached for `not_found_ttl`
+    and raised again on hits. The latest of the result's `modified`
+    timestamps is cached along as the value's last_modified.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        ttl: int,
+        serialize: Callable[[Any], bytes] = dump_model,
+        tags: tuple[str, ...] = (),
+        empty_ttl: int | None = None,
+        is_empty: Callable[[Any], bool] = lambda value: False,
+        not_found: type[Exception] | None = None,
+        not_found_ttl: int = 0,
+        modified: tuple[str, ...] = (),
+        method: str | None = None,
+    ):
+        super().__init__(method)
+        self.key = key
+        self.ttl = ttl
+        self.serialize = serialize
+        self.tags = tags
+        self.empty_ttl = empty_ttl
+        self.is_empty = is_empty
+        self.not_found = not_found
+        self.not_found_ttl = not_found_ttl
+        self.modified = modified
+
+    async def call(
+        self, service: CachedService, *args: Any, **kwargs: Any
+    ) -> CachedValue:
+        arguments = service.arguments(self.method, args, kwargs)
+        key = format_key(self.key, arguments)
+        if self.tags:
+            tags = [format_key(tag, arguments) for tag in self.tags]
+            generations = await get_generations(service.cache, tags)
+            key += ":" + ":".join(map(str, generations))
+
+        missed = False
+
+        async def load() -> Computed:
+            nonlocal missed
+            missed = True
+            logger.info(f"Cache miss: {key}")
+            try:
+                value = await service.invoke(self.method, args, kwargs)
+            except Exception as e:
+                if self.not_found is None or not isinstance(e, self.not_found):
+                    raise
+                return Computed(NOT_FOUND, self.not_found_ttl)
+            ttl = self.ttl
+            if self.empty_ttl is not None and self.is_empty(value):
+                ttl = self.empty_ttl
+            return Computed(
+                self.serialize(value),
+                ttl,
+                last_modified(value, self.modified),
+            )
+
+        try:
+            cached = await service.cache.get_or_compute(key, load)
+        finally:
+            service.cache.record_call(service.metric(self.method), not missed)
+        if cached.payload == NOT_FOUND and self.not_found is not None:
+            raise self.not_found()
+        return cached
+
+
+class WriteThrough(CacheRule):
+    """
+    Calls whose result is cached under `key` the way a ReadThrough rule
+    would cache it, in one transaction with `patches` applied and
+    `tags` bumped. Templates are formatted with the fields of the
+    result as well as the call's arguments.
+
+    `patches` maps key templates to a function of the cached value and
+    the serialized result, and the TTL of the patched value. `modified`
+    is as for ReadThrough.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        ttl: int,
+        serialize: Callable[[Any], bytes] = dump_model,
+        patches: (
+            dict[str, tuple[Callable[[Any, bytes], Any], int]] | None
+        ) = None,
+        tags: tuple[str, ...] = (),
+        modified: tuple[str, ...] = (),
+        method: str | None = None,
+    ):
+        super().__init__(method)
+        self.key = key
+        self.ttl = ttl
+        self.serialize = serialize
+        self.patches = patches or {}
+        self.tags = tags
+        self.modified = modified
+
+    async def call(
+        self, service: CachedService, *args: Any, **kwargs: Any
+    ) -> Any:
+        arguments = service.arguments(self.method, args, kwargs)
+        result = await service.invoke(self.method, args, kwargs)
+        variables = {**dict(result), **arguments}
+        content = self.serialize(result)
+
+        def apply(patch: Callable[[Any, bytes], Any]) -> Callable:
+            return lambda value: patch(value, content)
+
+        await service.cache.write_through(
+            computed={
+                format_key(self.key, variables): Computed(
+                    content, self.ttl, last_modified(result, self.modified)
+                )
+            },
+            patches={
+                format_key(key, variables): (apply(patch), ttl)
+                for key, (patch, ttl) in self.patches.items()
+            },
+            incr=tuple(
+                generation_key(format_key(tag, variables)) for tag in self.tags
+            ),
+        )
+        return result
+
+
+class Invalidates(CacheRule):
+    """Calls after which `keys` are deleted and `tags` bumped"""
+
+    def __init__(
+        self,
+        keys: tuple[str, ...] = (),
+        tags: tuple[str, ...] = (),
+        method: str | None = None,
+    ):
+        super().__init__(method)
+        self.keys = keys
+        self.tags = tags
+
+    async def call(
+        self, service: CachedService, *args: Any, **kwargs: Any
+    ) -> Any:
+        arguments = service.arguments(self.method, args, kwargs)
+        result = await service.invoke(self.method, args, kwargs)
+        await service.cache.write_through(
+            computed={},
+            delete=tuple(format_key(key, arguments) for key in self.keys),
+            incr=tuple(
+                generation_key(format_key(tag, arguments)) for tag in self.tags
+            ),
+        )
+        return result
+
+
+MOODSTAMP_KEY = "moodstamp:{user_id}:{date}"
+MOODSTAMPS_MONTH_KEY = "moodstamps_month:{user_id}:{date:%Y-%m}"
+MOODSTAMPS_TAG = "moodstamps:{user_id}"
+MOODSTAMPS_VERSION_KEY = "moodstamps_version:{user_id}"
+PROFILE_KEY = "profile:{user_id}"
+# Timestamps sent as the Last-Modified of a moodstamp and of a profile
+MOODSTAMP_MODIFIED = ("updated_at",)
+PROFILE_MODIFIED = ("updated_at", "password_updated_at")
+
+
+def month_block_range(
+    start_date: date | None, end_date: date | None
+) -> list[str] | None:
+    """Months a page is assembled from, None if it is queried"""
+    if start_date is None or end_date is None or start_date > end_date:
+        return None
+    months = months_between(start_date, end_date)
+    if len(months) > config.CACHE_MONTH_BLOCKS_MAX:
+        return None
+    return months
+
+
+class CachedMoodService(CachedService[MoodService]):
+    """
+    MoodService with caching. Reads return the JSON documents to send.
+
+    Pages within a date range of at most CACHE_MONTH_BLOCKS_MAX months
+    are assembled from per-month blocks of the user's moodstamps; other
+    pages are cached whole, tagged with the user's moodstamps.
+    """
+
+    service_class = MoodService
+
+    get = ReadThrough(
+        MOODSTAMP_KEY,
+        ttl=config.REDIS_CACHE_TTL,
+        not_found=MoodStampNotExist,
+        not_found_ttl=config.CACHE_NOT_FOUND_TTL,
+        modified=MOODSTAMP_MODIFIED,
+    )
+    get_page = ReadThrough(
+        "moodstamps:{user_id}:{body}",
+        ttl=config.REDIS_CACHE_TTL,
+        serialize=lambda page: page.content,
+        tags=(MOODSTAMPS_TAG,),
+        empty_ttl=config.CACHE_EMPTY_TTL,
+        is_empty=lambda page: not page.count,
+        method="get_many_json",
+    )
+    get_version = ReadThrough(
+        MOODSTAMPS_VERSION_KEY,
+        ttl=config.REDIS_CACHE_TTL,
+        tags=(MOODSTAMPS_TAG,),
+    )
+    create = WriteThrough(
+        MOODSTAMP_KEY,
+        ttl=config.REDIS_CACHE_TTL,
+        patches={
+            MOODSTAMPS_MONTH_KEY: (
+                patch_month_block,
+                config.CACHE_MONTH_BLOCK_TTL,
+            )
+        },
+        tags=(MOODSTAMPS_TAG,),
+        modified=MOODSTAMP_MODIFIED,
+    )
+    update = WriteThrough(
+        MOODSTAMP_KEY,
+        ttl=config.REDIS_CACHE_TTL,
+        patches={
+            MOODSTAMPS_MONTH_KEY: (
+                patch_month_block,
+                config.CACHE_MONTH_BLOCK_TTL,
+            )
+        },
+        tags=(MOODSTAMPS_TAG,),
+        modified=MOODSTAMP_MODIFIED,
+    )
+    delete = Invalidates(
+        keys=(MOODSTAMP_KEY, MOODSTAMPS_MONTH_KEY), tags=(MOODSTAMPS_TAG,)
+    )
+
+    async def get_many_json(
+        self, user_id: UUID, body: GetManyMoodStampsRequest
+    ) -> CachedValue:
+        months = month_block_range(body.start_date, body.end_date)
+        if months is None:
+            return await self.get_page(user_id=user_id, body=body)
+        blocks = await self.get_month_blocks(user_id, months)
+        page = page_from_month_blocks(blocks, body)
+        return CachedValue(page.content)
+
+    async def get_month_blocks(
+        self, user_id: UUID, months: list[str]
+    ) -> list[bytes]:
+        """
+        Month blocks of a user, read with one MGET. The months missing
+        from the cache are read from the database with one range query,
+        from the first of them to the last, and cached.
+
+        A write committed after that query bumps the generation of the
+        user's moodstamps and patches the blocks cached by then only:
+        the blocks cached here are deleted again if the generation read
+        with them has moved, as they may predate the write.
+        """
+        counter = generation_key(
+            format_key(MOODSTAMPS_TAG, {"user_id": user_id})
+        )
+        keys = [moodstamps_month_key(user_id, month) for month in months]
+        generation, *blocks = await self.cache.mget([counter, *keys])
+        missing = [
+            month for month, block in zip(months, blocks) if block is None
+        ]
+        self.cache.record_call(self.metric("get_months_json"), not missing)
+        loaded: dict[str, bytes] = {}
+        if missing:
+            logger.info(
+                f"Cache miss: month blocks of {user_id} "
+                f"{missing[0]}..{missing[-1]} ({len(missing)} missing)"
+            )
+            loaded = await self.invoke(
+                "get_months_json",
+                (),
+                {"user_id": user_id, "first": missing[0], "last": missing[-1]},
+            )
+            cached = {
+                moodstamps_month_key(user_id, month): block
+                for month, block in loaded.items()
+            }
+            await self.cache.set_many(cached, ex=config.CACHE_MONTH_BLOCK_TTL)
+            # Read past the local tier, which may not have heard of the
+            # bump yet
+            if await self.cache.backend.get(counter) != generation:
+                await self.cache.delete(*cached)
+        return [
+            block if block is not None else loaded[month]
+            for month, block in zip(months, blocks)
+        ]
+
+
+class CachedUserService(CachedService[UserService]):
+    """UserService with caching. Reads return the JSON documents to send."""
+
+    service_class = UserService
+
+    get_profile = ReadThrough(
+        PROFILE_KEY, ttl=config.REDIS_CACHE_TTL, modified=PROFILE_MODIFIED
+    )
+    change_password = Invalidates(keys=(PROFILE_KEY,))
+    update_profile = WriteThrough(
+        PROFILE_KEY, ttl=config.REDIS_CACHE_TTL, modified=PROFILE_MODIFIED
+    )
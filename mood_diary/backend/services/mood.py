@@ -1,7 +1,12 @@
+import base64
+import binascii
+import calendar
+import json
 from uuid import UUID
 from datetime import date
 
 from mood_diary.backend.exceptions.mood import (
+    InvalidMoodStampCursor,
     MoodStampAlreadyExists,
     MoodStampNotExist,
     MoodStampAlreadyExistsErrorRepo,
@@ -11,7 +16,10 @@ from mood_diary.backend.repositories.sсhemas.mood import (
     MoodStamp,
     CreateMoodStamp,
     UpdateMoodStamp,
+    JSONMoodStampPage,
     MoodStampFilter,
+    MoodStampPage,
+    MoodStampsVersion,
 )
 from mood_diary.common.api.schemas.mood import (
     CreateMoodStampRequest,
@@ -20,6 +28,113 @@ from mood_diary.common.api.schemas.mood import (
 )
 
 
+def encode_cursor(last_date: date, order: str) -> str:
+    """Opaque cursor pointing past `last_date` in `order`"""
+    token = f"{order}:{last_date.isoformat()}".encode()
+    return base64.urlsafe_b64encode(token).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order: str) -> date:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        token = base64.urlsafe_b64decode(padded).decode()
+        cursor_order, last_date = token.split(":")
+        if cursor_order != order:
+            raise ValueError("Cursor belongs to another order")
+        return date.fromisoformat(last_date)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidMoodStampCursor()
+
+
+def month_of(day: date) -> str:
+    return f"{day:%Y-%m}"
+
+
+def months_between(start: date, end: date) -> list[str]:
+    """Months from the one of `start` to the one of `end`, as YYYY-MM"""
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def month_bounds(month: str) -> tuple[date, date]:
+    """First and last day of a YYYY-MM month"""
+    first = date.fromisoformat(f"{month}-01")
+    days = calendar.monthrange(first.year, first.month)[1]
+    return first, first.replace(day=days)
+
+
+def dump_json(value) -> bytes:
+    # Compact, like the JSON SQLite produces
+    return json.dumps(
+        value, ensure_ascii=False, separators=(",", ":")
+    ).encode()
+
+
+def patch_month_block(block: bytes, moodstamp: bytes) -> bytes:
+    """A month block with `moodstamp` (JSON) added or replaced"""
+    item = json.loads(moodstamp)
+    items = [i for i in json.loads(block) if i["date"] != item["date"]]
+    items.append(item)
+    items.sort(key=lambda i: i["date"])
+    return dump_json(items)
+
+
+def page_from_month_blocks(
+    blocks: list[bytes], body: GetManyMoodStampsRequest
+) -> JSONMoodStampPage:
+    """
+    The page get_many_json returns, assembled from the JSON arrays of
+    get_months_json instead of a query. `blocks` must be in month order
+    and cover the whole range of `body`.
+    """
+    start = body.start_date.isoformat() if body.start_date else None
+    end = body.end_date.isoformat() if body.end_date else None
+    after = (
+        decode_cursor(body.cursor, body.order).isoformat()
+        if body.cursor
+        else None
+    )
+
+    items = []
+    for block in blocks:
+        for item in json.loads(block):
+            day = item["date"]
+            if start is not None and day < start:
+                continue
+            if end is not None and day > end:
+                continue
+            if body.value is not None and item["value"] != body.value:
+                continue
+            if after is not None and (
+                day >= after if body.order == "desc" else day <= after
+            ):
+                continue
+            items.append(item)
+    if body.order == "desc":
+        items.reverse()
+
+    page = items[: body.limit]
+    next_cursor = None
+    if len(items) > body.limit:
+        next_cursor = encode_cursor(
+            date.fromisoformat(page[-1]["date"]), body.order
+        )
+    if body.fields is not None:
+        fields = {"date", *body.fields}
+        page = [
+            {key: value for key, value in item.items() if key in fields}
+            for item in page
+        ]
+    return JSONMoodStampPage(
+        content=dump_json({"items": page, "next_cursor": next_cursor}),
+        count=len(page),
+    )
+
+
 class MoodService:
     def __init__(self, moodstamp_repository: MoodStampRepository):
         self.moodstamp_repository = moodstamp_repository
@@ -98,11 +213,18 @@ class MoodService:
 
     async def get_many(
         self, user_id: UUID, body: GetManyMoodStampsRequest
-    ) -> list[MoodStamp]:
+    ) -> MoodStampPage:
         filter = MoodStampFilter(
             start_date=body.start_date,
             end_date=body.end_date,
             value=body.value,
+            after=(
+                decode_cursor(body.cursor, body.order) if body.cursor else None
+            ),
+            # One extra row tells whether there is a next page
+            limit=body.limit + 1,
+            order=body.order,
+            fields=body.fields,
         )
 
         moodstamps = await self.moodstamp_repository.get_many(
@@ -111,9 +233,17 @@ class MoodService:
         )
 
         if moodstamps is None:
-            return []
+            return MoodStampPage(items=[], next_cursor=None)
+
+        next_cursor = None
+        if len(moodstamps) > body.limit:
+            moodstamps = moodstamps[: body.limit]
+            next_cursor = encode_cursor(moodstamps[-1].date, body.order)
 
-        return [
+        if body.fields is not None:
+            return MoodStampPage(items=moodstamps, next_cursor=next_cursor)
+
+        items = [
             MoodStamp(
                 id=moodstamp.id,
                 date=moodstamp.date,
@@ -125,6 +255,71 @@ class MoodService:
             )
             for moodstamp in moodstamps
         ]
+        return MoodStampPage(items=items, next_cursor=next_cursor)
+
+    async def get_many_json(
+        self, user_id: UUID, body: GetManyMoodStampsRequest
+    ) -> JSONMoodStampPage:
+        """
+        Same page as get_many, already serialized: the items come from
+        the database as one JSON array and are never parsed here.
+        """
+        filter = MoodStampFilter(
+            start_date=body.start_date,
+            end_date=body.end_date,
+            value=body.value,
+            after=(
+                decode_cursor(body.cursor, body.order) if body.cursor else None
+            ),
+            limit=body.limit,
+            order=body.order,
+            fields=body.fields,
+        )
+
+        rows = await self.moodstamp_repository.get_many_json(
+            user_id=user_id,
+            body=filter,
+        )
+
+        next_cursor = None
+        if rows.has_more and rows.last_date is not None:
+            next_cursor = encode_cursor(rows.last_date, body.order)
+
+        content = b"".join(
+            (
+                b'{"items":',
+                rows.items,
+                b',"next_cursor":',
+                json.dumps(next_cursor).encode(),
+                b"}",
+            )
+        )
+        return JSONMoodStampPage(content=content, count=rows.count)
+
+    async def get_months_json(
+        self, user_id: UUID, first: str, last: str
+    ) -> dict[str, bytes]:
+        """
+        Moodstamps of every month from `first` to `last` (YYYY-MM), read
+        with one range query and serialized as a JSON array per month, in
+        date order. Months without moodstamps get an empty array.
+        """
+        start, _ = month_bounds(first)
+        _, end = month_bounds(last)
+        rows = await self.moodstamp_repository.get_many_json(
+            user_id=user_id,
+            body=MoodStampFilter(start_date=start, end_date=end, order="asc"),
+        )
+
+        months: dict[str, list] = {
+            month: [] for month in months_between(start, end)
+        }
+        for item in json.loads(rows.items):
+            months[item["date"][:7]].append(item)
+        return {month: dump_json(items) for month, items in months.items()}
+
+    async def get_version(self, user_id: UUID) -> MoodStampsVersion:
+        return await self.moodstamp_repository.get_version(user_id=user_id)
 
     async def delete(self, user_id: UUID, date: date) -> None:
         success = await self.moodstamp_repository.delete(
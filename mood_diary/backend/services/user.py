@@ -1,13 +1,17 @@
+import logging
 from uuid import UUID
 
+from mood_diary.backend.exceptions.database import DatabaseBusy
 from mood_diary.backend.exceptions.user import (
     IncorrectPasswordOrUserDoesNotExists,
     UserNotFound,
     IncorrectOldPassword,
+    PasswordHashingBusy,
     UsernameAlreadyExists,
 )
 from mood_diary.backend.repositories.sсhemas.user import (
     CreateUser,
+    User,
     UpdateUserProfile,
     UpdateUserHashedPassword,
 )
@@ -23,6 +27,8 @@ from mood_diary.common.api.schemas.auth import (
     ChangeProfileRequest,
 )
 
+logger = logging.getLogger(__name__)
+
 
 class UserService:
     def __init__(
@@ -38,7 +44,9 @@ class UserService:
     async def register(self, body: RegisterRequest) -> Profile:
         create_user = CreateUser(
             username=body.username,
-            hashed_password=self.password_hasher.hash(body.password),
+            hashed_password=await self.password_hasher.hash_async(
+                body.password
+            ),
             name=body.name,
         )
 
@@ -59,17 +67,36 @@ class UserService:
     async def login(self, body: LoginRequest) -> LoginResponse:
         user = await self.user_repository.get_by_username(body.username)
 
-        if not user or not self.password_hasher.verify(
+        if not user or not await self.password_hasher.verify_async(
             body.password, user.hashed_password
         ):
             raise IncorrectPasswordOrUserDoesNotExists()
 
+        if self.password_hasher.needs_rehash(user.hashed_password):
+            await self.rehash_password(user, body.password)
+
         return LoginResponse(
             access_token=self.token_manager.create_token(
                 TokenType.ACCESS, user.id
             ),
         )
 
+    async def rehash_password(self, user: User, password: str) -> None:
+        """
+        Store the hash of a verified password with the current hashing
+        parameters. Skipped while hashing or the database is busy, as
+        the next login tries again.
+        """
+        try:
+            hashed_password = await self.password_hasher.hash_async(password)
+            await self.user_repository.rehash_password(
+                user.id,
+                user.hashed_password,
+                UpdateUserHashedPassword(hashed_password=hashed_password),
+            )
+        except (PasswordHashingBusy, DatabaseBusy):
+            logger.info(f"Password rehash of {user.id} skipped")
+
     async def get_profile(self, user_id: UUID) -> Profile:
         user = await self.user_repository.get(user_id)
 
@@ -93,12 +120,14 @@ class UserService:
         if not user:
             raise UserNotFound()
 
-        if not self.password_hasher.verify(
+        if not await self.password_hasher.verify_async(
             body.old_password, user.hashed_password
         ):
             raise IncorrectOldPassword()
 
-        hashed_password = self.password_hasher.hash(body.new_password)
+        hashed_password = await self.password_hasher.hash_async(
+            body.new_password
+        )
 
         update_user = UpdateUserHashedPassword(hashed_password=hashed_password)
 
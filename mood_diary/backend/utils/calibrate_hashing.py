@@ -0,0 +1,101 @@
+"""
+Benchmark password hashing on this host and recommend the number of
+iterations that makes one hash take about the given time on one core.
+
+Each hash takes a worker of the hashing pool for that long, so the
+workers can sustain PASSWORD_HASHING_WORKERS / target logins a second.
+Stored hashes are replaced with the new parameters on login.
+
+Usage: python -m mood_diary.backend.utils.calibrate_hashing \
+    [--target-ms 250] [--hash-name sha256] [--rounds 5]
+"""
+
+import argparse
+import statistics
+import time
+from typing import NamedTuple
+
+from mood_diary.backend.config import config
+from mood_diary.backend.utils.password_hasher import SaltPasswordHasher
+
+PROBE_ITERATIONS = 20_000
+# Rounded down to a multiple of this, not to suggest more precision
+ITERATIONS_STEP = 10_000
+# Minimums recommended by OWASP for PBKDF2-HMAC
+MINIMUM_ITERATIONS = {"sha1": 1_300_000, "sha256": 600_000, "sha512": 210_000}
+
+
+class Calibration(NamedTuple):
+    hash_name: str
+    iterations: int
+    milliseconds: float
+
+
+def hasher_for(hash_name: str, iterations: int) -> SaltPasswordHasher:
+    return SaltPasswordHasher(
+        config.PASSWORD_HASHING_ENCODING,
+        config.PASSWORD_HASHING_SALT_SIZE,
+        hash_name,
+        iterations,
+        config.PASSWORD_HASHING_SPLIT_CHAR,
+    )
+
+
+def measure(hasher: SaltPasswordHasher, rounds: int) -> float:
+    """Median time of a hash, in milliseconds"""
+    samples = []
+    for _ in range(rounds):
+        began = time.perf_counter()
+        hasher.hash("calibration-password")
+        samples.append((time.perf_counter() - began) * 1000)
+    return statistics.median(samples)
+
+
+def calibrate(hash_name: str, target_ms: float, rounds: int) -> Calibration:
+    probe = measure(hasher_for(hash_name, PROBE_ITERATIONS), rounds)
+    iterations = int(target_ms / probe * PROBE_ITERATIONS)
+    iterations = max(
+        ITERATIONS_STEP, iterations // ITERATIONS_STEP * ITERATIONS_STEP
+    )
+    milliseconds = measure(hasher_for(hash_name, iterations), rounds)
+    return Calibration(hash_name, iterations, milliseconds)
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--target-ms", type=float, default=250.0)
+    parser.add_argument(
+        "--hash-name", default=config.PASSWORD_HASHING_HASH_NAME
+    )
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    current = measure(
+        hasher_for(args.hash_name, config.PASSWORD_HASHING_HASH_ITERATIONS),
+        args.rounds,
+    )
+    result = calibrate(args.hash_name, args.target_ms, args.rounds)
+    workers = config.PASSWORD_HASHING_WORKERS
+    print(
+        f"current:     {config.PASSWORD_HASHING_HASH_ITERATIONS} "
+        f"iterations, {current:.1f}ms per hash"
+    )
+    print(
+        f"recommended: {result.iterations} iterations, "
+        f"{result.milliseconds:.1f}ms per hash, "
+        f"{workers * 1000 / result.milliseconds:.1f} logins/s "
+        f"on {workers} worker(s)"
+    )
+    minimum = MINIMUM_ITERATIONS.get(result.hash_name)
+    if minimum is not None and result.iterations < minimum:
+        print(
+            f"warning: below the {minimum} iterations recommended for "
+            f"{result.hash_name}; raise --target-ms or add workers"
+        )
+    print()
+    print(f"PASSWORD_HASHING_HASH_NAME={result.hash_name}")
+    print(f"PASSWORD_HASHING_HASH_ITERATIONS={result.iterations}")
+
+
+if __name__ == "__main__":
+    main()
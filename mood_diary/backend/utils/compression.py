@@ -0,0 +1,163 @@
+import gzip
+import zlib
+from typing import Literal, Protocol
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ContentEncoding = Literal["identity", "gzip", "br", "zstd"]
+
+GZIP_LEVEL = 6
+# Brotli's default quality of 11 is meant for static assets
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+
+class Compressor(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes:
+        """Output for the input so far, without ending the stream"""
+        ...
+
+    def finish(self) -> bytes: ...
+
+
+def is_available(encoding: str) -> bool:
+    if encoding == "br":
+        return brotli is not None
+    if encoding == "zstd":
+        return zstandard is not None
+    return encoding in ("identity", "gzip")
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        # mtime=0 keeps the output of equal inputs equal
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if encoding == "identity":
+        return data
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def decompress(data: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    if encoding == "br" and brotli is not None:
+        return brotli.decompress(data)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompress(data)
+    if encoding == "identity":
+        return data
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+class GzipCompressor:
+    def __init__(self) -> None:
+        # wbits=31 writes the gzip header and trailer
+        self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self.compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+    def __init__(self) -> None:
+        self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self.compressor.flush()
+
+    def finish(self) -> bytes:
+        return self.compressor.finish()
+
+
+class ZstdCompressor:
+    def __init__(self) -> None:
+        self.compressor = zstandard.ZstdCompressor(
+            level=ZSTD_LEVEL
+        ).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def get_compressor(encoding: str) -> Compressor:
+    """Incremental compressor, for bodies sent in several parts"""
+    if encoding == "gzip":
+        return GzipCompressor()
+    if encoding == "br" and brotli is not None:
+        return BrotliCompressor()
+    if encoding == "zstd" and zstandard is not None:
+        return ZstdCompressor()
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def parse_accept_encoding(accept_encoding: str | None) -> dict[str, float]:
+    """Quality of each coding an Accept-Encoding header names"""
+    qualities: dict[str, float] = {}
+    if not accept_encoding:
+        return qualities
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities.setdefault(name, quality)
+    return qualities
+
+
+def accepts(accept_encoding: str | None, encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows `encoding`"""
+    if encoding == "identity":
+        return True
+    qualities = parse_accept_encoding(accept_encoding)
+    return qualities.get(encoding, qualities.get("*", 0.0)) > 0
+
+
+def negotiate(accept_encoding: str | None, encodings: list[str]) -> str:
+    """
+    The one of `encodings` an Accept-Encoding header gives the highest
+    quality, the earliest of them on ties, or "identity"
+    """
+    qualities = parse_accept_encoding(accept_encoding)
+    best, best_quality = "identity", 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
@@ -0,0 +1,125 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from mood_diary.backend.utils.compression import (
+    Compressor,
+    compress,
+    get_compressor,
+    is_available,
+    negotiate,
+)
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+class CompressionMiddleware:
+    """
+    Compresses response bodies of at least `min_size` bytes with the
+    one of `encodings` the client prefers.
+
+    Responses that already have a Content-Encoding, such as cached
+    bodies stored compressed, are sent as they are. A body sent in one
+    message is compressed at once; a streamed one is compressed as it
+    goes, each part flushed so that the client can decode it on
+    arrival. A strong ETag of a body compressed here is made weak, as
+    it was computed from other bytes.
+    """
+
+    def __init__(
+        self, app: ASGIApp, encodings: list[str], min_size: int = 1024
+    ):
+        self.app = app
+        self.encodings = [
+            encoding for encoding in encodings if is_available(encoding)
+        ]
+        self.min_size = min_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(
+            Headers(scope=scope).get("accept-encoding"), self.encodings
+        )
+        if encoding == "identity":
+            await self.app(scope, receive, send)
+            return
+        responder = CompressionResponder(send, encoding, self.min_size)
+        await self.app(scope, receive, responder.send)
+
+
+class CompressionResponder:
+    """The `send` of one response, compressing its body"""
+
+    def __init__(self, send: Send, encoding: str, min_size: int):
+        self.downstream = send
+        self.encoding = encoding
+        self.min_size = min_size
+        self.start: Message | None = None
+        self.compressor: Compressor | None = None
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self.passthrough = (
+                "content-encoding" in headers
+                or message["status"] in (204, 304)
+                or not headers.get("content-type", "").startswith(
+                    COMPRESSIBLE_TYPES
+                )
+            )
+            if self.passthrough:
+                await self.downstream(message)
+            else:
+                self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            if not more_body:
+                await self.send_whole(start, body)
+                return
+            self.compressor = get_compressor(self.encoding)
+            headers = self.compressed_headers(start)
+            del headers["content-length"]
+            await self.downstream(start)
+
+        if self.compressor is None:
+            await self.downstream(message)
+            return
+        data = self.compressor.compress(body)
+        data += (
+            self.compressor.flush() if more_body else self.compressor.finish()
+        )
+        await self.downstream(
+            {
+                "type": "http.response.body",
+                "body": data,
+                "more_body": more_body,
+            }
+        )
+
+    async def send_whole(self, start: Message, body: bytes) -> None:
+        if len(body) >= self.min_size:
+            body = compress(body, self.encoding)
+            headers = self.compressed_headers(start)
+            headers["content-length"] = str(len(body))
+        else:
+            MutableHeaders(scope=start).add_vary_header("Accept-Encoding")
+        await self.downstream(start)
+        await self.downstream({"type": "http.response.body", "body": body})
+
+    def compressed_headers(self, start: Message) -> MutableHeaders:
+        headers = MutableHeaders(scope=start)
+        headers["content-encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag is not None and not etag.startswith("W/"):
+            headers["etag"] = f"W/{etag}"
+        return headers
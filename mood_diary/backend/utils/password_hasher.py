@@ -1,10 +1,104 @@
+import asyncio
 import hashlib
+import math
 import os
 import secrets
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from typing import Any, Callable, Literal, NamedTuple, TypeVar
+
+from mood_diary.backend.exceptions.user import PasswordHashingBusy
+
+T = TypeVar("T")
+
+
+def timed(func: Callable[..., T], *args: Any) -> tuple[T, float]:
+    began = time.perf_counter()
+    return func(*args), time.perf_counter() - began
+
+
+class HashingPool:
+    """
+    Workers password hashing runs on, away from the event loop.
+
+    At most `workers + max_queue` calls are admitted at once; the ones
+    beyond are refused with PasswordHashingBusy straight away instead of
+    queueing, so a burst of sign-ins cannot hold up other requests. A
+    process pool also keeps the hashing off the GIL of the server.
+    """
+
+    def __init__(
+        self,
+        kind: Literal["thread", "process"],
+        workers: int,
+        max_queue: int,
+    ):
+        self.kind = kind
+        self.workers = workers
+        self.max_queue = max_queue
+        self.pending = 0
+        self.rejected = 0
+        # Moving average of the time a call takes on a worker
+        self.mean_duration = 0.0
+        self._executor: Executor | None = None
+
+    @property
+    def executor(self) -> Executor:
+        """Started on first use, so that idle processes never fork"""
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix="password-hasher"
+                )
+        return self._executor
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        if self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise PasswordHashingBusy(self.retry_after())
+        loop = asyncio.get_running_loop()
+        future = self.executor.submit(timed, func, *args)
+        # The call holds its place until the worker is done with it, even
+        # if the request awaiting it is cancelled first
+        self.pending += 1
+        future.add_done_callback(lambda future: self._done(loop, future))
+        result, _ = await asyncio.wrap_future(future)
+        return result
+
+    def _done(self, loop: asyncio.AbstractEventLoop, future: Future) -> None:
+        # Queued calls cancelled by close() may end after the loop did
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(self._release, future)
+
+    def _release(self, future: Future) -> None:
+        self.pending -= 1
+        if not future.cancelled() and future.exception() is None:
+            _, duration = future.result()
+            self.mean_duration += (duration - self.mean_duration) * 0.2
+
+    def retry_after(self) -> int:
+        """Seconds until the admitted calls are done, at least one"""
+        return max(
+            1, math.ceil(self.pending * self.mean_duration / self.workers)
+        )
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
 
 
 class PasswordHasher(ABC):
+    pool: HashingPool | None = None
+
     @abstractmethod
     def hash(self, password: str | bytes) -> str:
         """Hash a password"""
@@ -15,8 +109,52 @@ class PasswordHasher(ABC):
         """Verify a password against a stored hash"""
         pass
 
+    async def hash_async(self, password: str | bytes) -> str:
+        """hash, run on the pool if there is one"""
+        if self.pool is None:
+            return self.hash(password)
+        return await self.pool.run(self.hash, password)
+
+    async def verify_async(
+        self, password: str | bytes, stored_hash: str
+    ) -> bool:
+        """verify, run on the pool if there is one"""
+        if self.pool is None:
+            return self.verify(password, stored_hash)
+        return await self.pool.run(self.verify, password, stored_hash)
+
+    def needs_rehash(self, stored_hash: str) -> bool:
+        """
+        Whether a stored hash was computed with other parameters than
+        hash would use now
+        """
+        return False
+
+    def close(self) -> None:
+        """Stops the workers of the pool, if there is one"""
+        if self.pool is not None:
+            self.pool.close()
+
+
+class HashParameters(NamedTuple):
+    """How a stored hash was computed"""
+
+    hash_name: str
+    iterations: int
+    salt: bytes
+    password_hash: bytes
+
 
 class SaltPasswordHasher(PasswordHasher):
+    """
+    PBKDF2-HMAC with a random salt. Hashes are stored as
+    `pbkdf2_<hash name>$<iterations>$<salt>$<hash>`, so that a change
+    of the cost does not invalidate them; hashes stored as
+    `<salt>$<hash>` before that are verified with `legacy_iterations`.
+    """
+
+    ALGORITHM_PREFIX = "pbkdf2_"
+
     def __init__(
         self,
         encoding: str,
@@ -24,39 +162,99 @@ class SaltPasswordHasher(PasswordHasher):
         hash_name: str,
         hash_iterations: int,
         split_char: str,
+        pool: HashingPool | None = None,
+        legacy_iterations: int | None = None,
     ):
         self.encoding = encoding
         self.salt_size = salt_size
         self.hash_name = hash_name
         self.hash_iterations = hash_iterations
         self.split_char = split_char
+        self.pool = pool
+        self.legacy_iterations = legacy_iterations or hash_iterations
+
+    def __getstate__(self) -> dict:
+        # Sent to pool processes without the pool
+        return {**self.__dict__, "pool": None}
 
     def hash(self, password: str | bytes) -> str:
         salt = os.urandom(self.salt_size)
 
         password_bytes = self.__password_bytes(password)
-        password_hash = self.__password_hash(password_bytes, salt)
+        password_hash = self.__password_hash(
+            password_bytes, salt, self.hash_name, self.hash_iterations
+        )
 
-        return f"{salt.hex()}{self.split_char}{password_hash.hex()}"
+        return self.split_char.join(
+            (
+                f"{self.ALGORITHM_PREFIX}{self.hash_name}",
+                str(self.hash_iterations),
+                salt.hex(),
+                password_hash.hex(),
+            )
+        )
 
     def verify(self, password: str | bytes, stored_hash: str) -> bool:
-        try:
-            salt, expected_password_hash = [
-                bytes.fromhex(x) for x in stored_hash.split(self.split_char)
-            ]
-        except ValueError:
+        parameters = self.parse(stored_hash)
+        if parameters is None:
             return False
 
         password_bytes = self.__password_bytes(password)
-        password_hash = self.__password_hash(password_bytes, salt)
+        try:
+            password_hash = self.__password_hash(
+                password_bytes,
+                parameters.salt,
+                parameters.hash_name,
+                parameters.iterations,
+            )
+        except ValueError:
+            # Unsupported hash name
+            return False
 
-        return secrets.compare_digest(password_hash, expected_password_hash)
+        return secrets.compare_digest(password_hash, parameters.password_hash)
 
-    def __password_hash(self, password_bytes: bytes, salt: bytes) -> bytes:
-        return hashlib.pbkdf2_hmac(
-            self.hash_name, password_bytes, salt, self.hash_iterations
+    def needs_rehash(self, stored_hash: str) -> bool:
+        parameters = self.parse(stored_hash)
+        return (
+            parameters is None
+            or not stored_hash.startswith(self.ALGORITHM_PREFIX)
+            or parameters.hash_name != self.hash_name
+            or parameters.iterations != self.hash_iterations
+            or len(parameters.salt) != self.salt_size
         )
 
+    def parse(self, stored_hash: str) -> HashParameters | None:
+        """Parameters of a stored hash, None if it is malformed"""
+        parts = stored_hash.split(self.split_char)
+        try:
+            if len(parts) == 2:
+                return HashParameters(
+                    self.hash_name,
+                    self.legacy_iterations,
+                    bytes.fromhex(parts[0]),
+                    bytes.fromhex(parts[1]),
+                )
+            algorithm, iterations, salt, password_hash = parts
+            if not algorithm.startswith(self.ALGORITHM_PREFIX):
+                return None
+            return HashParameters(
+                algorithm.removeprefix(self.ALGORITHM_PREFIX),
+                int(iterations),
+                bytes.fromhex(salt),
+                bytes.fromhex(password_hash),
+            )
+        except ValueError:
+            return None
+
+    def __password_hash(
+        self,
+        password_bytes: bytes,
+        salt: bytes,
+        hash_name: str,
+        iterations: int,
+    ) -> bytes:
+        return hashlib.pbkdf2_hmac(hash_name, password_bytes, salt, iterations)
+
     def __password_bytes(self, password: str | bytes) -> bytes:
         if isinstance(password, str):
             return password.encode(self.encoding)
@@ -1,6 +1,11 @@
+import hashlib
+import threading
+import time
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from datetime import datetime, timedelta, UTC
 from enum import Enum
+from typing import Callable
 from uuid import UUID
 
 import jwt
@@ -36,16 +41,67 @@ class TokenManager(ABC):
         pass
 
 
+class VerifiedTokenCache:
+    """
+    LRU of the payloads of verified tokens, keyed by a hash of the
+    token, each dropped once its token expires
+    """
+
+    def __init__(
+        self, max_entries: int, clock: Callable[[], float] = time.time
+    ):
+        self.max_entries = max_entries
+        self.clock = clock
+        self.entries: OrderedDict[bytes, TokenPayload] = OrderedDict()
+        # Sync dependencies run on the threadpool
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> TokenPayload | None:
+        key = self.key(token)
+        with self.lock:
+            payload = self.entries.get(key)
+            if payload is None:
+                return None
+            if payload.exp <= self.clock():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return payload
+
+    def set(self, token: str, payload: TokenPayload) -> None:
+        if self.max_entries <= 0:
+            return
+        key = self.key(token)
+        with self.lock:
+            self.entries[key] = payload
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
 class JWTTokenManager(TokenManager):
     def __init__(
         self,
         secret_key: str,
         algorithm: str,
         access_token_exp_minutes: int,
+        verified_cache_size: int = 0,
     ):
+        """
+        Up to `verified_cache_size` verified tokens are remembered, so
+        that their signature is checked once
+        """
         self.secret_key = secret_key
         self.algorithm = algorithm
         self.access_token_exp = timedelta(minutes=access_token_exp_minutes)
+        self.verified = VerifiedTokenCache(verified_cache_size)
 
     def create_token(self, token_type: TokenType, user_id: UUID) -> str:
         now = datetime.now(UTC)
@@ -66,12 +122,17 @@ class JWTTokenManager(TokenManager):
         )
 
     def decode_token(self, token: str) -> TokenPayload | None:
+        payload = self.verified.get(token)
+        if payload is not None:
+            return payload
         try:
             decoded = jwt.decode(
                 token, self.secret_key, algorithms=[self.algorithm]
             )
             decoded["user_id"] = UUID(decoded["user_id"])
-            return TokenPayload(**decoded)
+            payload = TokenPayload(**decoded)
+            self.verified.set(token, payload)
+            return payload
         except jwt.ExpiredSignatureError:
             # TODO: Add logging
             pass
@@ -0,0 +1,40 @@
+from pydantic import BaseModel
+
+
+class CacheTierStats(BaseModel):
+    hits: int
+    misses: int
+    hit_ratio: float
+
+
+class CachePoolStats(BaseModel):
+    max_connections: int
+    in_use: int
+    idle: int
+    # Connections asked for while all were in use, the time spent
+    # waiting for one and the number of waits that timed out
+    waits: int
+    wait_time: float  # seconds
+    timeouts: int
+
+
+class CacheLatencyStats(BaseModel):
+    calls: int
+    mean_ms: float
+    max_ms: float
+
+
+class CacheStatsResponse(BaseModel):
+    local: CacheTierStats
+    # The shared tier, whichever backend holds it
+    redis: CacheTierStats
+    local_entries: int
+    backend: str = "redis"
+    # Whether the backend has fallen back to process memory
+    degraded: bool = False
+    # Hits and misses of each cached service method
+    calls: dict[str, CacheTierStats] = {}
+    # Connection pool of the backend, if it has one
+    pool: CachePoolStats | None = None
+    # Latency of each kind of backend call
+    latency: dict[str, CacheLatencyStats] = {}
@@ -1,4 +1,5 @@
 from datetime import date, datetime
+from typing import Literal
 from uuid import UUID
 
 from pydantic import BaseModel, Field
@@ -14,6 +15,22 @@ class MoodStampSchema(BaseModel):
     updated_at: datetime
 
 
+# In the order of the columns of the moodstamps table
+MoodStampField = Literal[
+    "id", "user_id", "date", "value", "note", "created_at", "updated_at"
+]
+
+
+class PartialMoodStampSchema(BaseModel):
+    date: date
+    id: UUID | None = None
+    user_id: UUID | None = None
+    value: int | None = None
+    note: str | None = None
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
+
+
 class CreateMoodStampRequest(BaseModel):
     date: date
     value: int = Field(..., ge=1, le=10)
@@ -29,3 +46,13 @@ class GetManyMoodStampsRequest(BaseModel):
     start_date: date | None = None
     end_date: date | None = None
     value: int | None = None
+    limit: int = Field(default=100, ge=1)
+    cursor: str | None = None
+    order: Literal["asc", "desc"] = "desc"
+    fields: list[MoodStampField] | None = None
+
+
+class MoodStampPageResponse(BaseModel):
+    # Partial items carry only the requested fields, see `fields`
+    items: list[MoodStampSchema | PartialMoodStampSchema]
+    next_cursor: str | None
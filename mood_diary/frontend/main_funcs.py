@@ -69,7 +69,11 @@ def refresh_data():
 def get_user_ratings_data():
     end_date = datetime.date.today()
     start_date = end_date - datetime.timedelta(days=30)
-    mood_data = fetch_all_mood(start_date.isoformat(), end_date.isoformat())
+    mood_data = fetch_all_mood(
+        start_date.isoformat(),
+        end_date.isoformat(),
+        fields=["date", "value", "note"],
+    )
 
     if not mood_data:
         return pd.DataFrame(columns=["date", "rating", "comment"])
@@ -83,26 +83,35 @@ def fetch_mood_by_date(date):
         st.stop()
 
 
-def fetch_all_mood(start_date=None, end_date=None, value=None):
+def fetch_all_mood(start_date=None, end_date=None, value=None, fields=None):
     try:
         session = provide_requests_session()
-        params = {}
-        if value is not None:
-            params["value"] = value
-        if start_date is not None:
-            params["start_date"] = start_date
-        if end_date is not None:
-            params["end_date"] = end_date
-
-        response = session.get(f"{BASE_URL}/mood", params=params)
-
-        if response.status_code == 200:
-            return response.json()
-        elif response.status_code == 401:
-            st.switch_page("pages/authorization.py")
-        else:
-            st.error(f"Failed to load user mood: {response.status_code}")
-            st.stop()
+        filters = {
+            "value": value,
+            "start_date": start_date,
+            "end_date": end_date,
+        }
+        params = {k: v for k, v in filters.items() if v is not None}
+        if fields is not None:
+            params["fields"] = ",".join(fields)
+
+        mood_data = []
+        while True:
+            response = session.get(f"{BASE_URL}/mood", params=params)
+
+            if response.status_code == 200:
+                page = response.json()
+                mood_data.extend(page["items"])
+                if page["next_cursor"] is None:
+                    return mood_data
+                params["cursor"] = page["next_cursor"]
+            elif response.status_code == 401:
+                st.switch_page("pages/authorization.py")
+                return None
+            else:
+                st.error(f"Failed to load user mood: {response.status_code}")
+                st.stop()
+                return None
     except Exception as e:
         st.error(f"Error fetching mood: {e}")
         st.stop()
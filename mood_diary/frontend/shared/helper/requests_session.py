@@ -1,9 +1,81 @@
+import copy
+from collections import OrderedDict
+
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
+
+# Headers of a stored response a 304 answer replaces
+UPDATED_HEADERS = ("Cache-Control", "Date", "ETag", "Expires", "Last-Modified")
+
+
+class ConditionalAdapter(HTTPAdapter):
+    """
+    HTTPAdapter revalidating the responses it has seen. GET requests
+    are sent with the ETag and Last-Modified of the last response for
+    the same URL and cookies; a 304 Not Modified answer is replaced by
+    a copy of that response.
+    """
+
+    def __init__(self, max_entries: int = 256, **kwargs):
+        super().__init__(**kwargs)
+        self.max_entries = max_entries
+        self.responses: OrderedDict[tuple, requests.Response] = OrderedDict()
+
+    def send(self, request, **kwargs):
+        if request.method != "GET":
+            return super().send(request, **kwargs)
+
+        key = (request.url, request.headers.get("Cookie"))
+        cached = self.responses.get(key)
+        if cached is not None:
+            validators = {
+                "If-None-Match": cached.headers.get("ETag"),
+                "If-Modified-Since": cached.headers.get("Last-Modified"),
+            }
+            for name, value in validators.items():
+                if value is not None:
+                    request.headers.setdefault(name, value)
+
+        response = super().send(request, **kwargs)
+        if (
+            response.status_code == requests.codes.not_modified
+            and cached is not None
+        ):
+            self.responses.move_to_end(key)
+            return self.revalidated(cached, response)
+        if response.status_code == requests.codes.ok and (
+            "ETag" in response.headers or "Last-Modified" in response.headers
+        ):
+            response.content  # read before the connection is released
+            self.responses[key] = response
+            self.responses.move_to_end(key)
+            while len(self.responses) > self.max_entries:
+                self.responses.popitem(last=False)
+        return response
+
+    @staticmethod
+    def revalidated(
+        cached: requests.Response, not_modified: requests.Response
+    ) -> requests.Response:
+        """`cached` as the answer to the request of `not_modified`"""
+        response = copy.copy(cached)
+        response.headers = cached.headers.copy()
+        for name in UPDATED_HEADERS:
+            if name in not_modified.headers:
+                response.headers[name] = not_modified.headers[name]
+        response.request = not_modified.request
+        response.elapsed = not_modified.elapsed
+        response.history = []
+        return response
 
 
 def provide_requests_session():
     if "requests_session" not in st.session_state:
-        st.session_state.requests_session = requests.Session()
+        session = requests.Session()
+        adapter = ConditionalAdapter()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        st.session_state.requests_session = session
 
     return st.session_state.requests_session
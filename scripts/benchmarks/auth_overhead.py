@@ -0,0 +1,76 @@
+"""
+Measure the authentication overhead of a request: resolving the token
+manager and the user id of an access token, with a token manager built
+per request as before, and with the shared one and its cache of
+verified tokens.
+
+Usage: python -m scripts.benchmarks.auth_overhead \
+    [--users 100] [--requests 100000]
+"""
+
+import argparse
+import random
+import statistics
+import time
+from uuid import uuid4
+
+from mood_diary.backend.config import config
+from mood_diary.backend.routes.dependencies import (
+    get_current_user_id,
+    get_token_manager,
+)
+from mood_diary.backend.utils.token_manager import JWTTokenManager, TokenType
+
+SECRET_KEY = "benchmark-secret-key-of-at-least-32-bytes"
+ALGORITHM = "HS256"
+EXPIRE_MINUTES = 60
+
+
+def per_request(token: str):
+    token_manager = JWTTokenManager(SECRET_KEY, ALGORITHM, EXPIRE_MINUTES)
+    return get_current_user_id(token, token_manager)
+
+
+def shared(token: str):
+    return get_current_user_id(token, get_token_manager())
+
+
+def measure(func, tokens: list[str], requests: int) -> list[float]:
+    samples = []
+    for _ in range(requests):
+        token = random.choice(tokens)
+        began = time.perf_counter()
+        func(token)
+        samples.append((time.perf_counter() - began) * 1_000_000)
+    return samples
+
+
+def run(args):
+    config.AUTH_TOKEN_SECRET_KEY = SECRET_KEY
+    config.AUTH_TOKEN_ALGORITHM = ALGORITHM
+    config.AUTH_TOKEN_ACCESS_TOKEN_EXPIRE_MINUTES = EXPIRE_MINUTES
+    issuer = JWTTokenManager(SECRET_KEY, ALGORITHM, EXPIRE_MINUTES)
+    tokens = [
+        issuer.create_token(TokenType.ACCESS, uuid4())
+        for _ in range(args.users)
+    ]
+
+    for func in (per_request, shared):
+        samples = measure(func, tokens, args.requests)
+        print(
+            f"{func.__name__:>12}: "
+            f"p50={statistics.median(samples):.1f}us "
+            f"mean={statistics.mean(samples):.1f}us "
+            f"p99={statistics.quantiles(samples, n=100)[98]:.1f}us"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=100_000)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Compare the cost of invalidating one user's moodstamp list caches by
+scanning the keyspace with the cost of bumping their generation counter,
+as the number of cached keys of other users grows.
+
+Usage: python -m scripts.benchmarks.cache_invalidation \
+    [--url redis://localhost:6379/15] [--keys 1000000] [--rounds 50]
+
+The database behind --url is flushed.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from uuid import uuid4
+
+import redis.asyncio as aioredis
+
+from mood_diary.backend.config import config
+from mood_diary.backend.database.cache import generation_key
+
+KEYS_PER_USER = 10
+
+
+async def seed(redis: aioredis.Redis, keys: int, generation: bool):
+    async with redis.pipeline(transaction=False) as pipe:
+        for _ in range(0, keys, KEYS_PER_USER):
+            prefix = f"moodstamps:{uuid4()}:"
+            if generation:
+                prefix += "0:"
+            for i in range(KEYS_PER_USER):
+                pipe.set(f"{prefix}{i}", "[]", ex=config.REDIS_CACHE_TTL)
+            if len(pipe) >= 10000:
+                await pipe.execute()
+        await pipe.execute()
+
+
+async def scan(redis: aioredis.Redis, user_id):
+    keys = [k async for k in redis.scan_iter(match=f"moodstamps:{user_id}:*")]
+    if keys:
+        await redis.delete(*keys)
+
+
+async def generation(redis: aioredis.Redis, user_id):
+    await redis.incr(generation_key(f"moodstamps:{user_id}"))
+
+
+async def measure(func, redis: aioredis.Redis, rounds: int) -> list[float]:
+    samples = []
+    for _ in range(rounds):
+        user_id = uuid4()
+        await redis.set(f"moodstamps:{user_id}:0:{{}}", "[]")
+        began = time.perf_counter()
+        await func(redis, user_id)
+        samples.append((time.perf_counter() - began) * 1000)
+    return samples
+
+
+async def run(args):
+    redis = aioredis.from_url(args.url, decode_responses=True)
+    sizes = sorted({0, args.keys // 100, args.keys // 10, args.keys})
+    for func in (scan, generation):
+        print(f"\n[{func.__name__}]")
+        for keys in sizes:
+            await redis.flushdb()
+            await seed(redis, keys, func is generation)
+            samples = await measure(func, redis, args.rounds)
+            print(
+                f"  {keys:>8} keys: "
+                f"p50={statistics.median(samples):.2f}ms "
+                f"mean={statistics.mean(samples):.2f}ms "
+                f"max={max(samples):.2f}ms"
+            )
+    await redis.flushdb()
+    await redis.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--url", default=f"redis://{config.REDIS_HOST}:{config.REDIS_PORT}/15"
+    )
+    parser.add_argument("--keys", type=int, default=1_000_000)
+    parser.add_argument("--rounds", type=int, default=50)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Compare the two ways of serving a GET /mood/ page: building moodstamp
+models and serializing them, or letting SQLite build the JSON.
+
+Usage: python -m scripts.benchmarks.moodstamp_list \
+    [--days 3650] [--limit 1000] [--rounds 200]
+"""
+
+import argparse
+import asyncio
+import sqlite3
+import statistics
+import time
+from datetime import date, timedelta
+from uuid import uuid4
+
+from mood_diary.backend.repositories.sqlite.codecs import get_moodstamp_codec
+from mood_diary.backend.repositories.sqlite.mood import SQLiteMoodRepository
+from mood_diary.backend.repositories.sсhemas.mood import CreateMoodStamp
+from mood_diary.backend.services.mood import MoodService
+from mood_diary.common.api.schemas.mood import (
+    GetManyMoodStampsRequest,
+    MoodStampPageResponse,
+)
+
+
+async def seed(repo: SQLiteMoodRepository, days: int):
+    user_id = uuid4()
+    start = date(2015, 1, 1)
+    for day in range(days):
+        repo._create(
+            repo.connection,
+            user_id,
+            CreateMoodStamp(
+                user_id=user_id,
+                date=start + timedelta(days=day),
+                value=day % 10 + 1,
+                note=f"Note for day {day}",
+            ),
+        )
+    repo.connection.commit()
+    return user_id
+
+
+async def models(service: MoodService, user_id, body) -> bytes:
+    page = await service.get_many(user_id=user_id, body=body)
+    content = page.model_dump(mode="json", exclude_unset=True)
+    # What FastAPI does with the response_model
+    return MoodStampPageResponse(**content).model_dump_json().encode()
+
+
+async def sqlite_json(service: MoodService, user_id, body) -> bytes:
+    page = await service.get_many_json(user_id=user_id, body=body)
+    return page.content
+
+
+async def measure(func, service, user_id, body, rounds: int) -> list[float]:
+    await func(service, user_id, body)
+    samples = []
+    for _ in range(rounds):
+        began = time.perf_counter()
+        await func(service, user_id, body)
+        samples.append((time.perf_counter() - began) * 1000)
+    return samples
+
+
+async def run(args):
+    for storage in ("text", "compact"):
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        repo = SQLiteMoodRepository(conn, codec=get_moodstamp_codec(storage))
+        repo.init_db()
+        user_id = await seed(repo, args.days)
+        service = MoodService(repo)
+
+        print(f"\n[{storage}] {args.days} rows, page of {args.limit}")
+        for fields in (None, ["date", "value"]):
+            body = GetManyMoodStampsRequest(limit=args.limit, fields=fields)
+            for func in (models, sqlite_json):
+                samples = await measure(
+                    func, service, user_id, body, args.rounds
+                )
+                print(
+                    f"  {func.__name__:<12} fields={fields}: "
+                    f"p50={statistics.median(samples):.2f}ms "
+                    f"mean={statistics.mean(samples):.2f}ms"
+                )
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=3650)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=200)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Compare the text and compact moodstamp storage layouts: database file
+size, size of every table/index B-tree and the latency of per-user date
+range queries.
+
+Rows are inserted day by day across all users, the way a live database
+fills up, into the table created by the repository.
+
+Usage: python -m scripts.benchmarks.moodstamp_storage \
+    [--users 10000] [--days 1000] [--queries 2000]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from uuid import UUID, uuid4
+
+from mood_diary.backend.repositories.sqlite.codecs import (
+    MoodStampCodec,
+    get_moodstamp_codec,
+)
+from mood_diary.backend.repositories.sqlite.mood import SQLiteMoodRepository
+
+RANGE_QUERY = (
+    "SELECT * FROM moodstamps WHERE user_id = ? AND date >= ? AND date <= ? "
+    "ORDER BY date DESC"
+)
+
+
+def seed(
+    db_path: str, codec: MoodStampCodec, user_ids: list[UUID], days: int
+) -> float:
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -1048576")
+    repository = SQLiteMoodRepository(conn, codec=codec)
+    repository.create_table()
+
+    start = date(2020, 1, 1)
+    now = datetime.now()
+    started = time.perf_counter()
+    for day in range(days):
+        conn.executemany(
+            "INSERT INTO moodstamps "
+            "(id, user_id, date, value, note, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    codec.encode_uuid(uuid4()),
+                    codec.encode_uuid(user_id),
+                    codec.encode_date(start + timedelta(days=day)),
+                    day % 10 + 1,
+                    "note",
+                    codec.encode_timestamp(now),
+                    codec.encode_timestamp(now),
+                )
+                for user_id in user_ids
+            ),
+        )
+    conn.commit()
+    conn.close()
+    return time.perf_counter() - started
+
+
+def btree_sizes(db_path: str) -> dict[str, int]:
+    conn = sqlite3.connect(db_path)
+    try:
+        return dict(
+            conn.execute(
+                "SELECT name, SUM(pgsize) FROM dbstat "
+                "GROUP BY name ORDER BY name"
+            ).fetchall()
+        )
+    finally:
+        conn.close()
+
+
+def measure_ranges(
+    db_path: str,
+    codec: MoodStampCodec,
+    user_ids: list[UUID],
+    days: int,
+    window: int,
+    queries: int,
+) -> list[float]:
+    conn = sqlite3.connect(db_path)
+    rng = random.Random(42)
+    start = date(2020, 1, 1)
+    samples = []
+    for _ in range(queries):
+        first = start + timedelta(days=rng.randrange(max(1, days - window)))
+        params = (
+            codec.encode_uuid(rng.choice(user_ids)),
+            codec.encode_date(first),
+            codec.encode_date(first + timedelta(days=window - 1)),
+        )
+        began = time.perf_counter()
+        conn.execute(RANGE_QUERY, params).fetchall()
+        samples.append((time.perf_counter() - began) * 1000)
+    conn.close()
+    return samples
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+    return ordered[index]
+
+
+def mib(size: int) -> str:
+    return f"{size / 2**20:10.1f} MiB"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--window", type=int, default=30)
+    parser.add_argument("--dir", default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    user_ids = [
+        UUID(int=rng.getrandbits(128), version=4) for _ in range(args.users)
+    ]
+    print(
+        f"{args.users} users x {args.days} days = "
+        f"{args.users * args.days} rows"
+    )
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        for storage in ("text", "compact"):
+            codec = get_moodstamp_codec(storage)
+            db_path = os.path.join(tmp, f"{storage}.db")
+            elapsed = seed(db_path, codec, user_ids, args.days)
+
+            print(f"\n[{storage}] loaded in {elapsed:.0f}s")
+            print(f"  {'file size':<30} {mib(os.path.getsize(db_path))}")
+            for name, size in btree_sizes(db_path).items():
+                print(f"  {name:<30} {mib(size)}")
+
+            for window in (args.window, args.days):
+                # Warm-up pass so both layouts are measured from page cache
+                measure_ranges(
+                    db_path, codec, user_ids, args.days, window, 200
+                )
+                samples = measure_ranges(
+                    db_path, codec, user_ids, args.days, window, args.queries
+                )
+                print(
+                    f"  {window:>4}-day range: "
+                    f"mean={statistics.mean(samples):.3f}ms "
+                    f"p50={percentile(samples, 50):.3f}ms "
+                    f"p99={percentile(samples, 99):.3f}ms"
+                )
+            os.remove(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Compare request latency under concurrency for the old per-request
+connection (blocking the event loop) and the pooled, executor-backed
+repositories.
+
+Requests arrive at a fixed rate and latency is measured from the scheduled
+arrival time, so time spent waiting behind a blocked event loop is counted.
+
+Usage: python -m scripts.benchmarks.sqlite_pool [--rate 30] [--requests 600]
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from uuid import UUID, uuid4
+
+from mood_diary.backend.database.db import init_db
+from mood_diary.backend.database.pool import SQLiteConnectionPool
+from mood_diary.backend.repositories.sqlite.mood import SQLiteMoodRepository
+from mood_diary.backend.repositories.sсhemas.mood import MoodStampFilter
+
+# Stand-in for an expensive query that spends its time inside SQLite.
+SLOW_QUERY = (
+    "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n "
+    "WHERE x < 1000000) SELECT count(*) FROM n"
+)
+
+
+def seed(db_path: str, users: int, days: int) -> list[UUID]:
+    init_db(db_path)
+    conn = sqlite3.connect(db_path)
+    user_ids = [uuid4() for _ in range(users)]
+    start = date.today() - timedelta(days=days)
+    now = datetime.now()
+    conn.executemany(
+        "INSERT INTO moodstamps "
+        "(id, user_id, date, value, note, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            (
+                str(uuid4()),
+                str(user_id),
+                start + timedelta(days=day),
+                day % 10 + 1,
+                "note",
+                now,
+                now,
+            )
+            for user_id in user_ids
+            for day in range(days)
+        ),
+    )
+    conn.commit()
+    conn.close()
+    return user_ids
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+    return ordered[index]
+
+
+async def arrive(started: float, i: int, rate: float) -> float:
+    scheduled = started + i / rate
+    await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+    return scheduled
+
+
+async def run_before(
+    db_path: str,
+    user_ids: list[UUID],
+    requests: int,
+    rate: float,
+    slow_every: int,
+) -> list[float]:
+    started = time.perf_counter()
+
+    async def request(i: int) -> float:
+        scheduled = await arrive(started, i, rate)
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        try:
+            if slow_every and i % slow_every == 0:
+                conn.execute(SLOW_QUERY).fetchone()
+            else:
+                repo = SQLiteMoodRepository(conn)
+                repo._get_many(user_ids[i % len(user_ids)], MoodStampFilter())
+        finally:
+            conn.close()
+        return time.perf_counter() - scheduled
+
+    return list(await asyncio.gather(*(request(i) for i in range(requests))))
+
+
+async def run_after(
+    db_path: str,
+    user_ids: list[UUID],
+    requests: int,
+    rate: float,
+    slow_every: int,
+    pool_size: int,
+) -> list[float]:
+    pool = SQLiteConnectionPool(
+        db_path, size=pool_size, acquire_timeout=60, pragmas={}
+    )
+    started = time.perf_counter()
+
+    async def request(i: int) -> float:
+        scheduled = await arrive(started, i, rate)
+        async with pool.connection() as conn:
+            repo = SQLiteMoodRepository(conn, pool.executor)
+            if slow_every and i % slow_every == 0:
+                await repo._run(lambda: conn.execute(SLOW_QUERY).fetchone())
+            else:
+                await repo.get_many(
+                    user_ids[i % len(user_ids)], MoodStampFilter()
+                )
+        return time.perf_counter() - scheduled
+
+    try:
+        return list(
+            await asyncio.gather(*(request(i) for i in range(requests)))
+        )
+    finally:
+        pool.close()
+
+
+def report(name: str, samples: list[float], slow_every: int) -> None:
+    if slow_every:
+        samples = [s for i, s in enumerate(samples) if i % slow_every]
+    print(
+        f"{name:<8} p50={statistics.median(samples) * 1000:8.2f}ms "
+        f"p99={percentile(samples, 99) * 1000:8.2f}ms "
+        f"max={max(samples) * 1000:8.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--requests", type=int, default=600)
+    parser.add_argument("--rate", type=float, default=30)
+    parser.add_argument("--slow-every", type=int, default=30)
+    parser.add_argument("--pool-size", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        user_ids = seed(db_path, args.users, args.days)
+
+        before = asyncio.run(
+            run_before(
+                db_path,
+                user_ids,
+                args.requests,
+                args.rate,
+                args.slow_every,
+            )
+        )
+        after = asyncio.run(
+            run_after(
+                db_path,
+                user_ids,
+                args.requests,
+                args.rate,
+                args.slow_every,
+                args.pool_size,
+            )
+        )
+
+    # Only regular requests are reported: the slow queries themselves take
+    # the same time either way, the question is who waits behind them.
+    report("before", before, args.slow_every)
+    report("after", after, args.slow_every)
+
+
+if __name__ == "__main__":
+    main()
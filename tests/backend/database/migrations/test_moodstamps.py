@@ -0,0 +1,263 @@
+import logging
+import sqlite3
+import uuid
+from datetime import date, datetime
+
+import pytest
+
+from mood_diary.backend.database.db import init_db
+from mood_diary.backend.database.migrations.moodstamps import (
+    RewriteMoodstamps,
+    get_moodstamps_storage,
+    is_moodstamps_clustered,
+)
+from mood_diary.backend.database.migrations.runner import MigrationRunner
+from mood_diary.backend.database.migrations.versions import get_migrations
+from mood_diary.backend.repositories.sqlite.codecs import (
+    CompactMoodStampCodec,
+)
+from mood_diary.backend.repositories.sqlite.mood import SQLiteMoodRepository
+from mood_diary.backend.repositories.sсhemas.mood import MoodStampFilter
+
+
+# moodstamps as created before the table was clustered by (user_id, date)
+LEGACY_SCHEMA = """
+    CREATE TABLE moodstamps (
+        id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        date DATE NOT NULL,
+        value INT NOT NULL,
+        note TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+        UNIQUE (user_id, date)
+    );
+    CREATE INDEX idx_moodstamps_user_date ON moodstamps (user_id, date);
+    CREATE INDEX idx_moodstamps_user ON moodstamps (user_id);
+    CREATE INDEX idx_moodstamps_date ON moodstamps (date);
+    CREATE INDEX idx_moodstamps_value ON moodstamps (value);
+"""
+
+
+def moodstamps_indexes(conn: sqlite3.Connection) -> set[str]:
+    return {
+        row[0]
+        for row in conn.execute(
+            "SELECT name FROM sqlite_master "
+            "WHERE type = 'index' AND tbl_name = 'moodstamps'"
+        )
+    }
+
+
+@pytest.fixture
+def text_db(tmp_path):
+    path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    user_id = uuid.uuid4()
+    conn.executemany(
+        "INSERT INTO moodstamps "
+        "(id, user_id, date, value, note, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                str(uuid.uuid4()),
+                str(user_id),
+                f"2024-01-{day:02}",
+                day % 10,
+                f"day {day}",
+                datetime(2024, 1, day, 12, 30, 0, 1000),
+                "2024-01-31 08:00:00",
+            )
+            for day in range(1, 31)
+        ],
+    )
+    conn.commit()
+    conn.close()
+    return path, user_id
+
+
+def test_get_moodstamps_storage(tmp_path):
+    conn = sqlite3.connect(":memory:")
+    assert get_moodstamps_storage(conn) is None
+
+    SQLiteMoodRepository(conn).init_db()
+    assert get_moodstamps_storage(conn) == "text"
+    conn.close()
+
+    conn = sqlite3.connect(":memory:")
+    SQLiteMoodRepository(conn, codec=CompactMoodStampCodec()).init_db()
+    assert get_moodstamps_storage(conn) == "compact"
+    conn.close()
+
+
+def test_is_moodstamps_clustered(text_db):
+    path, _ = text_db
+    conn = sqlite3.connect(path)
+    assert not is_moodstamps_clustered(conn)
+    conn.close()
+
+    conn = sqlite3.connect(":memory:")
+    SQLiteMoodRepository(conn).init_db()
+    assert is_moodstamps_clustered(conn)
+    conn.close()
+
+
+def test_rewrite_is_not_needed_for_current_layout():
+    conn = sqlite3.connect(":memory:")
+    assert not RewriteMoodstamps(3, "cluster").prepare(conn)
+
+    SQLiteMoodRepository(conn).init_db()
+    assert not RewriteMoodstamps(3, "cluster").prepare(conn)
+    assert RewriteMoodstamps(4, "compact", storage="compact").prepare(conn)
+    conn.close()
+
+
+@pytest.mark.asyncio
+async def test_rewrite_captures_writes_made_during_copy(text_db):
+    path, user_id = text_db
+    conn = sqlite3.connect(path, check_same_thread=False)
+    migration = RewriteMoodstamps(4, "compact", storage="compact")
+
+    assert migration.prepare(conn)
+    assert migration.copy_batch(conn, 7) == 7
+    assert migration.copy_batch(conn, 7) == 7
+    conn.commit()
+
+    # Rows before and after the copy position change while it runs
+    other_user = uuid.uuid4()
+    conn.execute(
+        "UPDATE moodstamps SET value = 10, note = 'edited' "
+        "WHERE date IN ('2024-01-03', '2024-01-20')"
+    )
+    conn.execute("DELETE FROM moodstamps WHERE date = '2024-01-05'")
+    conn.execute(
+        "INSERT INTO moodstamps "
+        "(id, user_id, date, value, note, created_at, updated_at) "
+        "VALUES (?, ?, '2024-02-01', 3, 'new', "
+        "'2024-02-01 10:00:00', '2024-02-01 10:00:00')",
+        (str(uuid.uuid4()), str(other_user)),
+    )
+    conn.commit()
+    text_repo = SQLiteMoodRepository(conn)
+    before = {
+        user: await text_repo.get_many(user, MoodStampFilter())
+        for user in (user_id, other_user)
+    }
+
+    while migration.copy_batch(conn, 7):
+        pass
+    assert migration.catch_up(conn, 2) == 2
+    migration.finish(conn)
+    conn.commit()
+
+    assert get_moodstamps_storage(conn) == "compact"
+    assert is_moodstamps_clustered(conn)
+    tables = {
+        row[0]
+        for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')"
+        )
+    }
+    assert tables == {"moodstamps"}
+
+    compact_repo = SQLiteMoodRepository(conn, codec=CompactMoodStampCodec())
+    for user, moodstamps in before.items():
+        assert await compact_repo.get_many(user, MoodStampFilter()) == (
+            moodstamps
+        )
+    assert len(before[user_id]) == 29
+    conn.close()
+
+
+@pytest.mark.asyncio
+async def test_interrupted_rewrite_resumes(text_db, caplog):
+    path, user_id = text_db
+    conn = sqlite3.connect(path, check_same_thread=False)
+    before = await SQLiteMoodRepository(conn).get_many(
+        user_id, MoodStampFilter()
+    )
+
+    runner = MigrationRunner(get_migrations("compact"), batch_size=7)
+    left = runner.upgrade_schema(conn)
+    assert [m.version for m in left] == [3, 4]
+    left[0].copy_batch(conn, 7)
+    left[0].copy_batch(conn, 7)
+    conn.commit()
+    conn.close()
+
+    caplog.set_level(logging.INFO)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    runner = MigrationRunner(get_migrations("compact"), batch_size=7)
+    assert [m.version for m in runner.upgrade(conn)] == [3, 4]
+
+    assert "0003_cluster_moodstamps: copy_batch done, 16 row(s)" in (
+        caplog.text
+    )
+    assert "0004_compact_moodstamps: copy_batch done, 30 row(s)" in (
+        caplog.text
+    )
+    assert runner.pending(conn) == []
+    assert moodstamps_indexes(conn) == set()
+    repo = SQLiteMoodRepository(conn, codec=CompactMoodStampCodec())
+    after = await repo.get_many(user_id, MoodStampFilter())
+    assert after == before
+    assert after[0].date == date(2024, 1, 30)
+    assert after[0].created_at == datetime(2024, 1, 30, 12, 30, 0, 1000)
+    conn.close()
+
+
+def test_init_db_migrates_when_compact_storage_is_enabled(text_db):
+    path, _ = text_db
+
+    init_db(path, storage="compact")
+    init_db(path, storage="compact")
+
+    conn = sqlite3.connect(path)
+    assert get_moodstamps_storage(conn) == "compact"
+    versions = conn.execute("SELECT version FROM schema_version").fetchall()
+    assert versions == [(1,), (2,), (3,), (4,)]
+    assert conn.execute("SELECT count(*) FROM moodstamps").fetchone()[0] == 30
+    conn.close()
+
+
+@pytest.mark.asyncio
+async def test_init_db_clusters_legacy_moodstamps(text_db):
+    path, user_id = text_db
+    conn = sqlite3.connect(path, check_same_thread=False)
+    before = await SQLiteMoodRepository(conn).get_many(
+        user_id, MoodStampFilter()
+    )
+    assert not is_moodstamps_clustered(conn)
+    conn.close()
+
+    init_db(path)
+
+    conn = sqlite3.connect(path, check_same_thread=False)
+    assert get_moodstamps_storage(conn) == "text"
+    assert is_moodstamps_clustered(conn)
+    assert moodstamps_indexes(conn) == set()
+    after = await SQLiteMoodRepository(conn).get_many(
+        user_id, MoodStampFilter()
+    )
+    assert after == before
+    conn.close()
+
+
+def test_init_db_refuses_to_downgrade_compact_storage(tmp_path):
+    path = str(tmp_path / "test.db")
+    init_db(path, storage="compact")
+
+    with pytest.raises(RuntimeError):
+        init_db(path, storage="text")
+
+
+def test_init_db_refuses_to_downgrade_unversioned_compact_storage(tmp_path):
+    path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(path)
+    SQLiteMoodRepository(conn, codec=CompactMoodStampCodec()).init_db()
+    conn.close()
+
+    with pytest.raises(RuntimeError):
+        init_db(path, storage="text")
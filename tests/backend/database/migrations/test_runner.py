@@ -0,0 +1,242 @@
+import asyncio
+import sqlite3
+import uuid
+from datetime import date, timedelta
+
+import pytest
+import pytest_asyncio
+
+from mood_diary.backend.database.db import init_db
+from mood_diary.backend.database.migrations.base import SchemaMigration
+from mood_diary.backend.database.migrations.moodstamps import (
+    get_moodstamps_storage,
+)
+from mood_diary.backend.database.migrations.runner import MigrationRunner
+from mood_diary.backend.database.migrations.versions import get_migrations
+from mood_diary.backend.database.pool import SQLiteConnectionPool
+from mood_diary.backend.database.writer import SQLiteWriteQueue
+from mood_diary.backend.repositories.sqlite.codecs import (
+    CompactMoodStampCodec,
+)
+from mood_diary.backend.repositories.sqlite.mood import SQLiteMoodRepository
+from mood_diary.backend.repositories.sсhemas.mood import (
+    CreateMoodStamp,
+    MoodStampFilter,
+)
+
+
+class CreateTable(SchemaMigration):
+    def __init__(self, version: int, fail: bool = False):
+        super().__init__(version, f"create_t{version}")
+        self.fail = fail
+
+    def apply(self, conn: sqlite3.Connection) -> None:
+        conn.execute(f"CREATE TABLE t{self.version} (x INT)")
+        if self.fail:
+            raise sqlite3.OperationalError("boom")
+
+
+def tables(conn: sqlite3.Connection) -> set[str]:
+    return {
+        row[0]
+        for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        )
+    }
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    yield conn
+    conn.close()
+
+
+def test_upgrade_applies_pending_in_order(conn: sqlite3.Connection):
+    runner = MigrationRunner([CreateTable(2), CreateTable(1)])
+
+    applied = runner.upgrade(conn)
+
+    assert [m.version for m in applied] == [1, 2]
+    assert tables(conn) == {"schema_version", "t1", "t2"}
+    assert conn.execute(
+        "SELECT version, name FROM schema_version ORDER BY version"
+    ).fetchall() == [(1, "create_t1"), (2, "create_t2")]
+    assert runner.upgrade(conn) == []
+
+
+def test_missing_version_is_pending(conn: sqlite3.Connection):
+    MigrationRunner([CreateTable(1), CreateTable(3)]).upgrade(conn)
+
+    runner = MigrationRunner([CreateTable(1), CreateTable(2), CreateTable(3)])
+
+    assert [m.version for m in runner.pending(conn)] == [2]
+
+
+def test_unknown_applied_version_is_refused(conn: sqlite3.Connection):
+    MigrationRunner([CreateTable(1), CreateTable(2)]).upgrade(conn)
+
+    with pytest.raises(RuntimeError):
+        MigrationRunner([CreateTable(1)]).pending(conn)
+
+
+def test_failed_migration_is_rolled_back(conn: sqlite3.Connection):
+    runner = MigrationRunner([CreateTable(1), CreateTable(2, fail=True)])
+
+    with pytest.raises(sqlite3.OperationalError):
+        runner.upgrade(conn)
+
+    assert tables(conn) == {"schema_version", "t1"}
+    assert [m.version for m in runner.pending(conn)] == [2]
+
+
+def test_upgrade_schema_creates_current_layout(tmp_path):
+    path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(path)
+    runner = MigrationRunner(get_migrations("compact"))
+
+    assert runner.upgrade_schema(conn) == []
+
+    assert runner.pending(conn) == []
+    assert get_moodstamps_storage(conn) == "compact"
+    conn.close()
+
+
+def test_upgrade_schema_stops_at_backfill(tmp_path):
+    path = str(tmp_path / "test.db")
+    init_db(path)
+    conn = sqlite3.connect(path)
+    runner = MigrationRunner(get_migrations("compact"))
+
+    left = runner.upgrade_schema(conn)
+
+    assert [m.version for m in left] == [4]
+    assert [m.version for m in runner.pending(conn)] == [4]
+    assert get_moodstamps_storage(conn) == "text"
+    conn.close()
+
+
+@pytest.fixture
+def text_db(tmp_path):
+    path = str(tmp_path / "test.db")
+    init_db(path)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    repo = SQLiteMoodRepository(conn)
+    user_id = uuid.uuid4()
+    start = date(2024, 1, 1)
+    for day in range(40):
+        repo._create(
+            conn,
+            user_id,
+            CreateMoodStamp(
+                user_id=user_id,
+                date=start + timedelta(days=day),
+                value=day % 10 + 1,
+                note=f"day {day}",
+            ),
+        )
+    conn.commit()
+    conn.close()
+    return path, user_id
+
+
+@pytest_asyncio.fixture
+async def writer(text_db):
+    path, _ = text_db
+    writer = SQLiteWriteQueue(
+        path, batch_window=0.001, max_batch=100, max_queue=100
+    )
+    await writer.start()
+    yield writer
+    await writer.close()
+
+
+@pytest.fixture
+def pool(text_db):
+    path, _ = text_db
+    pool = SQLiteConnectionPool(path, size=2, acquire_timeout=0.05)
+    yield pool
+    pool.close()
+
+
+@pytest.mark.asyncio
+async def test_backfill_runs_alongside_writes(
+    text_db, writer: SQLiteWriteQueue, pool: SQLiteConnectionPool
+):
+    path, user_id = text_db
+    conn = sqlite3.connect(path)
+    runner = MigrationRunner(get_migrations("compact"), batch_size=3)
+    left = runner.upgrade_schema(conn)
+    conn.close()
+    assert [m.version for m in left] == [4]
+
+    switched = []
+    codecs = {"codec": None}
+
+    async def on_switch():
+        switched.append(True)
+        codecs["codec"] = CompactMoodStampCodec()
+
+    async def create(day: int):
+        async with pool.connection() as conn:
+            repo = SQLiteMoodRepository(
+                conn, writer=writer, codec=codecs["codec"]
+            )
+            await repo.create(
+                user_id,
+                CreateMoodStamp(
+                    user_id=user_id,
+                    date=date(2025, 1, 1) + timedelta(days=day),
+                    value=5,
+                    note="during backfill",
+                ),
+            )
+
+    async def write_during_backfill():
+        for day in range(10):
+            await create(day)
+            await asyncio.sleep(0)
+
+    await asyncio.gather(
+        runner.backfill(left, writer, pool, on_switch),
+        write_during_backfill(),
+    )
+    await create(10)
+
+    assert switched == [True]
+    conn = sqlite3.connect(path, check_same_thread=False)
+    assert runner.pending(conn) == []
+    assert get_moodstamps_storage(conn) == "compact"
+    repo = SQLiteMoodRepository(conn, codec=CompactMoodStampCodec())
+    moodstamps = await repo.get_many(user_id, MoodStampFilter())
+    assert len(moodstamps) == 51
+    conn.close()
+
+
+@pytest.mark.asyncio
+async def test_backfill_switch_waits_for_requests(
+    text_db, writer: SQLiteWriteQueue, pool: SQLiteConnectionPool
+):
+    path, _ = text_db
+    conn = sqlite3.connect(path)
+    runner = MigrationRunner(get_migrations("compact"), batch_size=100)
+    left = runner.upgrade_schema(conn)
+    conn.close()
+
+    held = await pool.acquire()
+    switched = []
+
+    async def on_switch():
+        switched.append(True)
+
+    backfill = asyncio.create_task(
+        runner.backfill(left, writer, pool, on_switch)
+    )
+    await asyncio.sleep(0.2)
+    assert switched == []
+    assert not backfill.done()
+
+    await pool.release(held)
+    await asyncio.wait_for(backfill, 1)
+
+    assert switched == [True]
@@ -0,0 +1,518 @@
+import asyncio
+import gzip
+import json
+import sqlite3
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from redis.exceptions import WatchError
+
+from mood_diary.backend.database.cache import (
+    CachedValue,
+    LocalCache,
+    TieredCache,
+    pack,
+    unpack,
+)
+from mood_diary.backend.database.cache_backends import RedisBackend
+from mood_diary.backend.exceptions.mood import MoodStampNotExist
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakePubSub:
+    def __init__(self, messages: asyncio.Queue):
+        self.messages = messages
+        self.messages.put_nowait(
+            {"type": "subscribe", "channel": "invalidate", "data": 1}
+        )
+        self.subscribe = AsyncMock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def get_message(self, timeout: float):
+        try:
+            message = self.messages.get_nowait()
+        except asyncio.QueueEmpty:
+            try:
+                message = await asyncio.wait_for(self.messages.get(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        if isinstance(message, Exception):
+            raise message
+        return message
+
+
+class Compute:
+    def __init__(self, value: bytes = b"fresh", ttl: int = 60, delay=0.0):
+        self.value = value
+        self.ttl = ttl
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self) -> tuple[bytes, int]:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.value, self.ttl
+
+
+@pytest.fixture
+def redis() -> AsyncMock:
+    redis = AsyncMock()
+    redis.get.return_value = None
+    redis.incr.return_value = 1
+    redis.lock = MagicMock(return_value=AsyncMock())
+    redis.lock.return_value.acquire.return_value = True
+    return redis
+
+
+@pytest.fixture
+def cache(redis: AsyncMock) -> TieredCache:
+    cache = TieredCache(
+        RedisBackend(redis),
+        LocalCache(2, 5.0),
+        "invalidate",
+        stale_ttl=30,
+        lock_timeout=0.1,
+        lock_poll_interval=0.01,
+        stale_on=(sqlite3.Error,),
+    )
+    cache.subscribed = True
+    return cache
+
+
+def stale(value: bytes = b"stale") -> bytes:
+    return pack(CachedValue(value), time.time() - 1, 0.01)
+
+
+@pytest.mark.parametrize("last_modified", [None, 1714566600.123456])
+def test_pack_keeps_last_modified(last_modified: float | None):
+    value = CachedValue(b'{"a": "b:c"}', "identity", last_modified)
+
+    assert unpack(pack(value, 10.0, 0.5)) == (10.0, 0.5, value)
+
+
+def test_local_cache_evicts_least_recently_used():
+    local = LocalCache(2, 5.0)
+    local.set("a", 1)
+    local.set("b", 2)
+    local.get("a")
+
+    local.set("c", 3)
+
+    assert (local.get("a"), local.get("b"), local.get("c")) == (1, None, 3)
+
+
+def test_local_cache_entries_expire():
+    clock = Clock()
+    local = LocalCache(10, 5.0, clock)
+    local.set("a", 1)
+    local.set("b", 2, ttl=1)
+
+    clock.now = 1
+    assert (local.get("a"), local.get("b")) == (1, None)
+
+    clock.now = 5
+    assert local.get("a") is None
+    assert len(local) == 0
+
+
+@pytest.mark.asyncio
+async def test_get_fills_local_tier(cache: TieredCache, redis: AsyncMock):
+    redis.get.return_value = "value"
+
+    assert await cache.get("key") == "value"
+    assert await cache.get("key") == "value"
+
+    redis.get.assert_awaited_once_with("key")
+    stats = cache.stats()
+    assert (stats.local.hits, stats.local.misses) == (1, 1)
+    assert (stats.redis.hits, stats.redis.misses) == (1, 0)
+    assert stats.local.hit_ratio == 0.5
+
+
+@pytest.mark.asyncio
+async def test_get_skips_local_tier_when_unsubscribed(
+    cache: TieredCache, redis: AsyncMock
+):
+    cache.subscribed = False
+    redis.get.return_value = "value"
+
+    await cache.get("key")
+    await cache.get("key")
+
+    assert redis.get.await_count == 2
+    assert len(cache.local) == 0
+    assert cache.stats().local.misses == 0
+
+
+@pytest.mark.asyncio
+async def test_get_does_not_keep_value_invalidated_meanwhile(
+    cache: TieredCache, redis: AsyncMock
+):
+    async def get(key):
+        cache.invalidate_local([key])
+        return "stale"
+
+    redis.get.side_effect = get
+
+    assert await cache.get("key") == "stale"
+    assert cache.local.get("key") is None
+
+
+@pytest.mark.asyncio
+async def test_mget_reads_local_misses_with_one_call(
+    cache: TieredCache, redis: AsyncMock
+):
+    cache.local = LocalCache(10, 5.0)
+    cache.local.set("a", "1")
+    redis.mget.return_value = [None, "3"]
+
+    assert await cache.mget(["a", "b", "c"]) == ["1", None, "3"]
+
+    redis.mget.assert_awaited_once_with(["b", "c"])
+    assert cache.local.get("c") == "3"
+    stats = cache.stats()
+    assert (stats.local.hits, stats.local.misses) == (1, 2)
+    assert (stats.redis.hits, stats.redis.misses) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_set_many_uses_one_pipeline(
+    cache: TieredCache, redis: AsyncMock
+):
+    pipeline = MagicMock()
+    pipeline.__aenter__.return_value = pipeline
+    pipeline.execute = AsyncMock()
+    redis.pipeline = MagicMock(return_value=pipeline)
+
+    await cache.set_many({"a": "1", "b": "2"}, ex=60)
+
+    redis.pipeline.assert_called_once_with(transaction=False)
+    pipeline.set.assert_any_call("a", "1", ex=60)
+    pipeline.set.assert_any_call("b", "2", ex=60)
+    pipeline.execute.assert_awaited_once()
+    assert (cache.local.get("a"), cache.local.get("b")) == ("1", "2")
+
+
+def transaction(redis: AsyncMock, current: list) -> MagicMock:
+    pipeline = MagicMock()
+    pipeline.__aenter__.return_value = pipeline
+    pipeline.watch = AsyncMock()
+    pipeline.mget = AsyncMock(return_value=current)
+    pipeline.execute = AsyncMock()
+    redis.pipeline = MagicMock(return_value=pipeline)
+    return pipeline
+
+
+@pytest.mark.asyncio
+async def test_write_through_in_one_transaction(
+    cache: TieredCache, redis: AsyncMock
+):
+    pipeline = transaction(redis, [b"[1]", None])
+    cache.local.set("value", b"old")
+
+    await cache.write_through(
+        computed={"value": (b"new", 60)},
+        patches={
+            "block": (lambda block: block + b"+", 300),
+            "missing": (lambda block: block + b"+", 300),
+        },
+        incr=("generation",),
+    )
+
+    redis.pipeline.assert_called_once_with(transaction=True)
+    pipeline.watch.assert_awaited_once_with("block", "missing")
+    pipeline.multi.assert_called_once()
+    (block_call, value_call) = pipeline.set.call_args_list
+    assert block_call == (("block", b"[1]+"), {"ex": 300})
+    key, cached = value_call[0]
+    assert (key, unpack(cached)[2]) == ("value", CachedValue(b"new"))
+    assert value_call[1] == {"ex": 90}
+    pipeline.incr.assert_called_once_with("generation")
+    pipeline.publish.assert_called_once_with(
+        "invalidate", json.dumps(["value", "block", "missing", "generation"])
+    )
+    pipeline.execute.assert_awaited_once()
+    assert cache.local.get("value") is None
+
+
+@pytest.mark.asyncio
+async def test_write_through_deletes_patches_changed_meanwhile(
+    cache: TieredCache, redis: AsyncMock
+):
+    pipeline = transaction(redis, [b"[1]"])
+    pipeline.execute.side_effect = [WatchError(), []]
+
+    await cache.write_through(
+        computed={"value": (b"new", 60)},
+        patches={"block": (lambda block: block + b"+", 300)},
+    )
+
+    assert redis.pipeline.call_count == 2
+    pipeline.delete.assert_called_once_with("block")
+    assert pipeline.set.call_args_list[-1][0][0] == "value"
+
+
+@pytest.mark.asyncio
+async def test_writes_publish_invalidations(
+    cache: TieredCache, redis: AsyncMock
+):
+    await cache.set("a", "1", ex=60)
+    await cache.set("b", "2", ex=60)
+
+    pipeline = transaction(redis, [])
+    pipeline.execute.side_effect = [[1, 1], [1, 1]]
+
+    await cache.delete("a")
+    assert await cache.incr("b") == 1
+
+    assert len(cache.local) == 0
+    assert redis.pipeline.call_count == 2
+    pipeline.delete.assert_called_once_with("a")
+    pipeline.incr.assert_called_once_with("b")
+    pipeline.publish.assert_any_call("invalidate", json.dumps(["a"]))
+    pipeline.publish.assert_any_call("invalidate", json.dumps(["b"]))
+
+
+@pytest.mark.asyncio
+async def test_listener_drops_invalidated_keys(
+    cache: TieredCache, redis: AsyncMock
+):
+    cache.subscribed = False
+    messages: asyncio.Queue = asyncio.Queue()
+    redis.pubsub = MagicMock(return_value=FakePubSub(messages))
+
+    await cache.start()
+    await asyncio.sleep(0)
+    assert cache.subscribed
+    cache.local.set("a", "1")
+    cache.local.set("b", "2")
+
+    await messages.put({"type": "message", "data": json.dumps(["a"])})
+    await asyncio.sleep(0.01)
+
+    assert (cache.local.get("a"), cache.local.get("b")) == (None, "2")
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_listener_clears_local_tier_on_disconnect(
+    cache: TieredCache, redis: AsyncMock
+):
+    cache.resubscribe_delay = 10
+    messages: asyncio.Queue = asyncio.Queue()
+    redis.pubsub = MagicMock(return_value=FakePubSub(messages))
+
+    await cache.start()
+    await asyncio.sleep(0)
+    cache.local.set("a", "1")
+
+    await messages.put(ConnectionError("gone"))
+    await asyncio.sleep(0.01)
+
+    assert not cache.subscribed
+    assert len(cache.local) == 0
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_get_or_compute_caches_value(
+    cache: TieredCache, redis: AsyncMock
+):
+    compute = Compute()
+
+    assert await cache.get_or_compute("key", compute) == CachedValue(b"fresh")
+    assert await cache.get_or_compute("key", compute) == CachedValue(b"fresh")
+
+    assert compute.calls == 1
+    key, cached = redis.set.call_args[0]
+    fresh_until, _, value = unpack(cached)
+    assert (key, value) == ("key", CachedValue(b"fresh"))
+    assert fresh_until == pytest.approx(time.time() + 60, abs=1)
+    assert redis.set.call_args[1] == {"ex": 90}
+    redis.lock.return_value.release.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_get_or_compute_does_not_cache_without_ttl(
+    cache: TieredCache, redis: AsyncMock
+):
+    assert await cache.get_or_compute("key", Compute(ttl=0)) == CachedValue(
+        b"fresh"
+    )
+
+    redis.set.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_get_or_compute_coalesces_concurrent_misses(
+    cache: TieredCache,
+):
+    compute = Compute(delay=0.01)
+
+    values = await asyncio.gather(
+        *(cache.get_or_compute("key", compute) for _ in range(10))
+    )
+
+    assert values == [CachedValue(b"fresh")] * 10
+    assert compute.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_get_or_compute_shares_failures(cache: TieredCache):
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise MoodStampNotExist()
+
+    results = await asyncio.gather(
+        *(cache.get_or_compute("key", compute) for _ in range(3)),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(r, MoodStampNotExist) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_get_or_compute_serves_stale_while_recomputing(
+    cache: TieredCache, redis: AsyncMock
+):
+    redis.get.return_value = stale()
+    compute = Compute(delay=0.01)
+
+    values = await asyncio.gather(
+        *(cache.get_or_compute("key", compute) for _ in range(3))
+    )
+
+    assert [v.payload for v in values] == [b"fresh", b"stale", b"stale"]
+    assert compute.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_get_or_compute_serves_stale_when_locked_elsewhere(
+    cache: TieredCache, redis: AsyncMock
+):
+    redis.get.return_value = stale()
+    redis.lock.return_value.acquire.return_value = False
+    compute = Compute()
+
+    assert await cache.get_or_compute("key", compute) == CachedValue(b"stale")
+    assert compute.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_get_or_compute_waits_for_other_worker(
+    cache: TieredCache, redis: AsyncMock
+):
+    redis.get.side_effect = [
+        None,
+        None,
+        pack(CachedValue(b"theirs"), time.time(), 0.01),
+    ]
+    redis.lock.return_value.acquire.return_value = False
+    compute = Compute()
+
+    assert await cache.get_or_compute("key", compute) == CachedValue(b"theirs")
+    assert compute.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_get_or_compute_computes_when_lock_holder_is_too_slow(
+    cache: TieredCache, redis: AsyncMock
+):
+    redis.lock.return_value.acquire.return_value = False
+    compute = Compute()
+
+    assert await cache.get_or_compute("key", compute) == CachedValue(b"fresh")
+    assert compute.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_get_or_compute_serves_stale_on_database_error(
+    cache: TieredCache, redis: AsyncMock
+):
+    async def compute():
+        raise sqlite3.OperationalError("database is locked")
+
+    with pytest.raises(sqlite3.OperationalError):
+        await cache.get_or_compute("key", compute)
+
+    redis.get.return_value = stale()
+    assert await cache.get_or_compute("key", compute) == CachedValue(b"stale")
+    redis.set.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_get_or_compute_raises_other_errors_despite_stale(
+    cache: TieredCache, redis: AsyncMock
+):
+    redis.get.return_value = stale()
+
+    async def compute():
+        raise MoodStampNotExist()
+
+    with pytest.raises(MoodStampNotExist):
+        await cache.get_or_compute("key", compute)
+
+
+@pytest.mark.asyncio
+async def test_get_or_compute_refreshes_early(
+    cache: TieredCache, redis: AsyncMock, monkeypatch
+):
+    # A value that is fresh for 1s more but took 10s to compute
+    redis.get.return_value = pack(CachedValue(b"cached"), time.time() + 1, 10)
+    monkeypatch.setattr("random.random", lambda: 0.5)
+    compute = Compute()
+
+    assert await cache.get_or_compute("key", compute) == CachedValue(b"fresh")
+
+    cache.early_refresh_beta = 0
+    redis.get.return_value = pack(CachedValue(b"cached"), time.time() + 1, 10)
+    assert await cache.get_or_compute("other", compute) == CachedValue(
+        b"cached"
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_or_compute_stores_large_values_compressed(
+    cache: TieredCache, redis: AsyncMock
+):
+    cache.compression = "gzip"
+    cache.compression_min_size = 100
+    large = b'{"items": []}' * 100
+
+    assert await cache.get_or_compute("small", Compute(b"{}")) == (
+        CachedValue(b"{}")
+    )
+    computed = await cache.get_or_compute("large", Compute(large))
+
+    small, large_cached = (c[0][1] for c in redis.set.call_args_list)
+    assert unpack(small)[2] == CachedValue(b"{}")
+    stored = unpack(large_cached)[2]
+    assert stored.encoding == "gzip"
+    assert gzip.decompress(stored.payload) == large
+    assert len(large_cached) < len(large)
+    # Returned as it is stored, whether computed or cached
+    assert computed == stored
+    assert await cache.get_or_compute("large", Compute()) == stored
+
+
+def test_unavailable_compression_is_refused(redis: AsyncMock):
+    with pytest.raises(ValueError):
+        TieredCache(
+            RedisBackend(redis),
+            LocalCache(2, 5.0),
+            "invalidate",
+            compression="br",
+        )
@@ -0,0 +1,358 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from redis.exceptions import ConnectionError
+
+from mood_diary.backend.config import Settings
+from mood_diary.backend.database.cache import LocalCache, TieredCache
+from mood_diary.backend.database.cache_backends import (
+    CircuitBreaker,
+    MemoryBackend,
+    NullBackend,
+    ObservedConnectionPool,
+    RedisBackend,
+    get_cache_backend,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> Clock:
+    return Clock()
+
+
+@pytest.fixture
+def memory(clock: Clock) -> MemoryBackend:
+    return MemoryBackend(2, clock)
+
+
+@pytest.fixture
+def primary() -> AsyncMock:
+    primary = AsyncMock(spec=MemoryBackend)
+    primary.name = "redis"
+    return primary
+
+
+@pytest.fixture
+def breaker(
+    primary: AsyncMock, memory: MemoryBackend, clock: Clock
+) -> CircuitBreaker:
+    return CircuitBreaker(
+        primary,
+        memory,
+        timeout=0.05,
+        slow_call=0.01,
+        failure_ratio=0.5,
+        window=4,
+        min_calls=4,
+        open_duration=5.0,
+        clock=clock,
+    )
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_client_lives_between_open_and_close():
+    client = AsyncMock()
+    backend = RedisBackend(connect=MagicMock(return_value=client))
+
+    with pytest.raises(ConnectionError):
+        await backend.get("a")
+
+    await backend.open()
+    client.get.return_value = b"1"
+    assert await backend.get("a") == b"1"
+    await backend.close()
+
+    client.aclose.assert_awaited_once_with(close_connection_pool=True)
+    assert backend.client is None
+    assert backend.latency_stats()["get"].calls == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_transaction_returns_counters():
+    client = AsyncMock()
+    pipeline = MagicMock()
+    pipeline.__aenter__.return_value = pipeline
+    pipeline.execute = AsyncMock(return_value=[True, 3, 4, 1, 0])
+    client.pipeline = MagicMock(return_value=pipeline)
+    backend = RedisBackend(client)
+
+    counters = await backend.transaction(
+        {"a": (b"1", 60)}, {}, ("b", "c"), ("d",), ("invalidate", "[]")
+    )
+
+    assert counters == [3, 4]
+    assert backend.latency_stats()["transaction"].calls == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_counts_waits_for_connections():
+    pool = ObservedConnectionPool(max_connections=1, timeout=0.01)
+    pool.ensure_connection = AsyncMock()  # type: ignore[method-assign]
+
+    await pool.get_connection()
+    with pytest.raises(ConnectionError):
+        await pool.get_connection()
+
+    stats = pool.stats()
+    assert (stats.max_connections, stats.in_use, stats.idle) == (1, 1, 0)
+    assert (stats.waits, stats.timeouts) == (1, 1)
+    assert stats.wait_time > 0
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_values_expire(
+    memory: MemoryBackend, clock: Clock
+):
+    await memory.set("a", b"1", ex=10)
+    await memory.set("b", b"2")
+
+    clock.now = 10
+    assert await memory.mget(["a", "b"]) == [None, b"2"]
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_counters_are_never_evicted(
+    memory: MemoryBackend,
+):
+    assert await memory.incr("generation") == 1
+    await memory.set_many({"a": b"1", "b": b"2", "c": b"3"})
+
+    assert await memory.get("generation") == b"1"
+    assert await memory.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_transaction(memory: MemoryBackend):
+    await memory.set("block", b"[1]")
+    await memory.set("gone", b"x")
+    messages = memory.listen("invalidate")
+    assert await anext(messages) is None
+
+    await memory.transaction(
+        sets={"value": (b"new", 60)},
+        patches={
+            "block": (lambda block: block + b"+", 300),
+            "missing": (lambda block: block + b"+", 300),
+        },
+        incr=("generation",),
+        delete=("gone",),
+        publish=("invalidate", "keys"),
+    )
+
+    assert await memory.mget(
+        ["value", "block", "missing", "generation", "gone"]
+    ) == [b"new", b"[1]+", None, b"1", None]
+    assert await anext(messages) == "keys"
+    await messages.aclose()
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_locks(memory: MemoryBackend, clock: Clock):
+    first = memory.lock("lock:a", timeout=2)
+    second = memory.lock("lock:a", timeout=2)
+
+    assert await first.acquire()
+    assert not await second.acquire()
+
+    clock.now = 2
+    assert await second.acquire()
+    await first.release()
+    assert not await memory.lock("lock:a", timeout=2).acquire()
+
+    await second.release()
+    assert await memory.lock("lock:a", timeout=2).acquire()
+
+
+@pytest.mark.asyncio
+async def test_null_backend_never_subscribes():
+    backend = NullBackend()
+    await backend.set("a", b"1")
+
+    assert await backend.get("a") is None
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(anext(backend.listen("invalidate")), 0.01)
+
+
+@pytest.mark.asyncio
+async def test_breaker_falls_back_on_errors(
+    breaker: CircuitBreaker, primary: AsyncMock, memory: MemoryBackend
+):
+    primary.get.side_effect = ConnectionError("gone")
+    await memory.set("a", b"local")
+
+    assert await breaker.get("a") == b"local"
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_breaker_falls_back_on_timeouts(
+    breaker: CircuitBreaker, primary: AsyncMock
+):
+    async def get(key):
+        await asyncio.sleep(1)
+
+    primary.get.side_effect = get
+
+    assert await breaker.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_when_failure_ratio_is_reached(
+    breaker: CircuitBreaker, primary: AsyncMock
+):
+    primary.get.side_effect = [b"1", ConnectionError(), b"1", b"1"]
+    for _ in range(4):
+        await breaker.get("a")
+    assert breaker.state == "closed"
+
+    primary.get.side_effect = ConnectionError()
+    await breaker.get("a")
+    assert breaker.state == "open"
+    assert breaker.degraded
+
+    await breaker.get("a")
+    assert primary.get.await_count == 5
+
+
+@pytest.mark.asyncio
+async def test_breaker_counts_slow_calls_as_failed(
+    breaker: CircuitBreaker, primary: AsyncMock, clock: Clock
+):
+    async def get(key):
+        clock.now += 0.02
+        return b"slow"
+
+    primary.get.side_effect = get
+
+    for _ in range(4):
+        assert await breaker.get("a") == b"slow"
+
+    assert breaker.state == "open"
+
+
+@pytest.mark.asyncio
+async def test_breaker_probes_and_replays_writes(
+    breaker: CircuitBreaker,
+    primary: AsyncMock,
+    memory: MemoryBackend,
+    clock: Clock,
+):
+    breaker._open()
+    await breaker.set("a", b"1", ex=60)
+    await breaker.incr("generation")
+    primary.set.assert_not_awaited()
+    assert await memory.get("a") == b"1"
+
+    clock.now = 5
+    primary.get.return_value = b"old"
+    assert await breaker.get("b") == b"old"
+
+    assert breaker.state == "closed"
+    primary.transaction.assert_awaited_once_with(
+        {}, {}, ("generation",), ("a",)
+    )
+
+
+@pytest.mark.asyncio
+async def test_breaker_reopens_when_probe_fails(
+    breaker: CircuitBreaker, primary: AsyncMock, clock: Clock
+):
+    breaker._open()
+    clock.now = 5
+    primary.get.side_effect = ConnectionError()
+
+    await breaker.get("a")
+
+    assert breaker.state == "open"
+    assert breaker.trips == 2
+
+
+@pytest.mark.asyncio
+async def test_breaker_locks_the_backend_it_acquired_from(
+    breaker: CircuitBreaker, primary: AsyncMock, memory: MemoryBackend
+):
+    primary.lock.side_effect = ConnectionError()
+    lock = breaker.lock("lock:a", timeout=2)
+
+    assert await lock.acquire()
+    assert "lock:a" in memory.locks
+
+    await lock.release()
+    assert "lock:a" not in memory.locks
+
+
+@pytest.mark.asyncio
+async def test_tiered_cache_over_memory_backend():
+    cache = TieredCache(MemoryBackend(16), LocalCache(16, 5.0), "invalidate")
+    await cache.start()
+    await asyncio.sleep(0)
+    assert cache.subscribed
+
+    async def compute() -> tuple[bytes, int]:
+        return b"value", 60
+
+    value = await cache.get_or_compute("key", compute)
+    assert await cache.get_or_compute("key", compute) == value
+    assert cache.local.get("key") is not None
+
+    await cache.write_through(computed={}, delete=("key",))
+    await asyncio.sleep(0)
+    assert await cache.get("key") is None
+    assert cache.stats().backend == "memory"
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_breaker_reopens_when_probe_is_cancelled(
+    breaker: CircuitBreaker, primary: AsyncMock, clock: Clock
+):
+    breaker._open()
+    clock.now = 5
+    started = asyncio.Event()
+
+    async def get(key):
+        started.set()
+        await asyncio.sleep(1)
+
+    primary.get.side_effect = get
+    probe = asyncio.create_task(breaker.get("a"))
+    await started.wait()
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+
+    assert breaker.state == "open"
+    assert breaker.trips == 2
+
+    clock.now = 10
+    primary.get.side_effect = None
+    primary.get.return_value = b"1"
+    assert await breaker.get("a") == b"1"
+    assert breaker.state == "closed"
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [("none", NullBackend), ("memory", MemoryBackend)],
+)
+def test_get_cache_backend(name: str, expected: type):
+    assert isinstance(
+        get_cache_backend(Settings(CACHE_BACKEND=name)), expected
+    )
+
+
+def test_redis_cache_goes_uncached_while_open():
+    backend = get_cache_backend(Settings(CACHE_BACKEND="redis"))
+
+    assert isinstance(backend, CircuitBreaker)
+    assert isinstance(backend.primary, RedisBackend)
+    assert isinstance(backend.fallback, NullBackend)
@@ -0,0 +1,69 @@
+import sqlite3
+
+from mood_diary.backend.config import Settings
+from mood_diary.backend.database.db import get_sqlite_pragmas, init_db
+from mood_diary.backend.database.pool import SQLiteConnectionPool
+
+
+def test_get_sqlite_pragmas_uses_settings():
+    settings = Settings(
+        SQLITE_JOURNAL_MODE="WAL",
+        SQLITE_SYNCHRONOUS="NORMAL",
+        SQLITE_BUSY_TIMEOUT=250,
+        SQLITE_CACHE_SIZE=-2048,
+        SQLITE_MMAP_SIZE=0,
+        SQLITE_TEMP_STORE="MEMORY",
+    )
+
+    pragmas = get_sqlite_pragmas(settings)
+
+    assert list(pragmas)[0] == "journal_mode"
+    assert pragmas == {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 250,
+        "cache_size": -2048,
+        "mmap_size": 0,
+        "temp_store": "MEMORY",
+    }
+
+
+def test_init_db_switches_database_to_wal(tmp_path):
+    db_path = str(tmp_path / "test.db")
+
+    init_db(db_path, get_sqlite_pragmas(Settings()))
+
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        tables = {
+            row[0]
+            for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            )
+        }
+        assert {"users", "moodstamps"} <= tables
+    finally:
+        conn.close()
+
+
+def test_pool_connections_use_storage_profile(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    settings = Settings(SQLITE_BUSY_TIMEOUT=321, SQLITE_CACHE_SIZE=-1024)
+    pool = SQLiteConnectionPool(
+        db_path,
+        size=1,
+        acquire_timeout=1,
+        pragmas=get_sqlite_pragmas(settings),
+    )
+
+    try:
+        conn = pool.connect()
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 321
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == -1024
+        assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2
+        conn.close()
+    finally:
+        pool.close()
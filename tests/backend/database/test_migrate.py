@@ -0,0 +1,30 @@
+import sqlite3
+
+from mood_diary.backend.database.migrate import main
+from mood_diary.backend.database.migrations.moodstamps import (
+    get_moodstamps_storage,
+)
+
+
+def test_status_lists_pending_migrations(tmp_path, capsys):
+    path = str(tmp_path / "test.db")
+
+    main(["status", "--db", path])
+
+    out = capsys.readouterr().out
+    assert "pending  0001_create_users" in out
+    assert "pending  0003_cluster_moodstamps" in out
+
+
+def test_upgrade_applies_migrations(tmp_path, capsys):
+    path = str(tmp_path / "test.db")
+
+    main(["upgrade", "--db", path, "--batch-size", "10", "--pause", "0"])
+    assert "Applied 3 migration(s)" in capsys.readouterr().out
+
+    main(["status", "--db", path])
+    assert "pending" not in capsys.readouterr().out
+
+    conn = sqlite3.connect(path)
+    assert get_moodstamps_storage(conn) == "text"
+    conn.close()
@@ -0,0 +1,118 @@
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from mood_diary.backend.database.pool import SQLiteConnectionPool
+from mood_diary.backend.exceptions.database import DatabaseBusy
+
+
+@pytest.fixture
+def pool():
+    pool = SQLiteConnectionPool(
+        ":memory:",
+        size=2,
+        acquire_timeout=0.05,
+        pragmas={"busy_timeout": 1234},
+    )
+    yield pool
+    pool.close()
+
+
+@pytest.mark.asyncio
+async def test_acquire_applies_pragmas(pool: SQLiteConnectionPool):
+    conn = await pool.acquire()
+
+    assert conn.row_factory is sqlite3.Row
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 1234
+
+
+@pytest.mark.asyncio
+async def test_pool_is_bounded(pool: SQLiteConnectionPool):
+    first = await pool.acquire()
+    second = await pool.acquire()
+    assert first is not second
+
+    with pytest.raises(DatabaseBusy):
+        await pool.acquire()
+
+
+@pytest.mark.asyncio
+async def test_released_connection_is_reused(pool: SQLiteConnectionPool):
+    async with pool.connection() as conn:
+        first = conn
+
+    async with pool.connection() as conn:
+        assert conn is first
+
+    assert len(pool._connections) == 1
+
+
+@pytest.mark.asyncio
+async def test_waiter_gets_released_connection(pool: SQLiteConnectionPool):
+    pool.acquire_timeout = 1
+    first = await pool.acquire()
+    await pool.acquire()
+
+    waiter = asyncio.create_task(pool.acquire())
+    await asyncio.sleep(0)
+    await pool.release(first)
+
+    assert await waiter is first
+
+
+@pytest.mark.asyncio
+async def test_release_rolls_back_open_transaction(
+    pool: SQLiteConnectionPool,
+):
+    async with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (x INT)")
+        conn.commit()
+        conn.execute("INSERT INTO t VALUES (1)")
+        assert conn.in_transaction
+
+    assert not conn.in_transaction
+    assert conn.execute("SELECT count(*) FROM t").fetchone()[0] == 0
+
+
+@pytest.mark.asyncio
+async def test_connect_runs_on_pool_executor(pool: SQLiteConnectionPool):
+    threads = []
+    original_connect = pool.connect
+
+    def connect():
+        threads.append(threading.current_thread().name)
+        return original_connect()
+
+    pool.connect = connect  # type: ignore[method-assign]
+    await pool.acquire()
+
+    assert threads[0].startswith("sqlite")
+
+
+def test_pool_size_must_be_positive():
+    with pytest.raises(ValueError):
+        SQLiteConnectionPool(":memory:", size=0, acquire_timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_exclusive_holds_every_connection(pool: SQLiteConnectionPool):
+    pool.acquire_timeout = 1
+    in_flight = await pool.acquire()
+
+    async def finish_request():
+        await asyncio.sleep(0.05)
+        await pool.release(in_flight)
+
+    release = asyncio.create_task(finish_request())
+    async with pool.exclusive() as held:
+        assert release.done()
+        assert len(held) == pool.size
+
+        pool.acquire_timeout = 0.05
+        with pytest.raises(DatabaseBusy):
+            await pool.acquire()
+
+    async with pool.connection() as conn:
+        assert conn in held
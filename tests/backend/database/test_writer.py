@@ -0,0 +1,154 @@
+import asyncio
+import sqlite3
+import uuid
+from datetime import date, timedelta
+
+import pytest
+import pytest_asyncio
+
+from mood_diary.backend.database.db import init_db
+from mood_diary.backend.database.writer import SQLiteWriteQueue
+from mood_diary.backend.exceptions.mood import MoodStampAlreadyExistsErrorRepo
+from mood_diary.backend.repositories.sqlite.mood import SQLiteMoodRepository
+from mood_diary.backend.repositories.sсhemas.mood import (
+    CreateMoodStamp,
+    UpdateMoodStamp,
+)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "test.db")
+    init_db(path)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (x INT UNIQUE)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest_asyncio.fixture
+async def writer(db_path):
+    writer = SQLiteWriteQueue(
+        db_path, batch_window=0.05, max_batch=100, max_queue=100
+    )
+    await writer.start()
+    yield writer
+    await writer.close()
+
+
+def insert(x: int):
+    def write(conn: sqlite3.Connection) -> int:
+        conn.execute("INSERT INTO items VALUES (?)", (x,))
+        return x
+
+    return write
+
+
+def count_items(db_path: str) -> int:
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT count(*) FROM items").fetchone()[0]
+    finally:
+        conn.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_share_one_commit(
+    writer: SQLiteWriteQueue, db_path: str
+):
+    results = await asyncio.gather(
+        *(writer.submit(insert(x)) for x in range(10))
+    )
+
+    assert results == list(range(10))
+    assert writer.committed_batches == 1
+    assert writer.committed_writes == 10
+    assert count_items(db_path) == 10
+
+
+@pytest.mark.asyncio
+async def test_failed_write_is_isolated(
+    writer: SQLiteWriteQueue, db_path: str
+):
+    results = await asyncio.gather(
+        writer.submit(insert(1)),
+        writer.submit(insert(1)),
+        writer.submit(insert(2)),
+        return_exceptions=True,
+    )
+
+    assert results[0] == 1
+    assert isinstance(results[1], sqlite3.IntegrityError)
+    assert results[2] == 2
+    assert writer.committed_batches == 1
+    assert count_items(db_path) == 2
+
+
+@pytest.mark.asyncio
+async def test_max_batch_splits_transactions(db_path: str):
+    writer = SQLiteWriteQueue(
+        db_path, batch_window=0.05, max_batch=4, max_queue=100
+    )
+    await writer.start()
+    try:
+        await asyncio.gather(*(writer.submit(insert(x)) for x in range(10)))
+    finally:
+        await writer.close()
+
+    assert writer.committed_batches == 3
+    assert count_items(db_path) == 10
+
+
+@pytest.mark.asyncio
+async def test_submit_requires_running_writer(db_path: str):
+    writer = SQLiteWriteQueue(
+        db_path, batch_window=0, max_batch=1, max_queue=1
+    )
+
+    with pytest.raises(RuntimeError):
+        await writer.submit(insert(1))
+
+    writer.executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_mood_repository_writes_through_queue(
+    writer: SQLiteWriteQueue, db_path: str
+):
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    repo = SQLiteMoodRepository(conn, writer=writer)
+    user_id = uuid.uuid4()
+    today = date.today()
+
+    created = await asyncio.gather(
+        *(
+            repo.create(
+                user_id,
+                CreateMoodStamp(
+                    user_id=user_id,
+                    date=today - timedelta(days=day),
+                    value=5,
+                    note="note",
+                ),
+            )
+            for day in range(5)
+        )
+    )
+    assert len(created) == 5
+    assert writer.committed_batches == 1
+
+    with pytest.raises(MoodStampAlreadyExistsErrorRepo):
+        await repo.create(
+            user_id,
+            CreateMoodStamp(user_id=user_id, date=today, value=1, note="x"),
+        )
+
+    updated = await repo.update(user_id, today, UpdateMoodStamp(value=9))
+    assert updated is not None
+    assert updated.value == 9
+    assert (await repo.get(user_id, today)).value == 9
+
+    assert await repo.delete(user_id, today) is not None
+    assert await repo.get(user_id, today) is None
+    conn.close()
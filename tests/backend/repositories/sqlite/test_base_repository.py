@@ -0,0 +1,71 @@
+import sqlite3
+from unittest.mock import MagicMock
+
+import pytest
+
+from mood_diary.backend.config import config
+from mood_diary.backend.exceptions.database import DatabaseBusy
+from mood_diary.backend.repositories.sqlite.base import (
+    SQLiteRepository,
+    is_lock_error,
+)
+
+
+def locked_error() -> sqlite3.OperationalError:
+    error = sqlite3.OperationalError("database is locked")
+    error.sqlite_errorcode = sqlite3.SQLITE_BUSY  # type: ignore[attr-defined]
+    return error
+
+
+@pytest.fixture
+def repo():
+    connection = MagicMock(spec=sqlite3.Connection)
+    connection.in_transaction = True
+    return SQLiteRepository(connection)
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(config, "SQLITE_LOCK_RETRY_ATTEMPTS", 3)
+    monkeypatch.setattr(config, "SQLITE_LOCK_RETRY_BACKOFF", 0)
+
+
+def test_is_lock_error():
+    assert is_lock_error(locked_error())
+    assert is_lock_error(sqlite3.OperationalError("database is locked"))
+    assert not is_lock_error(sqlite3.OperationalError("no such table: x"))
+
+
+@pytest.mark.asyncio
+async def test_run_retries_lock_errors(repo: SQLiteRepository):
+    func = MagicMock(side_effect=[locked_error(), locked_error(), "result"])
+    func.__name__ = "func"
+
+    assert await repo._run(func, 1, 2) == "result"
+
+    assert func.call_count == 3
+    func.assert_called_with(1, 2)
+    assert repo.connection.rollback.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_run_gives_up_with_database_busy(repo: SQLiteRepository):
+    func = MagicMock(side_effect=locked_error())
+    func.__name__ = "func"
+
+    with pytest.raises(DatabaseBusy):
+        await repo._run(func)
+
+    assert func.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_run_does_not_retry_other_errors(repo: SQLiteRepository):
+    func = MagicMock(side_effect=sqlite3.OperationalError("no such table"))
+    func.__name__ = "func"
+
+    with pytest.raises(sqlite3.OperationalError):
+        await repo._run(func)
+
+    func.assert_called_once()
+    repo.connection.rollback.assert_not_called()
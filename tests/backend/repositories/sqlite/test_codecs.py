@@ -0,0 +1,109 @@
+import sqlite3
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from mood_diary.backend.repositories.sqlite.codecs import (
+    CompactMoodStampCodec,
+    TextMoodStampCodec,
+    get_moodstamp_codec,
+)
+from mood_diary.backend.repositories.sqlite.mood import SQLiteMoodRepository
+from mood_diary.backend.repositories.sсhemas.mood import (
+    CreateMoodStamp,
+    MoodStampFilter,
+    UpdateMoodStamp,
+)
+
+
+def test_get_moodstamp_codec():
+    assert isinstance(get_moodstamp_codec("text"), TextMoodStampCodec)
+    assert isinstance(get_moodstamp_codec("compact"), CompactMoodStampCodec)
+
+
+def test_compact_codec_round_trip():
+    codec = CompactMoodStampCodec()
+    value = uuid.uuid4()
+    now = datetime(2024, 5, 17, 13, 45, 12, 345678)
+
+    assert codec.encode_uuid(value) == value.bytes
+    assert codec.decode_uuid(codec.encode_uuid(value)) == value
+    assert codec.encode_date(date(1970, 1, 2)) == 1
+    assert codec.decode_date(codec.encode_date(date(2024, 2, 29))) == date(
+        2024, 2, 29
+    )
+    assert codec.decode_timestamp(codec.encode_timestamp(now)) == now
+    assert codec.encode_timestamp(None) is None
+
+
+def test_compact_codec_normalizes_aware_timestamps():
+    codec = CompactMoodStampCodec()
+    aware = datetime(2024, 1, 1, 15, 0, tzinfo=timezone(timedelta(hours=3)))
+
+    assert codec.decode_timestamp(codec.encode_timestamp(aware)) == datetime(
+        2024, 1, 1, 12, 0
+    )
+
+
+def test_compact_dates_keep_their_order():
+    codec = CompactMoodStampCodec()
+    days = [date(1969, 12, 31), date(2000, 1, 1), date(2024, 12, 31)]
+
+    assert sorted(days, key=codec.encode_date) == days
+
+
+def test_text_codec_parses_stored_values():
+    codec = TextMoodStampCodec()
+
+    assert codec.decode_date("2024-01-02") == date(2024, 1, 2)
+    assert codec.decode_timestamp("2024-01-02 03:04:05") == datetime(
+        2024, 1, 2, 3, 4, 5
+    )
+    assert codec.encode_uuid(uuid.UUID(int=1)) == str(uuid.UUID(int=1))
+
+
+@pytest.mark.asyncio
+async def test_compact_repository_crud():
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    repo = SQLiteMoodRepository(conn, codec=CompactMoodStampCodec())
+    repo.init_db()
+    user_id = uuid.uuid4()
+
+    created = await repo.create(
+        user_id,
+        CreateMoodStamp(
+            user_id=user_id, date=date(2024, 1, 2), value=3, note="<b>hi"
+        ),
+    )
+    await repo.create(
+        user_id,
+        CreateMoodStamp(
+            user_id=user_id, date=date(2024, 1, 5), value=7, note="later"
+        ),
+    )
+
+    stored = conn.execute(
+        "SELECT typeof(id), typeof(user_id), typeof(date), "
+        "typeof(created_at) FROM moodstamps WHERE date = ?",
+        (CompactMoodStampCodec().encode_date(date(2024, 1, 2)),),
+    ).fetchone()
+    assert tuple(stored) == ("blob", "blob", "integer", "integer")
+
+    assert await repo.get(user_id, date(2024, 1, 2)) == created
+
+    moods = await repo.get_many(
+        user_id, MoodStampFilter(start_date=date(2024, 1, 3))
+    )
+    assert [mood.date for mood in moods] == [date(2024, 1, 5)]
+
+    updated = await repo.update(
+        user_id, date(2024, 1, 2), UpdateMoodStamp(value=4)
+    )
+    assert updated is not None
+    assert updated.value == 4
+    assert updated.created_at == created.created_at
+
+    assert await repo.delete(user_id, date(2024, 1, 2)) == updated
+    assert await repo.get(user_id, date(2024, 1, 2)) is None
+    conn.close()
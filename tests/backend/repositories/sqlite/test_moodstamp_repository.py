@@ -1,3 +1,5 @@
+import json
+import sqlite3
 import uuid
 from datetime import datetime, date, timezone
 from unittest.mock import ANY, AsyncMock, MagicMock, patch
@@ -5,10 +7,17 @@ from typing import Union
 
 import pytest
 
-from mood_diary.backend.repositories.sqlite.mood import SQLiteMoodRepository
+from mood_diary.backend.repositories.sqlite.codecs import get_moodstamp_codec
+from mood_diary.backend.repositories.sqlite.mood import (
+    COLUMNS,
+    SQLiteMoodRepository,
+)
 from mood_diary.backend.repositories.sсhemas.mood import (
     MoodStamp,
     CreateMoodStamp,
+    MoodStampPage,
+    MoodStampsVersion,
+    PartialMoodStamp,
     UpdateMoodStamp,
     MoodStampFilter,
 )
@@ -257,9 +266,17 @@ async def test_get_many_moodstamps_filtered(
     assert moods[0].id == uuid.UUID(sample_mood_data[0])
 
 
+def returned_row(moodstamp: MoodStamp, **changes) -> dict:
+    """Row as produced by a `RETURNING *` clause"""
+    row = moodstamp.model_dump()
+    row.update(changes)
+    row["id"] = str(row["id"])
+    row["user_id"] = str(row["user_id"])
+    return row
+
+
 @pytest.mark.asyncio
 async def test_create_moodstamp_success(
-    mood_repo: SQLiteMoodRepository,
     mock_connection: AsyncMock,
     mock_cursor: MagicMock,
     sample_mood_schema: MoodStamp,
@@ -278,20 +295,16 @@ async def test_create_moodstamp_success(
     expected_moodstamp = sample_mood_schema.model_copy(
         update={
             "id": test_uuid,
-            "user_id": sample_mood_schema.user_id,
-            "date": create_data.date,
-            "value": create_data.value,
-            "note": create_data.note,
             "created_at": fixed_time,
             "updated_at": fixed_time,
         }
     )
-    repo.get = AsyncMock(return_value=expected_moodstamp)
+    mock_cursor.fetchone.return_value = returned_row(expected_moodstamp)
 
     with patch(
         "mood_diary.backend.repositories.sqlite.mood.uuid4",
         return_value=test_uuid,
-    ) as mock_uuid:
+    ):
         with patch(
             "mood_diary.backend.repositories.sqlite.mood.datetime"
         ) as mock_dt:
@@ -302,11 +315,13 @@ async def test_create_moodstamp_success(
             )
 
     mock_connection.cursor.assert_called_once()
-    assert mock_cursor.execute.call_count == 2
+    mock_cursor.execute.assert_called_once()
 
-    insert_call_args = mock_cursor.execute.call_args_list[1]
-    assert "INSERT INTO moodstamps" in insert_call_args[0][0]
-    assert insert_call_args[0][1] == (
+    insert_sql, insert_params = mock_cursor.execute.call_args[0]
+    assert "INSERT INTO moodstamps" in insert_sql
+    assert "ON CONFLICT (user_id, date) DO NOTHING" in insert_sql
+    assert "RETURNING *" in insert_sql
+    assert insert_params == (
         str(test_uuid),
         str(sample_mood_schema.user_id),
         create_data.date,
@@ -316,10 +331,6 @@ async def test_create_moodstamp_success(
         fixed_time,
     )
 
-    mock_connection.cursor.assert_called()
-    assert mock_cursor.execute.call_count >= 1
-    assert "INSERT INTO moodstamps" in mock_cursor.execute.call_args[0][0]
-
     mock_connection.commit.assert_called_once()
     assert created_moodstamp == expected_moodstamp
 
@@ -337,23 +348,39 @@ async def test_create_moodstamp_duplicate(
         value=5,
         note="Already exists",
     )
-    mock_cursor.fetchone.return_value = (str(uuid.uuid4()),)
+    # ON CONFLICT DO NOTHING returns no row
+    mock_cursor.fetchone.return_value = None
 
     with pytest.raises(MoodStampAlreadyExistsErrorRepo):
         await mood_repo.create(create_data.user_id, create_data)
 
     mock_connection.cursor.assert_called_once()
-    mock_cursor.execute.assert_called_once_with(
-        "SELECT id FROM moodstamps WHERE user_id = ? AND date = ?",
-        (str(create_data.user_id), create_data.date),
-    )
+    mock_cursor.execute.assert_called_once()
     mock_cursor.fetchone.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_create_moodstamp_integrity_error(
+    mood_repo: SQLiteMoodRepository,
+    mock_connection: AsyncMock,
+    mock_cursor: MagicMock,
+):
+    create_data = CreateMoodStamp(
+        user_id=uuid.uuid4(),
+        date=date.today(),
+        value=5,
+        note="Already exists",
+    )
+    mock_cursor.execute.side_effect = sqlite3.IntegrityError
+
+    with pytest.raises(MoodStampAlreadyExistsErrorRepo):
+        await mood_repo.create(create_data.user_id, create_data)
+
     mock_connection.commit.assert_not_called()
 
 
 @pytest.mark.asyncio
 async def test_update_moodstamp_success(
-    mood_repo: SQLiteMoodRepository,
     mock_connection: AsyncMock,
     mock_cursor: MagicMock,
     sample_mood_schema: MoodStamp,
@@ -362,20 +389,15 @@ async def test_update_moodstamp_success(
     user_id = sample_mood_schema.user_id
     mood_date = sample_mood_schema.date
     repo = SQLiteMoodRepository(mock_connection)
-
-    original_row_dict = {
-        "id": str(sample_mood_schema.id),
-        "user_id": str(user_id),
-        "date": mood_date,
-        "value": sample_mood_schema.value,
-        "note": sample_mood_schema.note,
-        "created_at": sample_mood_schema.created_at,
-        "updated_at": sample_mood_schema.updated_at,
-    }
-    mock_cursor.fetchone.return_value = original_row_dict
-
     fixed_time = datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
 
+    mock_cursor.fetchone.return_value = returned_row(
+        sample_mood_schema,
+        value=update_data.value,
+        note=update_data.note,
+        updated_at=fixed_time,
+    )
+
     with patch(
         "mood_diary.backend.repositories.sqlite.mood.datetime"
     ) as mock_dt:
@@ -390,21 +412,14 @@ async def test_update_moodstamp_success(
     assert updated_moodstamp.id == sample_mood_schema.id
     assert updated_moodstamp.created_at == sample_mood_schema.created_at
 
-    assert mock_cursor.execute.call_count == 2
-    select_call = mock_cursor.execute.call_args_list[0]
-    assert (
-        "SELECT * FROM moodstamps WHERE user_id = ? AND date = ?"
-        in select_call[0][0]
-    )
-    assert select_call[0][1] == (str(user_id), mood_date)
-    update_call = mock_cursor.execute.call_args_list[1]
-    update_sql = update_call[0][0]
-    update_params = update_call[0][1]
+    mock_cursor.execute.assert_called_once()
+    update_sql, update_params = mock_cursor.execute.call_args[0]
     assert "UPDATE moodstamps" in update_sql
-    assert "SET value = ?" in update_sql
-    assert "note = ?" in update_sql
+    assert "SET value = COALESCE(?, value)" in update_sql
+    assert "note = COALESCE(?, note)" in update_sql
     assert "updated_at = ?" in update_sql
     assert "WHERE user_id = ? AND date = ?" in update_sql
+    assert "RETURNING *" in update_sql
     assert update_params == (
         update_data.value,
         update_data.note,
@@ -426,20 +441,12 @@ async def test_update_moodstamp_only_value(
     user_id = sample_mood_schema.user_id
     mood_date = sample_mood_schema.date
     repo = SQLiteMoodRepository(mock_connection)
-
-    original_row_dict = {
-        "id": str(sample_mood_schema.id),
-        "user_id": str(user_id),
-        "date": mood_date,
-        "value": sample_mood_schema.value,
-        "note": sample_mood_schema.note,
-        "created_at": sample_mood_schema.created_at,
-        "updated_at": sample_mood_schema.updated_at,
-    }
-    mock_cursor.fetchone.return_value = original_row_dict
-
     fixed_time = datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
 
+    mock_cursor.fetchone.return_value = returned_row(
+        sample_mood_schema, value=update_data.value, updated_at=fixed_time
+    )
+
     with patch(
         "mood_diary.backend.repositories.sqlite.mood.datetime"
     ) as mock_dt:
@@ -451,11 +458,10 @@ async def test_update_moodstamp_only_value(
     assert updated_moodstamp.note == sample_mood_schema.note
     assert updated_moodstamp.updated_at == fixed_time
 
-    assert mock_cursor.execute.call_count == 2
-    update_call = mock_cursor.execute.call_args_list[1]
-    assert update_call[0][1] == (
+    mock_cursor.execute.assert_called_once()
+    assert mock_cursor.execute.call_args[0][1] == (
         update_data.value,
-        sample_mood_schema.note,
+        None,
         fixed_time,
         str(user_id),
         mood_date,
@@ -474,20 +480,12 @@ async def test_update_moodstamp_only_note(
     user_id = sample_mood_schema.user_id
     mood_date = sample_mood_schema.date
     repo = SQLiteMoodRepository(mock_connection)
-
-    original_row_dict = {
-        "id": str(sample_mood_schema.id),
-        "user_id": str(user_id),
-        "date": mood_date,
-        "value": sample_mood_schema.value,
-        "note": sample_mood_schema.note,
-        "created_at": sample_mood_schema.created_at,
-        "updated_at": sample_mood_schema.updated_at,
-    }
-    mock_cursor.fetchone.return_value = original_row_dict
-
     fixed_time = datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
 
+    mock_cursor.fetchone.return_value = returned_row(
+        sample_mood_schema, note=update_data.note, updated_at=fixed_time
+    )
+
     with patch(
         "mood_diary.backend.repositories.sqlite.mood.datetime"
     ) as mock_dt:
@@ -499,10 +497,9 @@ async def test_update_moodstamp_only_note(
     assert updated_moodstamp.note == update_data.note
     assert updated_moodstamp.updated_at == fixed_time
 
-    assert mock_cursor.execute.call_count == 2
-    update_call = mock_cursor.execute.call_args_list[1]
-    assert update_call[0][1] == (
-        sample_mood_schema.value,
+    mock_cursor.execute.assert_called_once()
+    assert mock_cursor.execute.call_args[0][1] == (
+        None,
         update_data.note,
         fixed_time,
         str(user_id),
@@ -541,34 +538,19 @@ async def test_delete_moodstamp_success(
     user_id = sample_mood_schema.user_id
     mood_date = sample_mood_schema.date
 
-    mock_cursor.fetchone.return_value = dict(
-        id=str(sample_mood_schema.id),
-        user_id=str(user_id),
-        date=mood_date,
-        value=sample_mood_schema.value,
-        note=sample_mood_schema.note,
-        created_at=sample_mood_schema.created_at,
-        updated_at=sample_mood_schema.updated_at,
-    )
+    mock_cursor.fetchone.return_value = returned_row(sample_mood_schema)
 
     repo = SQLiteMoodRepository(mock_connection)
     deleted_mood = await repo.delete(user_id, mood_date)
 
-    mock_connection.cursor.assert_called()
-    assert mock_cursor.execute.call_count >= 2
+    mock_connection.cursor.assert_called_once()
+    mock_cursor.execute.assert_called_once()
+    delete_sql, delete_params = mock_cursor.execute.call_args[0]
+    assert "DELETE FROM moodstamps" in delete_sql
+    assert "RETURNING *" in delete_sql
+    assert delete_params == (str(user_id), mood_date)
     mock_connection.commit.assert_called_once()
-    assert deleted_mood is not None
-    assert deleted_mood.id == sample_mood_schema.id
-    assert deleted_mood.user_id == user_id
-    assert deleted_mood.date == mood_date
-    assert deleted_mood.value == sample_mood_schema.value
-    assert deleted_mood.note == sample_mood_schema.note
-    assert deleted_mood.created_at.replace(
-        tzinfo=None
-    ) == sample_mood_schema.created_at.replace(tzinfo=None)
-    assert deleted_mood.updated_at.replace(
-        tzinfo=None
-    ) == sample_mood_schema.updated_at.replace(tzinfo=None)
+    assert deleted_mood == sample_mood_schema
 
 
 @pytest.mark.asyncio
@@ -588,3 +570,228 @@ async def test_delete_moodstamp_not_found(
     mock_connection.cursor.assert_called_once()
     mock_cursor.execute.assert_called_once()
     assert deleted_mood is None
+
+
+# --- Query plans ---
+
+
+def query_plan(conn: sqlite3.Connection, statement: str) -> list[str]:
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}")]
+
+
+@pytest.fixture(params=["text", "compact"])
+def traced_repo(request):
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    repo = SQLiteMoodRepository(conn, codec=get_moodstamp_codec(request.param))
+    repo.init_db()
+    statements: list[str] = []
+    conn.set_trace_callback(statements.append)
+    yield repo, statements
+    conn.set_trace_callback(None)
+    conn.close()
+
+
+def test_moodstamps_table_is_clustered_without_indexes(traced_repo):
+    repo, _ = traced_repo
+
+    wr = repo.connection.execute(
+        "SELECT wr FROM pragma_table_list WHERE name = 'moodstamps'"
+    ).fetchone()[0]
+    indexes = repo.connection.execute(
+        "SELECT name FROM sqlite_master "
+        "WHERE type = 'index' AND tbl_name = 'moodstamps'"
+    ).fetchall()
+
+    assert wr == 1
+    assert indexes == []
+
+
+def test_columns_are_those_of_the_table(traced_repo):
+    repo, _ = traced_repo
+
+    names = repo.connection.execute(
+        "SELECT name FROM pragma_table_info('moodstamps')"
+    ).fetchall()
+
+    assert COLUMNS == tuple(name for (name,) in names)
+
+
+@pytest.mark.asyncio
+async def test_reads_search_primary_key(traced_repo):
+    repo, statements = traced_repo
+    user_id = uuid.uuid4()
+
+    await repo.get(user_id, date(2024, 1, 1))
+    await repo.get_many(user_id, MoodStampFilter())
+    await repo.get_many(
+        user_id,
+        MoodStampFilter(
+            start_date=date(2024, 1, 1), end_date=date(2024, 1, 31), value=5
+        ),
+    )
+    selects = [s for s in statements if s.startswith("SELECT")]
+
+    assert query_plan(repo.connection, selects[0]) == [
+        "SEARCH moodstamps USING PRIMARY KEY (user_id=? AND date=?)"
+    ]
+    # ORDER BY date DESC walks the key backwards, no temp B-tree sort
+    assert query_plan(repo.connection, selects[1]) == [
+        "SEARCH moodstamps USING PRIMARY KEY (user_id=?)"
+    ]
+    assert query_plan(repo.connection, selects[2]) == [
+        "SEARCH moodstamps USING PRIMARY KEY (user_id=? AND date>? AND date<?)"
+    ]
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+@pytest.mark.asyncio
+async def test_get_many_seeks_keyset_pages(traced_repo, order):
+    repo, statements = traced_repo
+    user_id = uuid.uuid4()
+    for day in range(1, 11):
+        await repo.create(
+            user_id,
+            CreateMoodStamp(
+                user_id=user_id, date=date(2024, 1, day), value=5, note=""
+            ),
+        )
+    statements.clear()
+
+    dates = []
+    after = None
+    while True:
+        page = await repo.get_many(
+            user_id, MoodStampFilter(after=after, limit=3, order=order)
+        )
+        dates += [moodstamp.date for moodstamp in page]
+        if len(page) < 3:
+            break
+        after = page[-1].date
+
+    expected = [date(2024, 1, day) for day in range(1, 11)]
+    assert dates == (expected if order == "asc" else expected[::-1])
+    assert "OFFSET" not in statements[-1]
+    assert query_plan(repo.connection, statements[-1]) == [
+        "SEARCH moodstamps USING PRIMARY KEY "
+        + (
+            "(user_id=? AND date>?)"
+            if order == "asc"
+            else "(user_id=? AND date<?)"
+        )
+    ]
+
+
+@pytest.mark.asyncio
+async def test_get_many_reads_only_projected_columns(traced_repo):
+    repo, statements = traced_repo
+    user_id = uuid.uuid4()
+    await repo.create(
+        user_id,
+        CreateMoodStamp(
+            user_id=user_id, date=date(2024, 1, 1), value=5, note="note"
+        ),
+    )
+    statements.clear()
+
+    with patch(
+        "mood_diary.backend.repositories.sqlite.mood.bleach.clean"
+    ) as clean:
+        moods = await repo.get_many(user_id, MoodStampFilter(fields=["value"]))
+
+    assert statements[0].startswith("SELECT date, value FROM moodstamps")
+    assert moods == [PartialMoodStamp(date=date(2024, 1, 1), value=5)]
+    assert moods[0].model_fields_set == {"date", "value"}
+    clean.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        MoodStampFilter(),
+        MoodStampFilter(limit=2, order="asc"),
+        MoodStampFilter(after=date(2024, 1, 4), limit=2),
+        MoodStampFilter(value=3, fields=["note", "value"]),
+    ],
+)
+@pytest.mark.asyncio
+async def test_get_many_json_matches_get_many(traced_repo, body):
+    repo, statements = traced_repo
+    user_id = uuid.uuid4()
+    for day in range(1, 6):
+        await repo.create(
+            user_id,
+            CreateMoodStamp(
+                user_id=user_id,
+                date=date(2024, 1, day),
+                value=day,
+                note='"quoted" <b>note</b>\n',
+            ),
+        )
+    statements.clear()
+
+    rows = await repo.get_many_json(user_id, body)
+
+    limit = body.limit + 1 if body.limit else None
+    moods = await repo.get_many(
+        user_id, body.model_copy(update={"limit": limit})
+    )
+    page = moods[: body.limit] if body.limit else moods
+    expected = MoodStampPage(items=page, next_cursor=None).model_dump(
+        mode="json", exclude_unset=True
+    )
+    assert (
+        rows.items
+        == json.dumps(expected["items"], separators=(",", ":")).encode()
+    )
+    assert rows.count == len(page)
+    assert rows.has_more == (len(moods) > len(page))
+    assert rows.last_date == (page[-1].date if rows.has_more else None)
+    assert "SEARCH moodstamps USING PRIMARY KEY" in " ".join(
+        query_plan(repo.connection, statements[0])
+    )
+    assert "TEMP B-TREE" not in " ".join(
+        query_plan(repo.connection, statements[0])
+    )
+
+
+@pytest.mark.asyncio
+async def test_writes_search_primary_key(traced_repo):
+    repo, statements = traced_repo
+    user_id = uuid.uuid4()
+
+    await repo.update(user_id, date(2024, 1, 1), UpdateMoodStamp(value=1))
+    await repo.delete(user_id, date(2024, 1, 1))
+    writes = [s for s in statements if s.startswith(("UPDATE", "DELETE"))]
+
+    assert len(writes) == 2
+    for statement in writes:
+        assert query_plan(repo.connection, statement) == [
+            "SEARCH moodstamps USING PRIMARY KEY (user_id=? AND date=?)"
+        ]
+
+
+@pytest.mark.asyncio
+async def test_get_version_changes_with_every_write(traced_repo):
+    repo, statements = traced_repo
+    user_id = uuid.uuid4()
+
+    empty = await repo.get_version(user_id)
+    created = await repo.create(
+        user_id,
+        CreateMoodStamp(
+            user_id=user_id, date=date(2024, 1, 1), value=5, note=""
+        ),
+    )
+    after_create = await repo.get_version(user_id)
+    statements.clear()
+    await repo.get_version(uuid.uuid4())
+    plan = query_plan(repo.connection, statements[0])
+    await repo.delete(user_id, date(2024, 1, 1))
+    after_delete = await repo.get_version(user_id)
+
+    assert empty == MoodStampsVersion(count=0, updated_at=None)
+    assert after_create == MoodStampsVersion(
+        count=1, updated_at=created.updated_at
+    )
+    assert after_delete == empty
+    assert plan == ["SEARCH moodstamps USING PRIMARY KEY (user_id=?)"]
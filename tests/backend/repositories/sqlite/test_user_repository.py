@@ -22,6 +22,18 @@ from tests.backend.repositories.sqlite.base_fixtures import (
 # --- Fixtures ---
 
 
+def sample_user_row(user: User) -> tuple:
+    return (
+        str(user.id),
+        user.username,
+        user.name,
+        user.hashed_password,
+        user.created_at,
+        user.updated_at,
+        user.password_updated_at,
+    )
+
+
 @pytest.fixture
 def user_repo(mock_connection):
     repo = SQLiteUserRepository(mock_connection)
@@ -212,7 +224,7 @@ async def test_create_user_success(
             ),
         }
     )
-    repo.get_by_username = AsyncMock(return_value=expected_user)
+    repo.get_by_username = AsyncMock()
 
     fixed_time = datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
     test_uuid = uuid.uuid4()
@@ -226,6 +238,15 @@ async def test_create_user_success(
         ) as mock_dt:
             mock_dt.now.return_value = fixed_time
             expected_user.id = test_uuid
+            mock_cursor.fetchone.return_value = (
+                str(test_uuid),
+                expected_user.username,
+                expected_user.name,
+                expected_user.hashed_password,
+                fixed_time,
+                fixed_time,
+                fixed_time,
+            )
 
             created_user = await repo.create(create_data)
 
@@ -242,12 +263,35 @@ async def test_create_user_success(
             fixed_time,
         ),
     )
-    assert "INSERT INTO users" in mock_cursor.execute.call_args[0][0]
+    insert_sql = mock_cursor.execute.call_args[0][0]
+    assert "INSERT INTO users" in insert_sql
+    assert "ON CONFLICT (username) DO NOTHING" in insert_sql
+    assert "RETURNING *" in insert_sql
     mock_connection.commit.assert_called_once()
-    repo.get_by_username.assert_awaited_once_with(create_data.username)
+    repo.get_by_username.assert_not_awaited()
     assert created_user == expected_user
 
 
+@pytest.mark.asyncio
+async def test_create_user_username_conflict(
+    mock_connection: AsyncMock,
+    mock_cursor: MagicMock,
+):
+    create_data = CreateUser(
+        username="existinguser",
+        name="Existing User",
+        hashed_password="existing_password",
+    )
+    # ON CONFLICT DO NOTHING returns no row
+    mock_cursor.fetchone.return_value = None
+    repo = SQLiteUserRepository(mock_connection)
+
+    created_user = await repo.create(create_data)
+
+    mock_cursor.execute.assert_called_once()
+    assert created_user is None
+
+
 @pytest.mark.asyncio
 async def test_create_user_integrity_error(
     user_repo: SQLiteUserRepository,
@@ -282,18 +326,20 @@ async def test_update_profile_success(
     user_id = sample_user_schema.id
     update_data = UpdateUserProfile(name="Updated Name")
     repo = SQLiteUserRepository(mock_connection)
-    repo.get = AsyncMock(return_value=sample_user_schema)
+    repo.get = AsyncMock()
+    mock_cursor.fetchone.return_value = sample_user_row(sample_user_schema)
 
     assert isinstance(update_data, UpdateUserProfile)
     updated_user = await repo.update_profile(user_id, update_data)
 
     mock_connection.cursor.assert_called_once()
     mock_cursor.execute.assert_called_once_with(
-        "UPDATE users SET name = ?, updated_at = ? WHERE id = ?",
+        "UPDATE users SET name = ?, updated_at = ? WHERE id = ? "
+        "RETURNING *",
         (update_data.name, ANY, str(user_id)),
     )
     mock_connection.commit.assert_called_once()
-    repo.get.assert_awaited_once_with(user_id)
+    repo.get.assert_not_awaited()
     assert updated_user == sample_user_schema
 
 
@@ -309,7 +355,8 @@ async def test_update_hashed_password_success(
         hashed_password="new_hashed_password"
     )
     repo = SQLiteUserRepository(mock_connection)
-    repo.get = AsyncMock(return_value=sample_user_schema)
+    repo.get = AsyncMock()
+    mock_cursor.fetchone.return_value = sample_user_row(sample_user_schema)
 
     assert isinstance(update_data, UpdateUserHashedPassword)
     updated_user = await repo.update_hashed_password(user_id, update_data)
@@ -324,11 +371,52 @@ async def test_update_hashed_password_success(
     assert "SET hashed_password = ?" in sql_statement
     assert "password_updated_at = ?" in sql_statement
     assert "WHERE id = ?" in sql_statement
+    assert "RETURNING *" in sql_statement
 
     assert sql_params[0] == update_data.hashed_password
     assert isinstance(sql_params[1], datetime)
     assert sql_params[2] == str(user_id)
 
     mock_connection.commit.assert_called_once()
-    repo.get.assert_awaited_once_with(user_id)
+    repo.get.assert_not_awaited()
     assert updated_user == sample_user_schema
+
+
+@pytest.mark.asyncio
+async def test_update_profile_not_found(
+    mock_connection: AsyncMock,
+    mock_cursor: MagicMock,
+):
+    repo = SQLiteUserRepository(mock_connection)
+
+    updated_user = await repo.update_profile(
+        uuid.uuid4(), UpdateUserProfile(name="Updated Name")
+    )
+
+    mock_cursor.execute.assert_called_once()
+    assert updated_user is None
+
+
+@pytest.mark.asyncio
+async def test_rehash_password_replaces_unchanged_hash():
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    repo = SQLiteUserRepository(conn)
+    repo.init_db()
+    user = await repo.create(
+        CreateUser(username="user", name="User", hashed_password="old")
+    )
+    assert user is not None
+
+    replaced = await repo.rehash_password(
+        user.id, "old", UpdateUserHashedPassword(hashed_password="new")
+    )
+    stale = await repo.rehash_password(
+        user.id, "old", UpdateUserHashedPassword(hashed_password="newer")
+    )
+
+    rehashed = await repo.get(user.id)
+    assert (replaced, stale) == (True, False)
+    assert rehashed is not None
+    assert rehashed.hashed_password == "new"
+    assert rehashed.password_updated_at == user.password_updated_at
+    conn.close()
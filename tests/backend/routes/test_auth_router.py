@@ -1,6 +1,7 @@
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 from fastapi import Cookie, status
@@ -11,15 +12,22 @@ from mood_diary.backend.exceptions.user import (
     IncorrectOldPassword,
     IncorrectPasswordOrUserDoesNotExists,
     InvalidOrExpiredAccessToken,
+    PasswordHashingBusy,
     UsernameAlreadyExists,
 )
 from mood_diary.backend.app import get_app
 from mood_diary.backend.routes.dependencies import (
     get_token_manager,
     get_user_service,
+    get_user_service_factory,
     get_current_user_id,
 )
-from mood_diary.backend.database.cache import get_redis_client
+from mood_diary.backend.database.cache import (
+    LocalCache,
+    TieredCache,
+    get_cache,
+)
+from mood_diary.backend.database.cache_backends import RedisBackend
 from mood_diary.backend.services.user import UserService
 from mood_diary.backend.utils.token_manager import (
     JWTTokenManager,
@@ -40,19 +48,19 @@ def mock_user_service():
 
 
 @pytest.fixture
-def mock_redis_client() -> AsyncMock:
+def cache() -> TieredCache:
     mock_redis = AsyncMock()
     mock_redis.get.return_value = None
     mock_redis.set.return_value = None
     mock_redis.delete.return_value = None
-
-    async def mock_scan_iter(*args, **kwargs):
-        if False:
-            yield
-        return
-
-    mock_redis.scan_iter = mock_scan_iter
-    return mock_redis
+    mock_redis.lock = MagicMock(return_value=AsyncMock())
+    pipeline = MagicMock()
+    pipeline.__aenter__.return_value = pipeline
+    pipeline.execute = AsyncMock()
+    mock_redis.pipeline = MagicMock(return_value=pipeline)
+    return TieredCache(
+        RedisBackend(mock_redis), LocalCache(16, 5.0), "invalidate"
+    )
 
 
 @pytest.fixture
@@ -82,7 +90,7 @@ def override_dependencies(
     mock_user_service: AsyncMock,
     test_token_manager: TokenManager,
     main_app,
-    mock_redis_client: AsyncMock,
+    cache: TieredCache,
 ):
     test_user_id = uuid.uuid4()
 
@@ -94,14 +102,21 @@ def override_dependencies(
 
         return test_user_id
 
+    @asynccontextmanager
+    async def open_user_service():
+        yield mock_user_service
+
     main_app.dependency_overrides[get_user_service] = lambda: mock_user_service
+    main_app.dependency_overrides[get_user_service_factory] = (
+        lambda: open_user_service
+    )
     main_app.dependency_overrides[get_token_manager] = (
         lambda: test_token_manager
     )
     main_app.dependency_overrides[get_current_user_id] = (
         mock_get_current_user_id_simple_check
     )
-    main_app.dependency_overrides[get_redis_client] = lambda: mock_redis_client
+    main_app.dependency_overrides[get_cache] = lambda: cache
 
     yield test_user_id
 
@@ -411,6 +426,16 @@ def test_login_unauthorized(client: TestClient, mock_user_service: AsyncMock):
     }
 
 
+def test_login_password_hashing_busy(
+    client: TestClient, mock_user_service: AsyncMock
+):
+    mock_user_service.login.side_effect = PasswordHashingBusy(retry_after=3)
+    login_payload = {"username": "testuser", "password": "password123"}
+    response = client.post("/api/auth/login", json=login_payload)
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["retry-after"] == "3"
+
+
 def test_validate_token_success(client: TestClient, override_dependencies):
     client.cookies.set("access_token", "valid.token.for.test")
     response = client.post("/api/auth/validate")
@@ -473,6 +498,33 @@ def test_get_profile_success(
     mock_user_service.get_profile.assert_awaited_once_with(fixed_user_id)
 
 
+def test_get_profile_not_modified(
+    client: TestClient,
+    mock_user_service: AsyncMock,
+    sample_profile_data,
+    override_dependencies,
+):
+    profile_data = sample_profile_data.copy()
+    profile_data["id"] = str(override_dependencies)
+    mock_user_service.get_profile.return_value = Profile(**profile_data)
+    client.cookies.set("access_token", "valid.token.for.test")
+
+    response = client.get("/api/auth/profile")
+    by_etag = client.get(
+        "/api/auth/profile",
+        headers={"If-None-Match": response.headers["etag"]},
+    )
+    by_date = client.get(
+        "/api/auth/profile",
+        headers={"If-Modified-Since": response.headers["last-modified"]},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert by_etag.status_code == status.HTTP_304_NOT_MODIFIED
+    assert by_date.status_code == status.HTTP_304_NOT_MODIFIED
+    assert by_etag.headers["etag"] == response.headers["etag"]
+
+
 def test_get_profile_unauthorized(client: TestClient, override_dependencies):
     response = client.get("/api/auth/profile")
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
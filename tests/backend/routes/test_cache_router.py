@@ -0,0 +1,126 @@
+import uuid
+from datetime import UTC, datetime
+from unittest.mock import AsyncMock
+
+import pytest
+from fastapi import FastAPI, Request, status
+from fastapi.testclient import TestClient
+
+from mood_diary.backend.database.cache import (
+    CachedValue,
+    LocalCache,
+    TieredCache,
+    get_cache,
+)
+from mood_diary.backend.database.cache_backends import RedisBackend
+from mood_diary.backend.routes.cache import (
+    conditional_response,
+    is_not_modified,
+    make_etag,
+)
+from mood_diary.backend.exceptions.user import InvalidOrExpiredAccessToken
+from mood_diary.backend.routes.cache import router as cache_router
+from mood_diary.backend.routes.dependencies import get_current_user_id
+
+
+def test_get_cache_stats():
+    redis = AsyncMock()
+    redis.get.return_value = None
+    cache = TieredCache(RedisBackend(redis), LocalCache(10, 5.0), "invalidate")
+    app = FastAPI()
+    app.include_router(cache_router, prefix="/api/cache")
+    app.dependency_overrides[get_cache] = lambda: cache
+    app.dependency_overrides[get_current_user_id] = uuid.uuid4
+
+    with TestClient(app) as client:
+        client.portal.call(cache.get, "key")
+        response = client.get("/api/cache/stats")
+
+    assert response.status_code == status.HTTP_200_OK
+    stats = response.json()
+    assert stats.pop("latency")["get"]["calls"] == 1
+    assert stats == {
+        "local": {"hits": 0, "misses": 0, "hit_ratio": 0.0},
+        "redis": {"hits": 0, "misses": 1, "hit_ratio": 0.0},
+        "local_entries": 0,
+        "backend": "redis",
+        "degraded": False,
+        "calls": {},
+        "pool": None,
+    }
+
+
+def test_get_cache_stats_requires_access_token():
+    app = FastAPI()
+    app.include_router(cache_router, prefix="/api/cache")
+    app.dependency_overrides[get_cache] = AsyncMock
+
+    with TestClient(app) as client:
+        with pytest.raises(InvalidOrExpiredAccessToken):
+            client.get("/api/cache/stats")
+
+
+def request(headers: dict[str, str]) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "headers": [
+                (name.lower().encode(), value.encode())
+                for name, value in headers.items()
+            ],
+        }
+    )
+
+
+def test_make_etag_separates_parts():
+    assert make_etag("ab", "c") != make_etag("a", "bc")
+    assert make_etag(b"ab", "c") == make_etag("ab", b"c")
+    assert make_etag("a").startswith('"')
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        ({}, False),
+        ({"If-None-Match": '"tag"'}, True),
+        ({"If-None-Match": 'W/"tag"'}, True),
+        ({"If-None-Match": '"other", "tag"'}, True),
+        ({"If-None-Match": "*"}, True),
+        ({"If-None-Match": '"other"'}, False),
+        ({"If-Modified-Since": "Mon, 01 Jan 2024 12:00:00 GMT"}, True),
+        ({"If-Modified-Since": "Mon, 01 Jan 2024 11:59:59 GMT"}, False),
+        ({"If-Modified-Since": "not a date"}, False),
+        (
+            {
+                "If-None-Match": '"other"',
+                "If-Modified-Since": "Mon, 01 Jan 2024 12:00:00 GMT",
+            },
+            False,
+        ),
+    ],
+)
+def test_is_not_modified(headers: dict[str, str], expected: bool):
+    last_modified = datetime(2024, 1, 1, 12, 0, 0, 500000, tzinfo=UTC)
+
+    assert is_not_modified(request(headers), '"tag"', last_modified) is (
+        expected
+    )
+
+
+def test_conditional_response_sends_cached_last_modified():
+    # Not JSON: the body is not parsed to find when it was modified
+    value = CachedValue(
+        b"body", last_modified=datetime(2024, 1, 1, 12, tzinfo=UTC).timestamp()
+    )
+
+    response = conditional_response(value, request({}))
+    not_modified = conditional_response(
+        value,
+        request({"If-Modified-Since": "Mon, 01 Jan 2024 12:00:00 GMT"}),
+    )
+
+    assert response.headers["last-modified"] == (
+        "Mon, 01 Jan 2024 12:00:00 GMT"
+    )
+    assert response.body == b"body"
+    assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
@@ -1,19 +1,29 @@
+import asyncio
 import sqlite3
 import uuid
-from unittest.mock import MagicMock, patch
+from contextlib import closing
+from unittest.mock import MagicMock
 
 import pytest
 
 from mood_diary.backend.config import config
+from mood_diary.backend.database.pool import SQLiteConnectionPool
 from mood_diary.backend.exceptions.user import InvalidOrExpiredAccessToken
-from mood_diary.backend.repositories.sqlite.user import SQLiteUserRepository
+from mood_diary.backend.repositories.sqlite.codecs import get_moodstamp_codec
+from mood_diary.backend.repositories.sqlite.user import (
+    PooledSQLiteUserRepository,
+    SQLiteUserRepository,
+)
+from mood_diary.backend.repositories.sсhemas.user import CreateUser
 from mood_diary.backend.repositories.user import UserRepository
 from mood_diary.backend.routes import dependencies
+from mood_diary.backend.services.mood import MoodService
 from mood_diary.backend.services.user import UserService
 from mood_diary.backend.utils.password_hasher import (
     PasswordHasher,
     SaltPasswordHasher,
 )
+from mood_diary.common.api.schemas.auth import LoginRequest
 from mood_diary.backend.utils.token_manager import (
     JWTTokenManager,
     TokenManager,
@@ -64,6 +74,21 @@ def test_get_password_hasher(monkeypatch):
     assert password_hasher.split_char == "#"
 
 
+def test_token_manager_and_password_hasher_are_shared(monkeypatch):
+    assert dependencies.get_token_manager() is (
+        dependencies.get_token_manager()
+    )
+    assert dependencies.get_password_hasher() is (
+        dependencies.get_password_hasher()
+    )
+
+    token_manager = dependencies.get_token_manager()
+    monkeypatch.setattr(config, "AUTH_TOKEN_VERIFIED_CACHE_SIZE", 1)
+
+    assert dependencies.get_token_manager() is not token_manager
+    assert dependencies.get_token_manager().verified.max_entries == 1
+
+
 def test_get_current_user_id_success():
     """Test successful user ID retrieval with valid token."""
     mock_token_manager = MagicMock(spec=TokenManager)
@@ -100,44 +125,45 @@ def test_get_current_user_id_invalid_token():
     mock_token_manager.decode_token.assert_called_once_with("invalid_token")
 
 
-def test_get_connection(monkeypatch):
-    """Test the get_connection generator yields and closes connection."""
-    monkeypatch.setattr(config, "SQLITE_DB_PATH", ":memory:")
+@pytest.mark.asyncio
+async def test_get_connection_returns_connection_to_pool():
+    """Test get_connection borrows a pooled connection and gives it back."""
+    pool = SQLiteConnectionPool(":memory:", size=1, acquire_timeout=0.1)
+    try:
+        conn_generator = dependencies.get_connection(pool=pool)
+        conn_instance = await conn_generator.__anext__()
 
-    mock_conn = MagicMock(spec=sqlite3.Connection)
+        assert isinstance(conn_instance, sqlite3.Connection)
+        assert pool._idle.empty()
 
-    with patch(
-        "mood_diary.backend.routes.dependencies.sqlite3.connect",
-        return_value=mock_conn,
-    ) as mock_connect:
-        conn_generator = dependencies.get_connection()
-        conn_instance = None
-        try:
-            conn_instance = next(conn_generator)
-
-            mock_connect.assert_called_once_with(
-                ":memory:", check_same_thread=False
-            )
+        with pytest.raises(StopAsyncIteration):
+            await conn_generator.__anext__()
+
+        assert await pool.acquire() is conn_instance
+    finally:
+        pool.close()
 
-            assert conn_instance is mock_conn
 
-            mock_conn.close.assert_not_called()
-        except Exception as e:
-            pytest.fail(f"Generator raised unexpected exception: {e}")
-        finally:
-            with pytest.raises(StopIteration):
-                next(conn_generator)
+def test_get_db_pool():
+    """Test get_db_pool returns the pool stored on the application."""
+    mock_pool = MagicMock(spec=SQLiteConnectionPool)
+    request = MagicMock()
+    request.app.state.db_pool = mock_pool
 
-            if conn_instance:
-                mock_conn.close.assert_called_once()
+    assert dependencies.get_db_pool(request) is mock_pool
 
 
 def test_get_user_repository():
     """Test get_user_repository creates SQLiteUserRepository with connection."""
     mock_conn = MagicMock(spec=sqlite3.Connection)
-    user_repo = dependencies.get_user_repository(conn=mock_conn)
+    mock_pool = MagicMock(spec=SQLiteConnectionPool)
+    mock_pool.executor = MagicMock()
+    user_repo = dependencies.get_user_repository(
+        conn=mock_conn, pool=mock_pool
+    )
     assert isinstance(user_repo, SQLiteUserRepository)
     assert user_repo.connection is mock_conn
+    assert user_repo.executor is mock_pool.executor
 
 
 def test_get_user_service():
@@ -154,3 +180,75 @@ def test_get_user_service():
     assert user_service.user_repository is mock_repo
     assert user_service.password_hasher is mock_hasher
     assert user_service.token_manager is mock_manager
+
+
+@pytest.mark.asyncio
+async def test_get_mood_service_factory_borrows_connection_when_opened():
+    """Test the mood service factory only holds a connection while open."""
+    pool = SQLiteConnectionPool(":memory:", size=1, acquire_timeout=0.1)
+    request = MagicMock()
+    request.app.state.moodstamp_codec = get_moodstamp_codec("text")
+    try:
+        open_service = dependencies.get_mood_service_factory(
+            request=request, pool=pool, writer=MagicMock()
+        )
+
+        async with open_service() as service:
+            assert isinstance(service, MoodService)
+            assert pool._idle.empty()
+            conn = service.moodstamp_repository.connection
+
+        assert await pool.acquire() is conn
+    finally:
+        pool.close()
+
+
+@pytest.mark.asyncio
+async def test_user_service_factory_holds_no_connection_while_hashing(
+    tmp_path,
+):
+    """Test a burst of logins leaves the pool's connections available."""
+    db_path = str(tmp_path / "users.db")
+    with closing(sqlite3.connect(db_path)) as conn:
+        SQLiteUserRepository(conn).init_db()
+    pool = SQLiteConnectionPool(db_path, size=1, acquire_timeout=0.1)
+    hashing, release = asyncio.Semaphore(0), asyncio.Event()
+
+    async def verify_async(password, stored_hash):
+        hashing.release()
+        await release.wait()
+        return True
+
+    password_hasher = MagicMock(spec=PasswordHasher)
+    password_hasher.verify_async.side_effect = verify_async
+    password_hasher.needs_rehash.return_value = False
+    token_manager = MagicMock(spec=TokenManager)
+    token_manager.create_token.return_value = "token"
+    open_service = dependencies.get_user_service_factory(
+        pool=pool,
+        password_hasher=password_hasher,
+        token_manager=token_manager,
+    )
+
+    async def login():
+        async with open_service() as service:
+            return await service.login(
+                LoginRequest(username="user", password="password")
+            )
+
+    try:
+        await PooledSQLiteUserRepository(pool).create(
+            CreateUser(username="user", hashed_password="hash", name="Name")
+        )
+        burst = [asyncio.create_task(login()) for _ in range(3)]
+        for _ in burst:
+            await asyncio.wait_for(hashing.acquire(), 1)
+
+        async with pool.connection() as conn:
+            assert isinstance(conn, sqlite3.Connection)
+
+        release.set()
+        responses = await asyncio.gather(*burst)
+        assert [r.access_token for r in responses] == ["token"] * 3
+    finally:
+        pool.close()
@@ -1,7 +1,11 @@
+import gzip
+import json
+import time
 import uuid
 from datetime import date, datetime, timezone
 from typing import Generator
-from unittest.mock import AsyncMock
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 from fastapi import FastAPI, status, Cookie
@@ -14,13 +18,30 @@ from mood_diary.backend.exceptions.mood import (
 )
 from mood_diary.backend.routes.dependencies import (
     get_mood_service,
+    get_mood_service_factory,
     get_current_user_id,
 )
-from mood_diary.backend.database.cache import get_redis_client
+from mood_diary.backend.config import config
+from mood_diary.backend.database.cache import (
+    NOT_FOUND,
+    CachedValue,
+    LocalCache,
+    TieredCache,
+    get_cache,
+    pack,
+    unpack,
+)
+from mood_diary.backend.database.cache_backends import RedisBackend
+from mood_diary.backend.repositories.sсhemas.mood import (
+    JSONMoodStampPage,
+    MoodStampsVersion,
+)
 from mood_diary.backend.services.mood import MoodService
 from mood_diary.common.api.schemas.mood import (
     CreateMoodStampRequest,
     GetManyMoodStampsRequest,
+    MoodStampPageResponse,
+    PartialMoodStampSchema,
     UpdateMoodStampRequest,
     MoodStampSchema,
 )
@@ -31,25 +52,61 @@ from mood_diary.backend.routes.mood import router as mood_router
 # --- Fixtures ---
 
 
+def json_page(page: MoodStampPageResponse) -> JSONMoodStampPage:
+    return JSONMoodStampPage(
+        content=page.model_dump_json(exclude_unset=True).encode(),
+        count=len(page.items),
+    )
+
+
 @pytest.fixture
 def mock_mood_service() -> AsyncMock:
-    return AsyncMock(spec=MoodService)
+    service = AsyncMock(spec=MoodService)
+    service.get_version.return_value = MoodStampsVersion(
+        count=0, updated_at=None
+    )
+    return service
 
 
 @pytest.fixture
-def mock_redis_client() -> AsyncMock:
+def mock_redis() -> AsyncMock:
     mock_redis = AsyncMock()
     mock_redis.get.return_value = None
     mock_redis.set.return_value = None
     mock_redis.delete.return_value = None
+    mock_redis.incr.return_value = 1
+    mock_redis.lock = MagicMock(return_value=AsyncMock())
+    mock_redis.mget.side_effect = lambda keys: [None] * len(keys)
+    pipeline = MagicMock()
+    pipeline.__aenter__.return_value = pipeline
+    pipeline.execute = AsyncMock()
+    pipeline.watch = AsyncMock()
+    pipeline.mget = AsyncMock(side_effect=lambda keys: [None] * len(keys))
+    mock_redis.pipeline = MagicMock(return_value=pipeline)
+    return mock_redis
 
-    async def mock_scan_iter(*args, **kwargs):
-        if False:
-            yield
-        return
 
-    mock_redis.scan_iter = mock_scan_iter
-    return mock_redis
+def assert_written_through(
+    mock_redis: AsyncMock, user_id: uuid.UUID, moodstamp: MoodStampSchema
+):
+    pipeline = mock_redis.pipeline.return_value
+    month_key = f"moodstamps_month:{user_id}:{moodstamp.date:%Y-%m}"
+    pipeline.watch.assert_awaited_once_with(month_key)
+    key, cached = pipeline.set.call_args[0]
+    assert key == f"moodstamp:{user_id}:{moodstamp.date}"
+    assert json.loads(unpack(cached)[2].payload) == moodstamp.model_dump(
+        mode="json"
+    )
+    pipeline.incr.assert_called_once_with(f"generation:moodstamps:{user_id}")
+    pipeline.execute.assert_awaited_once()
+    mock_redis.delete.assert_not_awaited()
+
+
+@pytest.fixture
+def cache(mock_redis: AsyncMock) -> TieredCache:
+    return TieredCache(
+        RedisBackend(mock_redis), LocalCache(16, 5.0), "invalidate"
+    )
 
 
 @pytest.fixture
@@ -62,7 +119,7 @@ def test_user_id() -> uuid.UUID:
 def main_app_mood(
     test_user_id: uuid.UUID,
     mock_mood_service: AsyncMock,
-    mock_redis_client: AsyncMock,
+    cache: TieredCache,
 ) -> Generator[FastAPI, None, None]:
     app = FastAPI()
     app.include_router(mood_router, prefix="/api/moods", tags=["moods"])
@@ -77,14 +134,24 @@ def main_app_mood(
     def override_get_mood_service() -> MoodService:
         return mock_mood_service
 
-    def override_get_redis_client():
-        return mock_redis_client
+    def override_get_mood_service_factory():
+        @asynccontextmanager
+        async def open_service():
+            yield mock_mood_service
+
+        return open_service
+
+    def override_get_cache():
+        return cache
 
     app.dependency_overrides[get_current_user_id] = (
         override_get_current_user_id
     )
     app.dependency_overrides[get_mood_service] = override_get_mood_service
-    app.dependency_overrides[get_redis_client] = override_get_redis_client
+    app.dependency_overrides[get_mood_service_factory] = (
+        override_get_mood_service_factory
+    )
+    app.dependency_overrides[get_cache] = override_get_cache
 
     yield app
 
@@ -131,6 +198,7 @@ def sample_mood_stamp_schema(sample_mood_stamp_data: dict) -> MoodStampSchema:
 def test_create_moodstamp_success(
     client_mood: TestClient,
     mock_mood_service: AsyncMock,
+    mock_redis: AsyncMock,
     test_user_id: uuid.UUID,
     sample_mood_stamp_schema: MoodStampSchema,
 ):
@@ -156,6 +224,7 @@ def test_create_moodstamp_success(
     assert isinstance(call_args["body"], CreateMoodStampRequest)
     assert call_args["body"].value == create_payload["value"]
     assert call_args["body"].note == create_payload["note"]
+    assert_written_through(mock_redis, test_user_id, sample_mood_stamp_schema)
 
 
 def test_create_moodstamp_already_exists(
@@ -200,6 +269,7 @@ def test_get_moodstamp_success(
 def test_get_moodstamp_not_found(
     client_mood: TestClient,
     mock_mood_service: AsyncMock,
+    mock_redis: AsyncMock,
     test_user_id: uuid.UUID,
 ):
     test_date = date.today()
@@ -212,6 +282,27 @@ def test_get_moodstamp_not_found(
     mock_mood_service.get.assert_awaited_once_with(
         user_id=test_user_id, date=test_date
     )
+    cache_key, cached = mock_redis.set.call_args[0]
+    assert cache_key == f"moodstamp:{test_user_id}:{test_date_str}"
+    assert unpack(cached)[2] == CachedValue(NOT_FOUND)
+    assert mock_redis.set.call_args[1] == {
+        "ex": config.CACHE_NOT_FOUND_TTL + config.CACHE_STALE_TTL
+    }
+
+
+def test_get_moodstamp_cached_not_found(
+    client_mood: TestClient,
+    mock_mood_service: AsyncMock,
+    mock_redis: AsyncMock,
+):
+    mock_redis.get.return_value = pack(
+        CachedValue(NOT_FOUND), time.time() + 10, 0.01
+    )
+
+    client_mood.cookies.set("access_token", "fake-test-token")
+    with pytest.raises(MoodStampNotExist):
+        client_mood.get(f"/api/moods/{date.today().isoformat()}")
+    mock_mood_service.get.assert_not_awaited()
 
 
 def test_get_many_moodstamps_success_no_filters(
@@ -220,56 +311,328 @@ def test_get_many_moodstamps_success_no_filters(
     test_user_id: uuid.UUID,
     sample_mood_stamp_schema: MoodStampSchema,
 ):
-    mock_mood_service.get_many.return_value = [sample_mood_stamp_schema]
+    mock_mood_service.get_many_json.return_value = json_page(
+        MoodStampPageResponse(
+            items=[sample_mood_stamp_schema], next_cursor=None
+        )
+    )
 
     client_mood.cookies.set("access_token", "fake-test-token")
     response = client_mood.get("/api/moods/")
 
     assert response.status_code == status.HTTP_200_OK
-    assert response.json() == [
-        sample_mood_stamp_schema.model_dump(mode="json")
-    ]
-    mock_mood_service.get_many.assert_awaited_once()
-    call_args = mock_mood_service.get_many.call_args[1]
+    assert response.json() == {
+        "items": [sample_mood_stamp_schema.model_dump(mode="json")],
+        "next_cursor": None,
+    }
+    mock_mood_service.get_many_json.assert_awaited_once()
+    call_args = mock_mood_service.get_many_json.call_args[1]
     assert call_args["user_id"] == test_user_id
     assert isinstance(call_args["body"], GetManyMoodStampsRequest)
     assert call_args["body"].start_date is None
     assert call_args["body"].end_date is None
     assert call_args["body"].value is None
+    assert call_args["body"].limit == 100
+    assert call_args["body"].cursor is None
+    assert call_args["body"].order == "desc"
+
+
+def test_get_many_moodstamps_caches_empty_page_briefly(
+    client_mood: TestClient,
+    mock_mood_service: AsyncMock,
+    mock_redis: AsyncMock,
+):
+    mock_mood_service.get_many_json.return_value = json_page(
+        MoodStampPageResponse(items=[], next_cursor=None)
+    )
+
+    client_mood.cookies.set("access_token", "fake-test-token")
+    response = client_mood.get("/api/moods/")
+
+    assert response.json() == {"items": [], "next_cursor": None}
+    cached = mock_redis.set.call_args[0][1]
+    assert json.loads(unpack(cached)[2].payload) == response.json()
+    assert mock_redis.set.call_args[1] == {
+        "ex": config.CACHE_EMPTY_TTL + config.CACHE_STALE_TTL
+    }
 
 
 def test_get_many_moodstamps_success_with_filters(
     client_mood: TestClient,
     mock_mood_service: AsyncMock,
+    mock_redis: AsyncMock,
     test_user_id: uuid.UUID,
-    sample_mood_stamp_schema: MoodStampSchema,
+    sample_mood_stamp_data: dict,
 ):
-    mock_mood_service.get_many.return_value = [sample_mood_stamp_schema]
-    start_date_str = "2023-01-01"
-    end_date_str = "2023-12-31"
-    value_filter = 5
+    months = [f"2023-{m:02d}" for m in range(1, 13)]
+    matching = {**sample_mood_stamp_data, "date": "2023-03-05", "value": 5}
+    other = {**sample_mood_stamp_data, "date": "2023-03-06", "value": 2}
+    mock_mood_service.get_months_json.return_value = {
+        month: json.dumps(
+            [matching, other] if month == "2023-03" else []
+        ).encode()
+        for month in months
+    }
 
     client_mood.cookies.set("access_token", "fake-test-token")
     response = client_mood.get(
-        f"/api/moods/?start_date={start_date_str}&end_date={end_date_str}&value={value_filter}"
+        "/api/moods/?start_date=2023-01-01&end_date=2023-12-31&value=5"
     )
 
     assert response.status_code == status.HTTP_200_OK
-    assert response.json() == [
-        sample_mood_stamp_schema.model_dump(mode="json")
+    assert response.json() == {"items": [matching], "next_cursor": None}
+    # The generation the version is read under, then the months with it
+    generation = f"generation:moodstamps:{test_user_id}"
+    assert [call.args[0] for call in mock_redis.mget.await_args_list] == [
+        [generation],
+        [
+            generation,
+            *(f"moodstamps_month:{test_user_id}:{m}" for m in months),
+        ],
+    ]
+    mock_mood_service.get_months_json.assert_awaited_once_with(
+        user_id=test_user_id, first="2023-01", last="2023-12"
+    )
+    mock_mood_service.get_many_json.assert_not_awaited()
+    pipeline = mock_redis.pipeline.return_value
+    assert pipeline.set.call_count == 12
+    assert pipeline.set.call_args[1] == {"ex": config.CACHE_MONTH_BLOCK_TTL}
+    pipeline.delete.assert_not_called()
+
+
+def test_month_blocks_loaded_before_a_write_are_not_kept(
+    client_mood: TestClient,
+    mock_mood_service: AsyncMock,
+    mock_redis: AsyncMock,
+    test_user_id: uuid.UUID,
+):
+    generation = f"generation:moodstamps:{test_user_id}"
+    month_key = f"moodstamps_month:{test_user_id}:2024-02"
+
+    async def get_months_json(**kwargs):
+        # A write commits and bumps the generation meanwhile
+        mock_redis.get.side_effect = lambda key: (
+            b"1" if key == generation else None
+        )
+        return {"2024-02": b"[]"}
+
+    mock_mood_service.get_months_json.side_effect = get_months_json
+
+    client_mood.cookies.set("access_token", "fake-test-token")
+    response = client_mood.get(
+        "/api/moods/?start_date=2024-02-01&end_date=2024-02-29"
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    pipeline = mock_redis.pipeline.return_value
+    pipeline.set.assert_called_once()
+    assert pipeline.set.call_args[0][0] == month_key
+    pipeline.delete.assert_called_once_with(month_key)
+
+
+def test_get_many_moodstamps_from_cached_month_blocks(
+    client_mood: TestClient,
+    mock_mood_service: AsyncMock,
+    mock_redis: AsyncMock,
+    test_user_id: uuid.UUID,
+    sample_mood_stamp_data: dict,
+):
+    january = {**sample_mood_stamp_data, "date": "2024-01-31"}
+    march = {**sample_mood_stamp_data, "date": "2024-03-01"}
+    cached = {
+        f"moodstamps_month:{test_user_id}:2024-01": json.dumps([january]),
+        f"moodstamps_month:{test_user_id}:2024-03": json.dumps([march]),
+    }
+    mock_redis.mget.side_effect = lambda keys: [
+        cached[key].encode() if key in cached else None for key in keys
+    ]
+    mock_mood_service.get_months_json.return_value = {"2024-02": b"[]"}
+
+    client_mood.cookies.set("access_token", "fake-test-token")
+    response = client_mood.get(
+        "/api/moods/?start_date=2024-01-15&end_date=2024-03-15&limit=1"
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    page = response.json()
+    assert page["items"] == [march]
+    assert page["next_cursor"] is not None
+    # Only the missing month is read
+    mock_mood_service.get_months_json.assert_awaited_once_with(
+        user_id=test_user_id, first="2024-02", last="2024-02"
+    )
+
+    mock_mood_service.get_months_json.reset_mock()
+    cached[f"moodstamps_month:{test_user_id}:2024-02"] = "[]"
+    response = client_mood.get(
+        "/api/moods/?start_date=2024-01-15&end_date=2024-03-15"
+        f"&limit=1&cursor={page['next_cursor']}"
+    )
+
+    assert response.json() == {"items": [january], "next_cursor": None}
+    mock_mood_service.get_months_json.assert_not_awaited()
+
+
+def test_get_many_moodstamps_long_ranges_are_queried(
+    client_mood: TestClient,
+    mock_mood_service: AsyncMock,
+    mock_redis: AsyncMock,
+):
+    mock_mood_service.get_many_json.return_value = json_page(
+        MoodStampPageResponse(items=[], next_cursor=None)
+    )
+
+    client_mood.cookies.set("access_token", "fake-test-token")
+    response = client_mood.get(
+        "/api/moods/?start_date=2000-01-01&end_date=2023-12-31"
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    mock_mood_service.get_many_json.assert_awaited_once()
+    mock_mood_service.get_months_json.assert_not_awaited()
+
+
+def test_get_many_moodstamps_page_params(
+    client_mood: TestClient,
+    mock_mood_service: AsyncMock,
+    mock_redis: AsyncMock,
+    test_user_id: uuid.UUID,
+    sample_mood_stamp_schema: MoodStampSchema,
+):
+    mock_mood_service.get_many_json.return_value = json_page(
+        MoodStampPageResponse(
+            items=[sample_mood_stamp_schema], next_cursor="next"
+        )
+    )
+
+    client_mood.cookies.set("access_token", "fake-test-token")
+    response = client_mood.get("/api/moods/?limit=10&cursor=abc&order=asc")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["next_cursor"] == "next"
+    body = mock_mood_service.get_many_json.call_args[1]["body"]
+    assert (body.limit, body.cursor, body.order) == (10, "abc", "asc")
+    cache_key = mock_redis.set.call_args[0][0]
+    assert '"cursor": "abc"' in cache_key
+    assert '"limit": 10' in cache_key
+    assert '"order": "asc"' in cache_key
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=1001", "order=sideways"])
+def test_get_many_moodstamps_invalid_page_params(
+    client_mood: TestClient, mock_mood_service: AsyncMock, query: str
+):
+    client_mood.cookies.set("access_token", "fake-test-token")
+    response = client_mood.get(f"/api/moods/?{query}")
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    mock_mood_service.get_many_json.assert_not_awaited()
+
+
+def test_get_many_moodstamps_projection(
+    client_mood: TestClient,
+    mock_mood_service: AsyncMock,
+    mock_redis: AsyncMock,
+):
+    mock_mood_service.get_many_json.return_value = json_page(
+        MoodStampPageResponse(
+            items=[PartialMoodStampSchema(date=date(2024, 1, 1), value=5)],
+            next_cursor=None,
+        )
+    )
+
+    client_mood.cookies.set("access_token", "fake-test-token")
+    response = client_mood.get("/api/moods/?fields=value,date,value")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "items": [{"date": "2024-01-01", "value": 5}],
+        "next_cursor": None,
+    }
+    body = mock_mood_service.get_many_json.call_args[1]["body"]
+    assert body.fields == ["date", "value"]
+    cache_key, cached = mock_redis.set.call_args[0]
+    assert '"fields": ["date", "value"]' in cache_key
+    assert json.loads(unpack(cached)[2].payload) == response.json()
+
+
+@pytest.mark.parametrize("fields", ["", "value,", "value,password"])
+def test_get_many_moodstamps_invalid_projection(
+    client_mood: TestClient, mock_mood_service: AsyncMock, fields: str
+):
+    client_mood.cookies.set("access_token", "fake-test-token")
+    response = client_mood.get(f"/api/moods/?fields={fields}")
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    mock_mood_service.get_many_json.assert_not_awaited()
+
+
+def test_get_many_moodstamps_cache_hit(
+    client_mood: TestClient,
+    mock_mood_service: AsyncMock,
+    mock_redis: AsyncMock,
+    test_user_id: uuid.UUID,
+    sample_mood_stamp_schema: MoodStampSchema,
+):
+    page = MoodStampPageResponse(
+        items=[sample_mood_stamp_schema], next_cursor="next"
+    )
+    generation_key = f"generation:moodstamps:{test_user_id}"
+    mock_redis.mget.side_effect = lambda keys: [
+        b"3" if key == generation_key else None for key in keys
     ]
-    mock_mood_service.get_many.assert_awaited_once()
-    call_args = mock_mood_service.get_many.call_args[1]
-    assert call_args["user_id"] == test_user_id
-    assert isinstance(call_args["body"], GetManyMoodStampsRequest)
-    assert call_args["body"].start_date == date.fromisoformat(start_date_str)
-    assert call_args["body"].end_date == date.fromisoformat(end_date_str)
-    assert call_args["body"].value == value_filter
+
+    async def get(key: str):
+        if key.startswith(f"moodstamps:{test_user_id}:") and key.endswith(
+            ":3"
+        ):
+            return pack(
+                CachedValue(page.model_dump_json().encode()),
+                time.time() + 60,
+                0.01,
+            )
+        return None
+
+    mock_redis.get.side_effect = get
+
+    client_mood.cookies.set("access_token", "fake-test-token")
+    response = client_mood.get("/api/moods/")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == page.model_dump(mode="json")
+    mock_mood_service.get_many_json.assert_not_awaited()
+
+
+def test_get_many_moodstamps_cache_key_has_generation(
+    client_mood: TestClient,
+    mock_mood_service: AsyncMock,
+    mock_redis: AsyncMock,
+    test_user_id: uuid.UUID,
+    sample_mood_stamp_schema: MoodStampSchema,
+):
+    mock_mood_service.get_many_json.return_value = json_page(
+        MoodStampPageResponse(
+            items=[sample_mood_stamp_schema], next_cursor=None
+        )
+    )
+    mock_redis.mget.side_effect = lambda keys: [
+        b"7" if key == f"generation:moodstamps:{test_user_id}" else None
+        for key in keys
+    ]
+
+    client_mood.cookies.set("access_token", "fake-test-token")
+    response = client_mood.get("/api/moods/")
+
+    assert response.status_code == status.HTTP_200_OK
+    cache_key = mock_redis.set.call_args[0][0]
+    assert cache_key.startswith(f"moodstamps:{test_user_id}:")
+    assert cache_key.endswith(":7")
 
 
 def test_update_moodstamp_success(
     client_mood: TestClient,
     mock_mood_service: AsyncMock,
+    mock_redis: AsyncMock,
     test_user_id: uuid.UUID,
     sample_mood_stamp_schema: MoodStampSchema,
 ):
@@ -294,6 +657,37 @@ def test_update_moodstamp_success(
     assert isinstance(call_args["body"], UpdateMoodStampRequest)
     assert call_args["body"].value == update_payload["value"]
     assert call_args["body"].note == update_payload["note"]
+    assert_written_through(mock_redis, test_user_id, updated_schema)
+
+
+def test_update_moodstamp_patches_cached_month(
+    client_mood: TestClient,
+    mock_mood_service: AsyncMock,
+    mock_redis: AsyncMock,
+    test_user_id: uuid.UUID,
+    sample_mood_stamp_data: dict,
+):
+    first = {**sample_mood_stamp_data, "date": "2024-05-01", "value": 1}
+    second = {**sample_mood_stamp_data, "date": "2024-05-02", "value": 2}
+    updated = {**first, "value": 9}
+    mock_mood_service.update.return_value = MoodStampSchema(**updated)
+    pipeline = mock_redis.pipeline.return_value
+    pipeline.mget.side_effect = None
+    pipeline.mget.return_value = [json.dumps([first, second]).encode()]
+
+    client_mood.cookies.set("access_token", "fake-test-token")
+    response = client_mood.put("/api/moods/2024-05-01", json={"value": 9})
+
+    assert response.status_code == status.HTTP_200_OK
+    blocks = {
+        call[0][0]: call[0][1]
+        for call in pipeline.set.call_args_list
+        if call[0][0].startswith("moodstamps_month:")
+    }
+    assert json.loads(blocks[f"moodstamps_month:{test_user_id}:2024-05"]) == [
+        updated,
+        second,
+    ]
 
 
 def test_update_moodstamp_not_found(
@@ -357,6 +751,7 @@ def test_update_moodstamp_validation_error(
 def test_delete_moodstamp_success(
     client_mood: TestClient,
     mock_mood_service: AsyncMock,
+    mock_redis: AsyncMock,
     test_user_id: uuid.UUID,
     sample_mood_stamp_schema: MoodStampSchema,
 ):
@@ -371,6 +766,15 @@ def test_delete_moodstamp_success(
     mock_mood_service.delete.assert_awaited_once_with(
         user_id=test_user_id, date=test_date
     )
+    pipeline = mock_redis.pipeline.return_value
+    pipeline.delete.assert_called_once_with(
+        f"moodstamp:{test_user_id}:{test_date_str}",
+        f"moodstamps_month:{test_user_id}:{test_date_str[:7]}",
+    )
+    pipeline.incr.assert_called_once_with(
+        f"generation:moodstamps:{test_user_id}"
+    )
+    pipeline.execute.assert_awaited_once()
 
 
 def test_delete_moodstamp_not_found(
@@ -388,3 +792,111 @@ def test_delete_moodstamp_not_found(
     mock_mood_service.delete.assert_awaited_once_with(
         user_id=test_user_id, date=test_date
     )
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, content_encoding",
+    [("gzip, br", "gzip"), ("identity", None)],
+)
+def test_get_moodstamp_cache_hit_compressed(
+    client_mood: TestClient,
+    mock_mood_service: AsyncMock,
+    mock_redis: AsyncMock,
+    sample_mood_stamp_schema: MoodStampSchema,
+    accept_encoding: str,
+    content_encoding: str | None,
+):
+    body = sample_mood_stamp_schema.model_dump_json().encode()
+    mock_redis.get.return_value = pack(
+        CachedValue(gzip.compress(body), "gzip"), time.time() + 60, 0.01
+    )
+
+    client_mood.cookies.set("access_token", "fake-test-token")
+    response = client_mood.get(
+        f"/api/moods/{sample_mood_stamp_schema.date.isoformat()}",
+        headers={"Accept-Encoding": accept_encoding},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers.get("content-encoding") == content_encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.content == body
+    mock_mood_service.get.assert_not_awaited()
+
+
+def test_get_moodstamp_not_modified(
+    client_mood: TestClient,
+    mock_mood_service: AsyncMock,
+    sample_mood_stamp_schema: MoodStampSchema,
+):
+    mock_mood_service.get.return_value = sample_mood_stamp_schema
+    url = f"/api/moods/{sample_mood_stamp_schema.date.isoformat()}"
+
+    client_mood.cookies.set("access_token", "fake-test-token")
+    response = client_mood.get(url)
+    etag = response.headers["etag"]
+    last_modified = response.headers["last-modified"]
+    assert response.headers["cache-control"] == "private, no-cache"
+
+    by_etag = client_mood.get(url, headers={"If-None-Match": etag})
+    by_date = client_mood.get(
+        url, headers={"If-Modified-Since": last_modified}
+    )
+    stale = client_mood.get(
+        url,
+        headers={
+            "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT",
+        },
+    )
+
+    assert by_etag.status_code == status.HTTP_304_NOT_MODIFIED
+    assert by_etag.content == b""
+    assert by_etag.headers["etag"] == etag
+    assert by_date.status_code == status.HTTP_304_NOT_MODIFIED
+    assert stale.status_code == status.HTTP_200_OK
+    assert stale.headers["etag"] == etag
+
+
+def test_get_many_moodstamps_not_modified(
+    client_mood: TestClient,
+    mock_mood_service: AsyncMock,
+    mock_redis: AsyncMock,
+    test_user_id: uuid.UUID,
+    sample_mood_stamp_schema: MoodStampSchema,
+):
+    mock_mood_service.get_many_json.return_value = json_page(
+        MoodStampPageResponse(
+            items=[sample_mood_stamp_schema], next_cursor=None
+        )
+    )
+    mock_mood_service.get_version.return_value = MoodStampsVersion(
+        count=1, updated_at=sample_mood_stamp_schema.updated_at
+    )
+
+    client_mood.cookies.set("access_token", "fake-test-token")
+    response = client_mood.get("/api/moods/")
+    etag = response.headers["etag"]
+    not_modified = client_mood.get(
+        "/api/moods/", headers={"If-None-Match": f'W/{etag}, "other"'}
+    )
+    other_query = client_mood.get(
+        "/api/moods/?limit=1", headers={"If-None-Match": etag}
+    )
+
+    assert "last-modified" not in response.headers
+    assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+    assert other_query.status_code == status.HTTP_200_OK
+    assert other_query.headers["etag"] != etag
+    # Answered before the page is loaded
+    assert mock_mood_service.get_many_json.await_count == 2
+    mock_mood_service.get_version.assert_awaited_with(user_id=test_user_id)
+
+    # A write bumps the generation the version is cached under
+    mock_redis.mget.side_effect = lambda keys: [b"1"] * len(keys)
+    mock_mood_service.get_version.return_value = MoodStampsVersion(
+        count=0, updated_at=None
+    )
+    changed = client_mood.get("/api/moods/", headers={"If-None-Match": etag})
+
+    assert changed.status_code == status.HTTP_200_OK
+    assert changed.headers["etag"] != etag
@@ -0,0 +1,255 @@
+import json
+from contextlib import asynccontextmanager
+from datetime import UTC, date, datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from pydantic import BaseModel
+
+from mood_diary.backend.database.cache import (
+    NOT_FOUND,
+    CachedValue,
+    LocalCache,
+    TieredCache,
+    unpack,
+)
+from mood_diary.backend.database.cache_backends import RedisBackend
+from mood_diary.backend.exceptions.mood import MoodStampNotExist
+from mood_diary.backend.services.cached import (
+    CachedService,
+    CacheRule,
+    Invalidates,
+    ReadThrough,
+    WriteThrough,
+    format_key,
+)
+
+
+class Item(BaseModel):
+    day: date
+    value: int
+    updated_at: datetime | None = None
+
+
+class Query(BaseModel):
+    value: int | None = None
+
+
+class ItemService:
+    async def get(self, owner: str, day: date) -> Item:
+        raise NotImplementedError
+
+    async def find(self, owner: str, query: Query) -> list[Item]:
+        raise NotImplementedError
+
+    async def put(self, owner: str, item: Item) -> Item:
+        raise NotImplementedError
+
+    async def remove(self, owner: str, day: date) -> None:
+        raise NotImplementedError
+
+
+class CachedItemService(CachedService[ItemService]):
+    service_class = ItemService
+
+    get = ReadThrough(
+        "item:{owner}:{day}",
+        ttl=60,
+        not_found=MoodStampNotExist,
+        not_found_ttl=5,
+        modified=("updated_at",),
+    )
+    find = ReadThrough(
+        "items:{owner}:{query}",
+        ttl=60,
+        serialize=lambda items: json.dumps(
+            [item.model_dump(mode="json") for item in items]
+        ).encode(),
+        tags=("items:{owner}",),
+        empty_ttl=10,
+        is_empty=lambda items: not items,
+    )
+    put = WriteThrough(
+        "item:{owner}:{day}",
+        ttl=60,
+        patches={"month:{owner}:{day:%Y-%m}": (lambda old, new: new, 300)},
+        tags=("items:{owner}",),
+    )
+    remove = Invalidates(keys=("item:{owner}:{day}",), tags=("items:{owner}",))
+
+
+@pytest.fixture
+def redis() -> AsyncMock:
+    redis = AsyncMock()
+    redis.get.return_value = None
+    redis.mget.side_effect = lambda keys: [None] * len(keys)
+    redis.lock = MagicMock(return_value=AsyncMock())
+    redis.lock.return_value.acquire.return_value = True
+    pipeline = MagicMock()
+    pipeline.__aenter__.return_value = pipeline
+    pipeline.watch = AsyncMock()
+    pipeline.mget = AsyncMock(return_value=[b"old"])
+    pipeline.execute = AsyncMock()
+    redis.pipeline = MagicMock(return_value=pipeline)
+    return redis
+
+
+@pytest.fixture
+def service() -> AsyncMock:
+    return AsyncMock(spec=ItemService)
+
+
+@pytest.fixture
+def opened() -> list:
+    return []
+
+
+@pytest.fixture
+def items(
+    redis: AsyncMock, service: AsyncMock, opened: list
+) -> CachedItemService:
+    @asynccontextmanager
+    async def open_service():
+        opened.append(service)
+        yield service
+
+    return CachedItemService(
+        open_service,
+        TieredCache(RedisBackend(redis), LocalCache(16, 5.0), "invalidate"),
+    )
+
+
+def test_format_key_renders_models_as_json():
+    assert (
+        format_key(
+            "k:{a}:{b}:{day:%Y-%m}",
+            {"a": 1, "b": Query(value=2), "day": date(2024, 5, 1)},
+        )
+        == 'k:1:{"value": 2}:2024-05'
+    )
+
+
+def test_rule_without_call_cannot_be_created():
+    class Incomplete(CacheRule):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+@pytest.mark.asyncio
+async def test_read_through_opens_service_only_on_miss(
+    items: CachedItemService,
+    redis: AsyncMock,
+    service: AsyncMock,
+    opened: list,
+):
+    item = Item(day=date(2024, 5, 1), value=3)
+    service.get.return_value = item
+
+    value = await items.get("me", date(2024, 5, 1))
+
+    assert value == CachedValue(item.model_dump_json().encode())
+    service.get.assert_awaited_once_with("me", date(2024, 5, 1))
+    key, cached = redis.set.call_args[0]
+    assert key == "item:me:2024-05-01"
+    assert unpack(cached)[2] == value
+
+    redis.get.return_value = cached
+    assert await items.get(owner="me", day=date(2024, 5, 1)) == value
+    assert len(opened) == 1
+    calls = items.cache.stats().calls["ItemService.get"]
+    assert (calls.hits, calls.misses) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_read_through_caches_last_modified(
+    items: CachedItemService, redis: AsyncMock, service: AsyncMock
+):
+    updated_at = datetime(2024, 5, 1, 12, 30, tzinfo=UTC)
+    service.get.return_value = Item(
+        day=date(2024, 5, 1), value=3, updated_at=updated_at
+    )
+
+    value = await items.get("me", date(2024, 5, 1))
+
+    assert value.last_modified == updated_at.timestamp()
+    redis.get.return_value = redis.set.call_args[0][1]
+    assert await items.get("me", date(2024, 5, 1)) == value
+
+
+@pytest.mark.asyncio
+async def test_read_through_caches_not_found(
+    items: CachedItemService, redis: AsyncMock, service: AsyncMock
+):
+    service.get.side_effect = MoodStampNotExist()
+
+    with pytest.raises(MoodStampNotExist):
+        await items.get("me", date(2024, 5, 1))
+
+    key, cached = redis.set.call_args[0]
+    assert unpack(cached)[2].payload == NOT_FOUND
+    assert redis.set.call_args[1] == {"ex": 5 + 60}
+
+
+@pytest.mark.asyncio
+async def test_read_through_keys_carry_tag_generations(
+    items: CachedItemService, redis: AsyncMock, service: AsyncMock
+):
+    redis.mget.side_effect = lambda keys: [b"4"]
+    service.find.return_value = []
+
+    value = await items.find("me", Query(value=2))
+
+    assert value == CachedValue(b"[]")
+    redis.mget.assert_awaited_once_with(["generation:items:me"])
+    key = redis.set.call_args[0][0]
+    assert key == 'items:me:{"value": 2}:4'
+    assert redis.set.call_args[1] == {"ex": 10 + 60}
+
+
+@pytest.mark.asyncio
+async def test_write_through_caches_result(
+    items: CachedItemService, redis: AsyncMock, service: AsyncMock
+):
+    item = Item(day=date(2024, 5, 1), value=3)
+    service.put.return_value = item
+
+    assert await items.put("me", item) == item
+
+    pipeline = redis.pipeline.return_value
+    pipeline.watch.assert_awaited_once_with("month:me:2024-05")
+    (patch_call, value_call) = pipeline.set.call_args_list
+    assert patch_call == (
+        ("month:me:2024-05", item.model_dump_json().encode()),
+        {"ex": 300},
+    )
+    assert value_call[0][0] == "item:me:2024-05-01"
+    assert unpack(value_call[0][1])[2] == CachedValue(
+        item.model_dump_json().encode()
+    )
+    pipeline.incr.assert_called_once_with("generation:items:me")
+
+
+@pytest.mark.asyncio
+async def test_invalidates_after_call(
+    items: CachedItemService, redis: AsyncMock, service: AsyncMock
+):
+    await items.remove("me", day=date(2024, 5, 1))
+
+    service.remove.assert_awaited_once_with("me", day=date(2024, 5, 1))
+    pipeline = redis.pipeline.return_value
+    pipeline.delete.assert_called_once_with("item:me:2024-05-01")
+    pipeline.incr.assert_called_once_with("generation:items:me")
+
+
+@pytest.mark.asyncio
+async def test_failed_writes_leave_cache_alone(
+    items: CachedItemService, redis: AsyncMock, service: AsyncMock
+):
+    service.remove.side_effect = MoodStampNotExist()
+
+    with pytest.raises(MoodStampNotExist):
+        await items.remove("me", date(2024, 5, 1))
+
+    redis.pipeline.assert_not_called()
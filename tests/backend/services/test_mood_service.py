@@ -1,3 +1,5 @@
+import json
+import sqlite3
 import uuid
 from datetime import datetime
 from sqlite3 import Date
@@ -6,6 +8,7 @@ from unittest.mock import AsyncMock
 import pytest
 
 from mood_diary.backend.exceptions.mood import (
+    InvalidMoodStampCursor,
     MoodStampNotExist,
     MoodStampAlreadyExists,
     MoodStampAlreadyExistsErrorRepo,
@@ -14,9 +17,21 @@ from mood_diary.backend.repositories.sсhemas.mood import (
     MoodStamp,
     CreateMoodStamp,
     UpdateMoodStamp,
+    JSONMoodStampRows,
     MoodStampFilter,
+    PartialMoodStamp,
+)
+from mood_diary.backend.repositories.sqlite.codecs import get_moodstamp_codec
+from mood_diary.backend.repositories.sqlite.mood import SQLiteMoodRepository
+from mood_diary.backend.services.mood import (
+    MoodService,
+    decode_cursor,
+    encode_cursor,
+    month_bounds,
+    months_between,
+    page_from_month_blocks,
+    patch_month_block,
 )
-from mood_diary.backend.services.mood import MoodService
 from mood_diary.common.api.schemas.mood import (
     CreateMoodStampRequest,
     UpdateMoodStampRequest,
@@ -204,11 +219,234 @@ async def test_get_many_moodstamps_success(
     mock_moodstamp_repository.get_many.assert_awaited_once_with(
         user_id=sample_moodstamp.user_id,
         body=MoodStampFilter(
-            start_date=Date(2025, 1, 1), end_date=Date(2025, 1, 31), value=None
+            start_date=Date(2025, 1, 1),
+            end_date=Date(2025, 1, 31),
+            value=None,
+            limit=101,
+        ),
+    )
+    assert len(result.items) == 1
+    assert result.items[0].id == sample_moodstamp.id
+    assert result.next_cursor is None
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+@pytest.mark.asyncio
+async def test_get_many_moodstamps_pages_by_cursor(
+    mood_service, mock_moodstamp_repository, sample_moodstamp, order
+):
+    moodstamps = [
+        sample_moodstamp.model_copy(update={"date": Date(2025, 1, day)})
+        for day in (1, 2, 3)
+    ]
+    mock_moodstamp_repository.get_many.return_value = moodstamps
+
+    first = await mood_service.get_many(
+        sample_moodstamp.user_id,
+        GetManyMoodStampsRequest(limit=2, order=order),
+    )
+
+    assert first.items == moodstamps[:2]
+    assert first.next_cursor is not None
+    assert decode_cursor(first.next_cursor, order) == Date(2025, 1, 2)
+
+    mock_moodstamp_repository.get_many.return_value = moodstamps[2:]
+    second = await mood_service.get_many(
+        sample_moodstamp.user_id,
+        GetManyMoodStampsRequest(
+            limit=2, cursor=first.next_cursor, order=order
         ),
     )
-    assert len(result) == 1
-    assert result[0].id == sample_moodstamp.id
+
+    body = mock_moodstamp_repository.get_many.call_args[1]["body"]
+    assert (body.after, body.limit, body.order) == (Date(2025, 1, 2), 3, order)
+    assert second.items == moodstamps[2:]
+    assert second.next_cursor is None
+
+
+@pytest.mark.asyncio
+async def test_get_many_moodstamps_projection(
+    mood_service, mock_moodstamp_repository
+):
+    partial = PartialMoodStamp(date=Date(2025, 1, 1), value=5)
+    mock_moodstamp_repository.get_many.return_value = [partial]
+
+    result = await mood_service.get_many(
+        uuid.uuid4(), GetManyMoodStampsRequest(fields=["value"])
+    )
+
+    body = mock_moodstamp_repository.get_many.call_args[1]["body"]
+    assert body.fields == ["value"]
+    assert result.items == [partial]
+    assert result.items[0].model_fields_set == {"date", "value"}
+
+
+@pytest.mark.asyncio
+async def test_get_many_moodstamps_json(
+    mood_service, mock_moodstamp_repository
+):
+    mock_moodstamp_repository.get_many_json.return_value = JSONMoodStampRows(
+        items=b'[{"date":"2025-01-02"},{"date":"2025-01-01"}]',
+        count=2,
+        has_more=True,
+        last_date=Date(2025, 1, 1),
+    )
+
+    page = await mood_service.get_many_json(
+        uuid.uuid4(), GetManyMoodStampsRequest(limit=2, fields=["date"])
+    )
+
+    body = mock_moodstamp_repository.get_many_json.call_args[1]["body"]
+    assert (body.limit, body.fields) == (2, ["date"])
+    assert page.count == 2
+    document = json.loads(page.content)
+    assert document["items"] == [
+        {"date": "2025-01-02"},
+        {"date": "2025-01-01"},
+    ]
+    assert decode_cursor(document["next_cursor"], "desc") == Date(2025, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_get_many_moodstamps_json_last_page(
+    mood_service, mock_moodstamp_repository
+):
+    mock_moodstamp_repository.get_many_json.return_value = JSONMoodStampRows(
+        items=b"[]", count=0, has_more=False, last_date=None
+    )
+
+    page = await mood_service.get_many_json(
+        uuid.uuid4(), GetManyMoodStampsRequest()
+    )
+
+    assert page.content == b'{"items":[],"next_cursor":null}'
+    assert page.count == 0
+
+
+def test_months_between():
+    assert months_between(Date(2024, 11, 30), Date(2025, 2, 1)) == [
+        "2024-11",
+        "2024-12",
+        "2025-01",
+        "2025-02",
+    ]
+    assert months_between(Date(2024, 3, 1), Date(2024, 3, 31)) == ["2024-03"]
+    assert month_bounds("2024-02") == (Date(2024, 2, 1), Date(2024, 2, 29))
+
+
+@pytest.mark.asyncio
+async def test_get_months_json(mood_service, mock_moodstamp_repository):
+    mock_moodstamp_repository.get_many_json.return_value = JSONMoodStampRows(
+        items=b'[{"date":"2024-12-31"},{"date":"2025-02-01"}]',
+        count=2,
+        has_more=False,
+        last_date=None,
+    )
+
+    blocks = await mood_service.get_months_json(
+        uuid.uuid4(), "2024-12", "2025-02"
+    )
+
+    body = mock_moodstamp_repository.get_many_json.call_args[1]["body"]
+    assert (body.start_date, body.end_date) == (
+        Date(2024, 12, 1),
+        Date(2025, 2, 28),
+    )
+    assert (body.order, body.limit) == ("asc", None)
+    assert blocks == {
+        "2024-12": b'[{"date":"2024-12-31"}]',
+        "2025-01": b"[]",
+        "2025-02": b'[{"date":"2025-02-01"}]',
+    }
+
+
+def test_patch_month_block():
+    block = (
+        b'[{"date":"2024-05-01","value":1},{"date":"2024-05-03","value":3}]'
+    )
+
+    block = patch_month_block(block, b'{"date":"2024-05-02","value":2}')
+    block = patch_month_block(block, b'{"date":"2024-05-03","value":9}')
+
+    assert json.loads(block) == [
+        {"date": "2024-05-01", "value": 1},
+        {"date": "2024-05-02", "value": 2},
+        {"date": "2024-05-03", "value": 9},
+    ]
+
+
+@pytest.fixture(params=["text", "compact"])
+def sqlite_mood_service(request):
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    repo = SQLiteMoodRepository(conn, codec=get_moodstamp_codec(request.param))
+    repo.init_db()
+    yield MoodService(moodstamp_repository=repo)
+    conn.close()
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        GetManyMoodStampsRequest(
+            start_date=Date(2024, 1, 20), end_date=Date(2024, 3, 10)
+        ),
+        GetManyMoodStampsRequest(
+            start_date=Date(2024, 1, 1),
+            end_date=Date(2024, 3, 31),
+            limit=3,
+            order="asc",
+            cursor=encode_cursor(Date(2024, 1, 31), "asc"),
+        ),
+        GetManyMoodStampsRequest(
+            start_date=Date(2024, 2, 1),
+            end_date=Date(2024, 4, 30),
+            value=2,
+            fields=["note", "value"],
+        ),
+    ],
+)
+@pytest.mark.asyncio
+async def test_page_from_month_blocks_matches_get_many_json(
+    sqlite_mood_service, body
+):
+    user_id = uuid.uuid4()
+    for month, day in [(1, 10), (1, 31), (2, 1), (2, 29), (3, 5), (3, 31)]:
+        await sqlite_mood_service.create(
+            user_id,
+            CreateMoodStampRequest(
+                date=Date(2024, month, day),
+                value=day % 3 + 1,
+                note='"Настроение" <b>ok</b>\n',
+            ),
+        )
+
+    expected = await sqlite_mood_service.get_many_json(user_id, body)
+    months = months_between(body.start_date, body.end_date)
+    blocks = await sqlite_mood_service.get_months_json(
+        user_id, months[0], months[-1]
+    )
+    page = page_from_month_blocks([blocks[m] for m in months], body)
+
+    assert page == expected
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not base64!",
+        "bm90LWEtY3Vyc29y",
+        encode_cursor(Date(2025, 1, 1), "asc"),
+    ],
+)
+@pytest.mark.asyncio
+async def test_get_many_moodstamps_invalid_cursor(
+    mood_service, mock_moodstamp_repository, cursor
+):
+    with pytest.raises(InvalidMoodStampCursor):
+        await mood_service.get_many(
+            uuid.uuid4(), GetManyMoodStampsRequest(cursor=cursor)
+        )
+    mock_moodstamp_repository.get_many.assert_not_awaited()
 
 
 @pytest.mark.asyncio
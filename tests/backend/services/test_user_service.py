@@ -7,10 +7,12 @@ import pytest
 from mood_diary.backend.exceptions.user import (
     IncorrectOldPassword,
     IncorrectPasswordOrUserDoesNotExists,
+    PasswordHashingBusy,
     UsernameAlreadyExists,
     UserNotFound,
 )
 from mood_diary.backend.repositories.sсhemas.user import (
+    UpdateUserHashedPassword,
     User as UserSchema,
 )
 from mood_diary.backend.services.user import UserService
@@ -36,6 +38,9 @@ def mock_password_hasher():
     mock = Mock()
     mock.hash.return_value = "hashed_password"
     mock.verify.return_value = True
+    mock.needs_rehash.return_value = False
+    mock.hash_async = AsyncMock(side_effect=lambda *args: mock.hash(*args))
+    mock.verify_async = AsyncMock(side_effect=lambda *args: mock.verify(*args))
     return mock
 
 
@@ -165,6 +170,51 @@ async def test_login_user_not_found(
     )
 
 
+@pytest.mark.asyncio
+async def test_login_rehashes_outdated_password_hash(
+    user_service: UserService,
+    mock_user_repository: AsyncMock,
+    mock_password_hasher: Mock,
+    sample_user: UserSchema,
+):
+    mock_user_repository.get_by_username.return_value = sample_user
+    mock_password_hasher.needs_rehash.return_value = True
+    mock_password_hasher.hash.return_value = "rehashed_password"
+
+    await user_service.login(
+        LoginRequest(username="testuser", password="password123")
+    )
+
+    mock_password_hasher.needs_rehash.assert_called_once_with(
+        "hashed_password"
+    )
+    mock_password_hasher.hash.assert_called_once_with("password123")
+    mock_user_repository.rehash_password.assert_awaited_once_with(
+        sample_user.id,
+        "hashed_password",
+        UpdateUserHashedPassword(hashed_password="rehashed_password"),
+    )
+
+
+@pytest.mark.asyncio
+async def test_login_skips_rehash_while_hashing_is_busy(
+    user_service: UserService,
+    mock_user_repository: AsyncMock,
+    mock_password_hasher: Mock,
+    sample_user: UserSchema,
+):
+    mock_user_repository.get_by_username.return_value = sample_user
+    mock_password_hasher.needs_rehash.return_value = True
+    mock_password_hasher.hash_async.side_effect = PasswordHashingBusy(1)
+
+    response = await user_service.login(
+        LoginRequest(username="testuser", password="password123")
+    )
+
+    assert response.access_token == f"ACCESS-{sample_user.id}"
+    mock_user_repository.rehash_password.assert_not_awaited()
+
+
 @pytest.mark.asyncio
 async def test_login_incorrect_password(
     user_service: UserService,
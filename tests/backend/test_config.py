@@ -107,3 +107,11 @@ def test_app_startup_raises_exception_without_secret_key():
     ):
         with TestClient(app) as client:
             pass
+
+
+@pytest.mark.parametrize("enabled", [False, True])
+def test_cache_stats_served_only_when_enabled(enabled: bool):
+    app = get_app(Settings(CACHE_STATS_ENABLED=enabled))
+
+    paths = [route.path for route in app.routes]
+    assert ("/cache/stats" in paths) is enabled
@@ -0,0 +1,38 @@
+from unittest.mock import patch
+
+from mood_diary.backend.utils.calibrate_hashing import (
+    PROBE_ITERATIONS,
+    calibrate,
+    main,
+)
+
+
+def fake_measure(hasher, rounds: int) -> float:
+    # 1ms per 10 000 iterations
+    return hasher.hash_iterations / 10_000
+
+
+@patch(
+    "mood_diary.backend.utils.calibrate_hashing.measure",
+    side_effect=fake_measure,
+)
+def test_calibrate_scales_probe_to_target(measure):
+    result = calibrate("sha256", target_ms=64.5, rounds=3)
+
+    assert result.iterations == 640_000
+    assert result.milliseconds == 64
+    assert measure.call_args_list[0][0][0].hash_iterations == (
+        PROBE_ITERATIONS
+    )
+
+
+@patch(
+    "mood_diary.backend.utils.calibrate_hashing.measure",
+    side_effect=fake_measure,
+)
+def test_main_prints_settings_and_warns_below_minimum(measure, capsys):
+    main(["--target-ms", "20", "--hash-name", "sha256"])
+
+    out = capsys.readouterr().out
+    assert "PASSWORD_HASHING_HASH_ITERATIONS=200000" in out
+    assert "warning: below the 600000 iterations" in out
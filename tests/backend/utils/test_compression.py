@@ -0,0 +1,83 @@
+import pytest
+
+from mood_diary.backend.utils.compression import (
+    accepts,
+    compress,
+    decompress,
+    get_compressor,
+    is_available,
+    negotiate,
+)
+
+
+@pytest.mark.parametrize("encoding", ["identity", "gzip", "br", "zstd"])
+def test_compress_round_trip(encoding: str):
+    if not is_available(encoding):
+        pytest.skip(f"{encoding} is not available")
+    data = b'{"items": []}' * 100
+
+    compressed = compress(data, encoding)
+
+    assert decompress(compressed, encoding) == data
+    assert compress(data, encoding) == compressed
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br", "zstd"])
+def test_compressor_flushes_decodable_parts(encoding: str):
+    if not is_available(encoding):
+        pytest.skip(f"{encoding} is not available")
+    compressor = get_compressor(encoding)
+
+    first = compressor.compress(b'{"items": [') + compressor.flush()
+    rest = compressor.compress(b"1, 2]}" * 100) + compressor.finish()
+
+    assert first
+    assert decompress(first + rest, encoding) == b'{"items": [' + (
+        b"1, 2]}" * 100
+    )
+
+
+def test_unsupported_encoding():
+    assert not is_available("deflate")
+    with pytest.raises(ValueError):
+        compress(b"data", "deflate")
+    with pytest.raises(ValueError):
+        decompress(b"data", "deflate")
+    with pytest.raises(ValueError):
+        get_compressor("identity")
+
+
+@pytest.mark.parametrize(
+    "header, encoding, expected",
+    [
+        ("gzip, deflate", "gzip", True),
+        ("GZIP", "gzip", True),
+        ("deflate", "gzip", False),
+        ("gzip;q=0", "gzip", False),
+        ("br;q=1.0, gzip;q=0.5", "gzip", True),
+        ("*", "zstd", True),
+        ("*;q=0", "zstd", False),
+        ("gzip;q=0, *", "gzip", False),
+        ("gzip;q=oops", "gzip", False),
+        (None, "gzip", False),
+        (None, "identity", True),
+    ],
+)
+def test_accepts(header: str | None, encoding: str, expected: bool):
+    assert accepts(header, encoding) is expected
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("gzip, br", "br"),
+        ("gzip, br;q=0.5", "gzip"),
+        ("zstd;q=0.9, gzip;q=0.9", "zstd"),
+        ("*", "br"),
+        ("br;q=0, *", "zstd"),
+        ("deflate", "identity"),
+        (None, "identity"),
+    ],
+)
+def test_negotiate(header: str | None, expected: str):
+    assert negotiate(header, ["br", "zstd", "gzip"]) == expected
@@ -0,0 +1,127 @@
+import gzip
+import zlib
+
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from mood_diary.backend.utils.middleware import (
+    CompressionMiddleware,
+    CompressionResponder,
+)
+
+LARGE = b'{"items": [' + b'{"value": 5, "note": ""},' * 100 + b"]}"
+
+
+@pytest.fixture
+def client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(
+        CompressionMiddleware, encodings=["br", "gzip"], min_size=1024
+    )
+
+    @app.get("/large")
+    def large():
+        return Response(
+            LARGE, media_type="application/json", headers={"ETag": '"1"'}
+        )
+
+    @app.get("/small")
+    def small():
+        return Response(b"{}", media_type="application/json")
+
+    @app.get("/precompressed")
+    def precompressed():
+        return Response(
+            gzip.compress(LARGE),
+            media_type="application/json",
+            headers={"Content-Encoding": "gzip"},
+        )
+
+    @app.get("/stream")
+    def stream():
+        async def parts():
+            yield b'{"items": ['
+            yield b'{"value": 5},' * 10
+            yield b"]}"
+
+        return StreamingResponse(parts(), media_type="application/json")
+
+    @app.get("/image")
+    def image():
+        return Response(LARGE, media_type="image/png")
+
+    with TestClient(app) as client:
+        yield client
+
+
+def test_compresses_large_bodies(client: TestClient):
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) < len(LARGE)
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"1"'
+    assert response.content == LARGE
+
+
+@pytest.mark.parametrize(
+    "path, accept_encoding",
+    [
+        ("/large", "identity"),
+        ("/small", "gzip"),
+        ("/image", "gzip"),
+    ],
+)
+def test_sends_other_bodies_as_they_are(
+    client: TestClient, path: str, accept_encoding: str
+):
+    response = client.get(path, headers={"Accept-Encoding": accept_encoding})
+
+    assert "content-encoding" not in response.headers
+    assert response.headers.get("etag") in (None, '"1"')
+
+
+def test_reuses_precompressed_bodies(client: TestClient):
+    response = client.get(
+        "/precompressed", headers={"Accept-Encoding": "br, gzip"}
+    )
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == LARGE
+
+
+def test_compresses_streamed_bodies_as_they_go(client: TestClient):
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.content == (b'{"items": [' + b'{"value": 5},' * 10 + b"]}")
+
+
+@pytest.mark.asyncio
+async def test_streamed_parts_are_sent_decodable():
+    sent: list[dict] = []
+
+    async def send(message):
+        sent.append(message)
+
+    responder = CompressionResponder(send, "gzip", min_size=1024)
+    await responder.send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json")],
+        }
+    )
+    await responder.send(
+        {"type": "http.response.body", "body": b"[1,", "more_body": True}
+    )
+    first = sent[-1]["body"]
+    await responder.send({"type": "http.response.body", "body": b"2]"})
+
+    decompressor = zlib.decompressobj(31)
+    assert decompressor.decompress(first) == b"[1,"
+    assert sent[-1]["more_body"] is False
+    assert gzip.decompress(b"".join(m["body"] for m in sent[1:])) == b"[1,2]"
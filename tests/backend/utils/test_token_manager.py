@@ -9,6 +9,7 @@ from mood_diary.backend.utils.token_manager import (
     JWTTokenManager,
     TokenPayload,
     TokenType,
+    VerifiedTokenCache,
 )
 
 SECRET_KEY = "test-secret-key"
@@ -219,3 +220,69 @@ def test_decode_catches_invalid_token_error(
     payload = token_manager.decode_token(token)
     assert payload is None
     mock_jwt_decode.assert_called_once()
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_verified_tokens_skip_signature_checks(user_id: uuid.UUID):
+    token_manager = JWTTokenManager(
+        secret_key=SECRET_KEY,
+        algorithm=ALGORITHM,
+        access_token_exp_minutes=ACCESS_TOKEN_EXP_MINUTES,
+        verified_cache_size=16,
+    )
+    token = token_manager.create_token(TokenType.ACCESS, user_id)
+    payload = token_manager.decode_token(token)
+
+    with patch("jwt.decode") as mock_jwt_decode:
+        assert token_manager.decode_token(token) is payload
+        assert token_manager.decode_token("invalid.token") is None
+
+    mock_jwt_decode.assert_called_once()
+    assert len(token_manager.verified) == 1
+
+
+def test_verified_token_cache_expires_at_exp(user_id: uuid.UUID):
+    clock = Clock(1000)
+    cache = VerifiedTokenCache(2, clock)
+    payload = TokenPayload(
+        type=TokenType.ACCESS, user_id=user_id, iat=900, exp=1010
+    )
+    cache.set("token", payload)
+
+    clock.now = 1009.9
+    assert cache.get("token") is payload
+    clock.now = 1010
+    assert cache.get("token") is None
+    assert len(cache) == 0
+
+
+def test_verified_token_cache_evicts_least_recently_used(user_id: uuid.UUID):
+    cache = VerifiedTokenCache(2, Clock(0))
+    payload = TokenPayload(
+        type=TokenType.ACCESS, user_id=user_id, iat=0, exp=10
+    )
+    cache.set("a", payload)
+    cache.set("b", payload)
+    cache.get("a")
+    cache.set("c", payload)
+
+    assert [cache.get(token) for token in "abc"] == [payload, None, payload]
+    assert VerifiedTokenCache.key("a") in cache.entries
+    assert "a" not in cache.entries
+
+
+def test_verified_token_cache_disabled(user_id: uuid.UUID):
+    cache = VerifiedTokenCache(0)
+    cache.set(
+        "a",
+        TokenPayload(type=TokenType.ACCESS, user_id=user_id, iat=0, exp=10),
+    )
+
+    assert len(cache) == 0
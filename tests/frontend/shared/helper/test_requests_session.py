@@ -1,5 +1,8 @@
 import requests
+from requests.adapters import HTTPAdapter
+
 from mood_diary.frontend.shared.helper.requests_session import (
+    ConditionalAdapter,
     provide_requests_session,
 )
 from unittest.mock import MagicMock
@@ -38,3 +41,73 @@ def test_provide_requests_session_returns_existing_session(mocker):
 
     assert session is not None
     assert session is mock_existing_session
+
+
+def make_response(status_code: int, headers: dict, content: bytes = b""):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers)
+    response._content = content
+    return response
+
+
+def prepared_get(url: str = "http://api/mood/") -> requests.PreparedRequest:
+    return requests.Request("GET", url).prepare()
+
+
+def test_provide_requests_session_mounts_conditional_adapter(mocker):
+    mocker.patch(PATCH_TARGET_SESSION_STATE)
+
+    session = provide_requests_session()
+
+    assert isinstance(session.get_adapter("http://api/"), ConditionalAdapter)
+    assert isinstance(session.get_adapter("https://api/"), ConditionalAdapter)
+
+
+def test_conditional_adapter_revalidates_responses(mocker):
+    adapter = ConditionalAdapter()
+    send = mocker.patch.object(
+        HTTPAdapter,
+        "send",
+        side_effect=[
+            make_response(
+                200,
+                {"ETag": '"1"', "Last-Modified": "Mon, 01 Jan 2024"},
+                b"[]",
+            ),
+            make_response(304, {"ETag": '"1"', "Date": "Tue, 02 Jan 2024"}),
+        ],
+    )
+
+    first = adapter.send(prepared_get())
+    second_request = prepared_get()
+    second = adapter.send(second_request)
+
+    assert "If-None-Match" not in send.call_args_list[0][0][0].headers
+    assert second_request.headers["If-None-Match"] == '"1"'
+    assert second_request.headers["If-Modified-Since"] == "Mon, 01 Jan 2024"
+    assert second.status_code == 200
+    assert second.content == first.content == b"[]"
+    assert second.headers["Date"] == "Tue, 02 Jan 2024"
+    assert "Date" not in first.headers
+
+
+def test_conditional_adapter_skips_other_requests(mocker):
+    adapter = ConditionalAdapter(max_entries=1)
+    mocker.patch.object(
+        HTTPAdapter,
+        "send",
+        side_effect=lambda request, **kwargs: make_response(
+            200, {"ETag": '"1"'}
+        ),
+    )
+
+    adapter.send(prepared_get("http://api/a"))
+    adapter.send(prepared_get("http://api/b"))
+    other_url = prepared_get("http://api/a")
+    adapter.send(other_url)
+    post = requests.Request("POST", "http://api/b").prepare()
+    adapter.send(post)
+
+    assert "If-None-Match" not in other_url.headers
+    assert "If-None-Match" not in post.headers
@@ -55,14 +55,47 @@ def test_fetch_change_password_success(mock_session, mock_streamlit):
 
 def test_fetch_all_mood_success(mock_session, mock_streamlit):
     mock_session.get.return_value.status_code = 200
-    mock_session.get.return_value.json.return_value = [
-        {"date": "2024-01-01", "value": 3}
-    ]
+    mock_session.get.return_value.json.return_value = {
+        "items": [{"date": "2024-01-01", "value": 3}],
+        "next_cursor": None,
+    }
 
     result = api.fetch_all_mood()
     assert result == [{"date": "2024-01-01", "value": 3}]
 
 
+def test_fetch_all_mood_follows_cursor(mock_session, mock_streamlit):
+    pages = [
+        {"items": [{"date": "2024-01-02"}], "next_cursor": "abc"},
+        {"items": [{"date": "2024-01-01"}], "next_cursor": None},
+    ]
+    cursors = []
+
+    def get(url, params):
+        cursors.append(params.get("cursor"))
+        response = MagicMock(status_code=200)
+        response.json.return_value = pages[len(cursors) - 1]
+        return response
+
+    mock_session.get.side_effect = get
+
+    result = api.fetch_all_mood(value=3)
+    assert result == [{"date": "2024-01-02"}, {"date": "2024-01-01"}]
+    assert cursors == [None, "abc"]
+
+
+def test_fetch_all_mood_requests_fields(mock_session, mock_streamlit):
+    mock_session.get.return_value.status_code = 200
+    mock_session.get.return_value.json.return_value = {
+        "items": [{"date": "2024-01-01", "value": 3}],
+        "next_cursor": None,
+    }
+
+    api.fetch_all_mood(fields=["date", "value"])
+
+    assert mock_session.get.call_args[1]["params"] == {"fields": "date,value"}
+
+
 def test_fetch_create_mood_success(mock_session, mock_streamlit):
     mock_session.post.return_value.status_code = 200
 
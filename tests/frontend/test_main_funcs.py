@@ -30,6 +30,7 @@ def test_get_user_ratings_data_valid(mock_fetch):
     assert df.iloc[0]["rating"] == 7
     assert df.iloc[0]["comment"] == "Good"
     assert isinstance(df.iloc[0]["date"], datetime.datetime)
+    assert mock_fetch.call_args[1]["fields"] == ["date", "value", "note"]
 
 
 @patch("mood_diary.frontend.main_funcs.fetch_all_mood")
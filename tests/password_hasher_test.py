@@ -1,6 +1,14 @@
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import Future
+from unittest.mock import MagicMock
+
 import pytest
 
+from mood_diary.backend.exceptions.user import PasswordHashingBusy
 from mood_diary.backend.utils.password_hasher import (
+    HashingPool,
     PasswordHasher,
     SaltPasswordHasher,
 )
@@ -92,3 +100,160 @@ def test_invalid_password_type(password_hasher: SaltPasswordHasher):
     """Test that hashing raises TypeError for invalid password types."""
     with pytest.raises(TypeError, match="Password must be str or bytes"):
         password_hasher.hash(12345)  # type: ignore
+
+
+def fast_hasher(pool: HashingPool) -> SaltPasswordHasher:
+    return SaltPasswordHasher(
+        encoding="utf-8",
+        hash_name="sha256",
+        hash_iterations=1000,
+        salt_size=16,
+        split_char="$",
+        pool=pool,
+    )
+
+
+@pytest.mark.parametrize("kind", ["thread", "process"])
+@pytest.mark.asyncio
+async def test_async_hashing_runs_on_pool(kind: str):
+    pool = HashingPool(kind, workers=1, max_queue=0)
+    password_hasher = fast_hasher(pool)
+
+    password_hash = await password_hasher.hash_async("abcdefgh")
+
+    assert await password_hasher.verify_async("abcdefgh", password_hash)
+    assert not await password_hasher.verify_async("other", password_hash)
+    assert pool.pending == 0
+    assert pool.mean_duration > 0
+    password_hasher.close()
+    assert pool._executor is None
+
+
+@pytest.mark.asyncio
+async def test_async_hashing_without_pool(password_hasher: PasswordHasher):
+    password_hash = await password_hasher.hash_async("abcdefgh")
+
+    assert await password_hasher.verify_async("abcdefgh", password_hash)
+
+
+@pytest.mark.asyncio
+async def test_saturated_pool_refuses_calls():
+    pool = HashingPool("thread", workers=1, max_queue=1)
+    pool.mean_duration = 1.5
+    release = threading.Event()
+    blocked = [asyncio.create_task(pool.run(release.wait)) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    with pytest.raises(PasswordHashingBusy) as busy:
+        await fast_hasher(pool).hash_async("abcdefgh")
+
+    release.set()
+    await asyncio.gather(*blocked)
+    pool.close()
+    assert busy.value.http_status_code == 503
+    assert busy.value.headers == {"Retry-After": "3"}
+    assert pool.rejected == 1
+    assert pool.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_call_holds_its_place_until_done():
+    pool = HashingPool("thread", workers=1, max_queue=0)
+    release = threading.Event()
+    waiter = asyncio.create_task(pool.run(release.wait))
+    await asyncio.sleep(0)
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert pool.pending == 1
+    with pytest.raises(PasswordHashingBusy):
+        await pool.run(release.wait)
+
+    release.set()
+    while pool.pending:
+        await asyncio.sleep(0.01)
+    assert await pool.run(lambda: "done") == "done"
+    pool.close()
+
+
+def test_hash_records_its_parameters(password_hasher: SaltPasswordHasher):
+    algorithm, iterations, salt, password_hash = password_hasher.hash(
+        "abcdefgh"
+    ).split("$")
+
+    assert (algorithm, iterations) == ("pbkdf2_sha256", "100000")
+    assert len(bytes.fromhex(salt)) == 16
+    assert len(bytes.fromhex(password_hash)) == 32
+
+
+def test_verify_uses_stored_parameters(password_hasher: SaltPasswordHasher):
+    old = fast_hasher(None)
+    stored_hash = old.hash("abcdefgh")
+
+    assert password_hasher.verify("abcdefgh", stored_hash)
+    assert password_hasher.needs_rehash(stored_hash)
+    assert not old.needs_rehash(stored_hash)
+
+
+def test_verify_legacy_hashes():
+    password_hasher = SaltPasswordHasher(
+        encoding="utf-8",
+        hash_name="sha256",
+        hash_iterations=2000,
+        salt_size=16,
+        split_char="$",
+        legacy_iterations=1000,
+    )
+    salt = bytes(16)
+    legacy_hash = (
+        f"{salt.hex()}$"
+        f"{hashlib.pbkdf2_hmac('sha256', b'abcdefgh', salt, 1000).hex()}"
+    )
+
+    assert password_hasher.verify("abcdefgh", legacy_hash)
+    assert not password_hasher.verify("other", legacy_hash)
+    assert password_hasher.needs_rehash(legacy_hash)
+
+
+@pytest.mark.parametrize(
+    "stored_hash",
+    [
+        "",
+        "nothex$nothex",
+        "pbkdf2_sha256$many$00$00",
+        "pbkdf2_nosuchhash$1000$00$00",
+        "bcrypt$1000$00$00",
+        "pbkdf2_sha256$0$00$00",
+    ],
+)
+def test_verify_malformed_hashes(
+    password_hasher: SaltPasswordHasher, stored_hash: str
+):
+    assert not password_hasher.verify("abcdefgh", stored_hash)
+    assert password_hasher.needs_rehash(stored_hash)
+
+
+@pytest.mark.asyncio
+async def test_call_refused_by_executor_takes_no_place():
+    pool = HashingPool("thread", workers=1, max_queue=0)
+    pool._executor = MagicMock()
+    pool._executor.submit.side_effect = RuntimeError("shut down")
+
+    with pytest.raises(RuntimeError):
+        await pool.run(lambda: "done")
+
+    assert pool.pending == 0
+
+
+def test_call_ending_after_the_loop_is_not_released():
+    pool = HashingPool("thread", workers=1, max_queue=0)
+    pool.pending = 1
+    loop = asyncio.new_event_loop()
+    loop.close()
+    future: Future = Future()
+    future.cancel()
+
+    pool._done(loop, future)
+
+    assert pool.pending == 1